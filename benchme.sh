@@ -0,0 +1,8 @@
+#!/bin/bash
+
+source venv/bin/activate
+
+export PYTHONPATH=$PYTHONPATH:.
+
+python3.12 -m crud_app.benchmark seed --migrate --rows "${BENCH_ROWS:-10000}"
+python3.12 -m crud_app.benchmark run --output "bench-$(date +%Y%m%d-%H%M%S).json" "$@"
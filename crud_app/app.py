@@ -1,21 +1,228 @@
 # pylint: disable=undefined-variable
+import csv
+import io
+import json
+import logging
+import tempfile
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+
 from decouple import config
+from mysql.connector.errors import Error as DbError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, JSONResponse, StreamingResponse
+from starlette.routing import Match, Route
 from fasthtml.common import *  # pylint: disable=unused-wildcard-import
 from fasthtml.components import *  # pylint: disable=unused-wildcard-import
-
-from crud_app.db import DbInterface
-from crud_app.db_structure import FieldDetails, FormFieldTypes, Kontraktor, Pracownik, Stanowisko, Zespol
+from fasthtml.core import _xt_cts  # pylint: disable=protected-access
+
+from crud_app.audit import AuditActorMiddleware, AuditRecord
+from crud_app.changes import ChangeEvent, ChangeKind
+from crud_app.db import RecordConflictError
+from crud_app.db_async import AsyncDbInterface
+from crud_app.db_structure import (FieldDetails, FormFieldTypes, Kontraktor, Pracownik, Stanowisko,
+                                   TABLE_DETAILS, TablePage, TableQuery, Zespol, create_record, parse_form_record)
+from crud_app.importer import import_csv
+from crud_app.introspection import configure_tables
+from crud_app.export import GZIP_MEDIA_TYPE, MEDIA_TYPES, ExportFormats, csv_chunks, gzip_chunks, jsonl_chunks
+from crud_app.fast_render import sentinel_row, split_page, stream_page
+from crud_app.metrics import (CONTENT_TYPE, REGISTRY, MetricsMiddleware, RequestMetrics, record_db_time,
+                              record_handler_end, register_stats)
+from crud_app.replicas import ReadYourWritesMiddleware
+from crud_app.reports import Report, Reports, date_fields, group_fields, measure_fields
+from crud_app.server import WorkerState
+from crud_app.settings import create_audit_actor_options, create_db_interface, create_pool_settings
+
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+LIVE_UPDATES_ENABLED = config("LIVE_UPDATES_ENABLED", default=True, cast=bool)
+LIVE_HEARTBEAT = config("LIVE_HEARTBEAT", default=15.0, cast=float)
+SSE_EXTENSION = "https://cdn.jsdelivr.net/npm/htmx-ext-sse@2.2.2/sse.js"
+
+logger = logging.getLogger(__name__)
+
+
+def mark_handler_end(resp):  # pylint: disable=unused-argument
+    """
+    FastHTML `after` hook, runs when the handler returned and before the response is serialized.
+    """
+    record_handler_end()
 
 
 css = Style(':root {--pico-font-size:90%,--pico-font-family: Pacifico, cursive;}')
-app = FastHTML(hdrs=(picolink, css))
+app = FastHTML(hdrs=(picolink, css, Script(src=SSE_EXTENSION) if LIVE_UPDATES_ENABLED else None),
+               after=[mark_handler_end] if METRICS_ENABLED else None)
 
 rt = app.route
 
-db_interface = DbInterface(db_user=config("DB_USER"),
-                           db_pass=config("DB_PASS"),
-                           db_host=config("DB_HOST"),
-                           db_name=config("DB_NAME"))
+
+def route_of(scope) -> str:
+    """
+    :return: path template of the route matching the request, used as the metrics label
+    """
+    for route in app.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=RequestMetrics(REGISTRY), route_of=route_of,
+                       skip=("/metrics", "/healthz", "/readyz"))
+
+pool_settings = create_pool_settings()
+db_interface = create_db_interface(pool_settings)
+configure_tables(db_interface)
+if db_interface.replicas is not None:
+    app.add_middleware(ReadYourWritesMiddleware, window=db_interface.replicas.settings.max_lag
+                       + db_interface.replicas.settings.check_interval)
+
+# DB_MODE=async runs the queries in a thread pool bounded to the connection pool size,
+# DB_MODE=sync keeps the previous behaviour of running them in the shared Starlette thread pool
+DB_MODE = config("DB_MODE", default="async")
+if DB_MODE not in ("sync", "async"):
+    raise ValueError(f"Invalid DB_MODE {DB_MODE}")
+
+register_stats(REGISTRY, "db_pool", "Connection pool", db_interface.get_pool_stats)
+register_stats(REGISTRY, "db_cache", "Read cache", db_interface.get_cache_stats)
+reports = Reports(db_interface, max_size=config("REPORTS_CACHE_SIZE", default=128, cast=int))
+register_stats(REGISTRY, "reports", "Report cache", reports.stats)
+if db_interface.audit_log is not None:
+    app.add_middleware(AuditActorMiddleware, **create_audit_actor_options())
+    register_stats(REGISTRY, "audit", "Audit log", db_interface.audit_log.stats)
+async_db_interface = AsyncDbInterface(db_interface, max_workers=pool_settings.max_size) \
+    if DB_MODE == "async" else None
+
+PAGE_SIZE = config("DB_PAGE_SIZE", default=100, cast=int)
+PAGE_SIZE_MAX = config("DB_PAGE_SIZE_MAX", default=1000, cast=int)
+BULK_CHUNK_SIZE = config("DB_BULK_CHUNK_SIZE", default=1000, cast=int)
+EXPORT_BATCH_SIZE = config("DB_EXPORT_BATCH_SIZE", default=1000, cast=int)
+WARM_UP_ENABLED = config("DB_WARM_UP", default=True, cast=bool)
+
+worker_state = WorkerState()
+register_stats(REGISTRY, "worker", "Worker process", worker_state.stats)
+
+
+async def warm_up():
+    """
+    Startup handler, the worker does not accept connections until it returns.
+    A failed warm-up is logged and the worker stays not ready until the readiness probe warms it up.
+    """
+    started = time.perf_counter()
+    try:
+        if WARM_UP_ENABLED:
+            await run_in_threadpool(db_interface.warm_up, PAGE_SIZE)
+    except DbError as error:
+        logger.warning("warm-up failed: %s", error)
+        return
+    worker_state.started(time.perf_counter() - started)
+
+
+app.router.on_startup.append(warm_up)
+
+
+async def close_audit_log():
+    """
+    Shutdown handler, the queued audit records are written before the worker exits.
+    """
+    if db_interface.audit_log is not None:
+        await run_in_threadpool(db_interface.audit_log.close)
+
+
+app.router.on_shutdown.append(close_audit_log)
+
+FILTER_PREFIXES = {"f": "=", "min": ">=", "max": "<="}
+
+# RENDER_MODE=fast streams the rows of the list view from the row template,
+# RENDER_MODE=components renders them as FastHTML components
+RENDER_MODE = config("RENDER_MODE", default="fast")
+if RENDER_MODE not in ("fast", "components"):
+    raise ValueError(f"Invalid RENDER_MODE {RENDER_MODE}")
+
+HTTP_CACHE_ENABLED = config("HTTP_CACHE_ENABLED", default=True, cast=bool)
+VARY = "HX-Request, HX-History-Restore-Request"
+
+
+def view_tables(table_name: str) -> List[str]:
+    """
+    :return: the table and the tables referenced by its foreign keys, shown in its views
+    """
+    references = {field.references.table_name for field in TABLE_DETAILS[table_name].fields_details
+                  if field.references}
+    return [table_name, *sorted(references - {table_name})]
+
+
+def page_validators(request, table_name: str) -> Optional[dict]:
+    """
+    The page depends on the table and the tables referenced by its foreign keys.
+    :return: ETag, Last-Modified and Cache-Control headers of the page, None when HTTP caching is disabled
+    """
+    return version_validators(request, view_tables(table_name))
+
+
+def version_validators(request, tables: List[str], representation: str = "") -> Optional[dict]:
+    """
+    Versions of the tables are bumped by the writes, so the validators are computed without querying the database.
+    :param tables: tables the response depends on
+    :param representation: tells apart the representations of the same URL, e.g. JSON and HTML
+    :return: ETag, Last-Modified and Cache-Control headers of the response, None when HTTP caching is disabled
+    """
+    if not HTTP_CACHE_ENABLED:
+        return None
+    tag, modified = db_interface.get_table_version(tables)
+    # full pages and htmx fragments of the same URL differ
+    variant = representation + ("f" if "hx-request" in request.headers else "p")
+    return {"ETag": f'W/"{tag}-{variant}"', "Last-Modified": formatdate(modified, usegmt=True),
+            "Cache-Control": "no-cache"}
+
+
+def is_not_modified(request, validators: Optional[dict]) -> bool:
+    """
+    :return: True when the client's copy is current according to If-None-Match, or If-Modified-Since without it
+    """
+    if validators is None:
+        return False
+    if (if_none_match := request.headers.get("if-none-match")) is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or validators["ETag"] in tags or validators["ETag"][2:] in tags
+    if (if_modified_since := request.headers.get("if-modified-since")) is not None:
+        try:
+            return parsedate_to_datetime(validators["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(validators: dict) -> Response:
+    return Response(status_code=304, headers={**validators, "vary": VARY})
+
+
+def with_headers(content, headers: Optional[dict]):
+    """
+    :return: FastHTML response content with the HTTP headers added
+    """
+    return (*tuplify(content), *[HttpHeader(name, value) for name, value in (headers or {}).items()])
+
+
+async def db_call(method_name: str, *args, **kwargs):
+    """
+    Calls the `DbInterface` method without blocking the event loop, according to DB_MODE.
+    The time of the call is accounted as the database phase of the request.
+    """
+    return await blocking_call(getattr(db_interface, method_name), *args, **kwargs)
+
+
+async def blocking_call(function, *args, **kwargs):
+    """
+    Calls the function using the database, e.g. of `reports`, in the thread pool of `db_call`.
+    """
+    started = time.perf_counter()
+    try:
+        if async_db_interface is None:
+            return await run_in_threadpool(function, *args, **kwargs)
+        return await async_db_interface.run(function, *args, **kwargs)
+    finally:
+        record_db_time(time.perf_counter() - started)
 
 
 def page_template(header: str, payload):
@@ -31,109 +238,696 @@ def get():
                                        for item in sorted(db_interface.get_tables())]))
 
 
+@rt("/healthz")
+def get():
+    """
+    Liveness probe, the worker process is running its event loop.
+    """
+    return Response("ok", media_type="text/plain")
+
+
+@rt("/readyz")
+async def get():
+    """
+    Readiness probe, the worker has warmed up and reaches the database.
+    """
+    try:
+        if not worker_state.ready:
+            await warm_up()
+        await db_call("ping")
+    except DbError:
+        return Response("database not available", status_code=503, media_type="text/plain")
+    if not worker_state.ready:
+        return Response("warming up", status_code=503, media_type="text/plain")
+    return Response("ready", media_type="text/plain")
+
+
+@rt("/metrics")
+def get():
+    """
+    Metrics in the Prometheus text format, registered before `/{table_name}` so it is not taken for a table.
+    """
+    if not METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@rt("/reports")
+def get():
+    """
+    Index of the reports, the reports are registered before `/{table_name}` so `reports` is not taken for a table.
+    """
+    links = []
+    for table_name in sorted(db_interface.get_tables()):
+        headers = dict(zip((field.name for field in db_interface.get_table_fields_details(table_name)),
+                           db_interface.get_table_headers(table_name)))
+        measures = measure_fields(table_name)
+        for group_by in group_fields(table_name):
+            params = {"by": group_by, "measure": measures[0]} if measures else {"by": group_by}
+            links.append(P(A(f"{table_name.capitalize()} wg: {headers[group_by]}",
+                             href=page_url(f"/reports/{table_name}/groups", params))))
+        for field_name in date_fields(table_name):
+            links.append(P(A(f"{table_name.capitalize()}, liczba wg okresu: {headers[field_name]}",
+                             href=page_url(f"/reports/{table_name}/headcount", {"field": field_name}))))
+    if {"pracownicy", "stanowiska"} <= db_interface.get_tables():
+        links.append(P(A("Zgodność wynagrodzeń z widełkami stanowisk", href="/reports/compliance")))
+    return page_template(header="Raporty", payload=Div(*links))
+
+
+def report_response(report: Report, title: str, headers: List[str],  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                    representation: str, validators: Optional[dict], labels: Dict[int, Dict[int, str]] = None):
+    """
+    :param representation: `json` for the dashboards, HTML table otherwise
+    :param labels: labels of the keys per column index
+    :return: report as JSON, or as the page with the table
+    """
+    labels = labels or {}
+    if representation == "json":
+        return JSONResponse({"columns": list(report.columns), "rows": report.rows, "version": report.version,
+                             "labels": {report.columns[index]: {str(key): label for key, label in names.items()}
+                                        for index, names in labels.items()}},
+                            headers={**(validators or {}), "vary": VARY})
+    rows = [Tr(*[Td(labels[index].get(cell, str(cell)) if index in labels else "" if cell is None else str(cell))
+                 for index, cell in enumerate(row)]) for row in report.rows]
+    return with_headers(page_template(header=title, payload=Table(Thead(Tr(*[Th(header) for header in headers])),
+                                                                  Tbody(*rows))),
+                        validators)
+
+
+@rt("/reports/{table_name}/groups")
+async def get(table_name: str, request: Request, by: str, measure: str = None,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+              format: str = "html"):  # pylint: disable=redefined-builtin
+    """
+    Count, and with the `measure` its sum, average, minimum and maximum, per value of the `by` field.
+    """
+    if not db_interface.check_table_exists(table_name):
+        return Response(status_code=404)
+    fields_details = {field.name: field for field in db_interface.get_table_fields_details(table_name)}
+    references = fields_details[by].references if by in fields_details else None
+    validators = version_validators(request, [table_name, references.table_name] if references else [table_name],
+                                    format)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        report = await blocking_call(reports.groups, table_name, by, measure)
+    except ValueError as error:
+        return Response(str(error), status_code=400)
+    labels = {0: await db_call("get_labels", references.table_name, references.label_fields,
+                               [row[0] for row in report.rows])} if references else {}
+    headers = [fields_details[by].header, "Liczba"]
+    if measure is not None:
+        headers += [f"{name}: {fields_details[measure].header}" for name in ("Suma", "Średnia", "Minimum", "Maksimum")]
+    return report_response(report, f"{table_name.capitalize()} wg: {fields_details[by].header}", headers,
+                           format, validators, labels)
+
+
+@rt("/reports/{table_name}/headcount")
+async def get(table_name: str, request: Request, field: str, period: str = "year",  # pylint: disable=too-many-arguments,too-many-positional-arguments
+              format: str = "html"):  # pylint: disable=redefined-builtin
+    """
+    Number of the rows per `year`, `quarter` or `month` of the date `field`, e.g. the hires, with the running total.
+    """
+    if not db_interface.check_table_exists(table_name):
+        return Response(status_code=404)
+    validators = version_validators(request, [table_name], format)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        report = await blocking_call(reports.headcount, table_name, field, period)
+    except ValueError as error:
+        return Response(str(error), status_code=400)
+    return report_response(report, f"{table_name.capitalize()}, liczba wg okresu: {field}",
+                           ["Okres", "Liczba", "Razem"], format, validators)
+
+
+@rt("/reports/compliance")
+async def get(request: Request, format: str = "html"):  # pylint: disable=redefined-builtin
+    """
+    Salary range of every position with the numbers of its employees paid outside of the range.
+    """
+    validators = version_validators(request, ["pracownicy", "stanowiska"], format)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        report = await blocking_call(reports.compliance)
+    except ValueError:
+        return Response(status_code=404)
+    return report_response(report, "Zgodność wynagrodzeń z widełkami stanowisk",
+                           ["ID", "Stanowisko", "Płaca min.", "Płaca maks.", "Pracownicy", "Poniżej min.",
+                            "Powyżej maks.", "Bez wynagrodzenia", "Wynagrodzenie min.", "Wynagrodzenie maks."],
+                           format, validators)
+
+
 def generate_action_buttons(url_prefix, id):
     return Td(Group(
         A("Edytuj", href=f"{url_prefix}/edit/{id}", role="button", cls="button is-small is-primary"),
         A("Usuń", href=f"{url_prefix}/remove?id={id}", role="button", cls="button is-small is-danger",
-          hx_confirm="Are you sure?", hx_delete=f"{url_prefix}/remove?id={id}")))
-
-
-def generate_table(headers, table_data, actions_url_prefix):
+          hx_confirm="Are you sure?", hx_delete=f"{url_prefix}/remove?id={id}",
+          hx_target="closest tr", hx_swap="outerHTML")))
+
+
+def generate_rows(table_data, actions_url_prefix, labels: Dict[int, Dict[int, str]] = None):
+    """
+    :param labels: labels of the foreign keys per column index, see `DbInterface.resolve_references`
+    """
+    labels = labels or {}
+    return [Tr(*[Td(labels[index].get(cell, str(cell)) if index in labels else str(cell))
+                 for index, cell in enumerate(row)],
+               generate_action_buttons(actions_url_prefix, row[0]), id=row_id(row[0])) for row in table_data]
+
+
+def row_id(primary_key) -> str:
+    """
+    :return: id of the table row element, the target of the live updates
+    """
+    return f"row-{primary_key}"
+
+
+def page_url(table_url: str, view_params: dict, **params):
+    """
+    :return: URL of the table view keeping sorting, filtering and searching parameters
+    """
+    query = {**view_params, **{name: value for name, value in params.items() if value is not None}}
+    return f"{table_url}?{urlencode(query)}" if query else table_url
+
+
+def cursor_params(view_params: dict, page: TablePage, forward: bool) -> dict:
+    """
+    :return: `after`/`before` parameters of the next or previous page, with the sort column value
+        when sorting by other column than the primary key
+    """
+    params = {"after": page.next_after} if forward else {"before": page.prev_before}
+    if "sort" in view_params:
+        params["key"] = json.dumps(page.next_key if forward else page.prev_key, default=str)
+    return params
+
+
+def parse_table_query(table_name: str, query_params) -> Tuple[TableQuery, dict]:
+    """
+    Reads `sort`, `dir`, `q` and per-column filters `f_<field>` (equality), `min_<field>`, `max_<field>`
+    (range) from the query parameters.
+    :return: query passed to the database and parameters to keep in the view links
+    """
+    field_names = {field.name for field in db_interface.get_table_fields_details(table_name)}
+    view_params, filters = {}, []
+    for name, value in query_params.multi_items():
+        prefix, _, field_name = name.partition("_")
+        if prefix in FILTER_PREFIXES and field_name in field_names and value != '':
+            filters.append((field_name, FILTER_PREFIXES[prefix], value))
+            view_params[name] = value
+        elif name in ("sort", "dir", "q") and value != '':
+            view_params[name] = value
+    if view_params.get("dir", "asc") not in ("asc", "desc"):
+        raise ValueError(f"Invalid sort direction {view_params['dir']}")
+
+    return TableQuery(sort=view_params.get("sort"), descending=view_params.get("dir") == "desc",
+                      filters=tuple(filters), search=view_params.get("q")), view_params
+
+
+def generate_sort_headers(table_name: str, view_params: dict):
+    """
+    :return: column headers linking to the view sorted by the column, clicking the sorted column reverses the order
+    """
+    headers = []
+    for details in db_interface.get_table_fields_details(table_name):
+        sorted_desc = view_params.get("sort") == details.name and view_params.get("dir") != "desc"
+        params = {**view_params, "sort": details.name, "dir": "desc" if sorted_desc else "asc"}
+        headers.append(A(details.header, href=page_url(f"/{table_name}", params)))
+    return headers
+
+
+def generate_search(table_url: str, view_params: dict):
+    return Form(*[Input(type="hidden", name=name, value=value) for name, value in view_params.items() if name != "q"],
+                Input(type="search", name="q", value=view_params.get("q", ""), placeholder="Szukaj"),
+                action=table_url, method="GET")
+
+
+def generate_load_more(table_url, page: TablePage, limit: int, columns: int, scroll: bool,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                       view_params: dict = None):
+    if page.next_after is None:
+        return None
+    mode = "scroll" if scroll else "more"
+    view_params = view_params or {}
+    return Tr(Td(Button("Załaduj więcej", cls="button is-small",
+                        hx_get=page_url(table_url, view_params, **cursor_params(view_params, page, True),
+                                        limit=limit, mode=mode),
+                        hx_target="closest tr", hx_swap="outerHTML",
+                        hx_trigger="revealed" if scroll else None),
+                 colspan=columns))
+
+
+def generate_pagination(table_url, page: TablePage, limit: int, view_params: dict = None):
+    view_params = view_params or {}
+    return Group(
+        A("Poprzednia", href=page_url(table_url, view_params, **cursor_params(view_params, page, False), limit=limit),
+          role="button", cls="button is-small") if page.prev_before is not None else None,
+        A("Następna", href=page_url(table_url, view_params, **cursor_params(view_params, page, True), limit=limit),
+          role="button", cls="button is-small") if page.next_after is not None else None)
+
+
+def generate_table(headers, table_data, actions_url_prefix,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                   navigation=None, load_more=None, labels=None, live=None):
     return Container(Table(
         Thead(Tr(*[Th(col) for col in headers], Th("Akcje"))),
-        Tbody(*[Tr(*[Td(str(cell)) for cell in row],
-                   generate_action_buttons(actions_url_prefix, row[0])) for row in table_data])),
+        Tbody(*generate_rows(table_data, actions_url_prefix, labels), load_more, id="rows")),
+        navigation,
+        live,
         A("Nowy element", href=f"{actions_url_prefix}/new", role="button", cls="button is-small is-primary"))
 
 
-def generate_form(fields_details: List[FieldDetails], record_data:List[str], submit_url: str):
+def generate_live(table_url: str, tail: bool):
+    """
+    :param tail: the view shows the last rows in the primary key order, the inserted rows are appended to it
+    :return: element receiving the changes of the table from `/{table_name}/changes`, None when disabled
+    """
+    if not LIVE_UPDATES_ENABLED:
+        return None
+    return Div(Div(id="live-notice"), hx_ext="sse", sse_connect=page_url(f"{table_url}/changes", {"tail": int(tail)}),
+               sse_swap="change", hx_swap="none")
+
+
+def generate_select(field_details: FieldDetails, cell_value, options: List[Tuple[int, str]]):
+    return Select(Option("", value="") if not field_details.required or cell_value == '' else None,
+                  *[Option(label, value=str(key), selected=str(key) == str(cell_value)) for key, label in options],
+                  name=field_details.name, id=field_details.name, cls="select")
+
+
+def generate_choices(field_details: FieldDetails, cell_value):
+    return Group(*[Label(Input(type=field_details.form_type, name=field_details.name, value=choice,
+                               checked=str(cell_value) == choice), choice)
+                   for choice in field_details.choices],
+                 id=field_details.name)
+
+
+def generate_form(fields_details: List[FieldDetails], record_data:List[str], submit_url: str,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                  options: Dict[str, List[Tuple[int, str]]] = None, version: str = None,
+                  labels: Dict[str, str] = None):
+    """
+    :param options: select box options of the foreign key fields, see `DbInterface.get_reference_options`
+    :param version: version token of the edited record, sent back to detect concurrent changes
+    :param labels: labels of the current keys of the foreign key fields without the select box
+    """
+    options, labels = options or {}, labels or {}
     return Form(
         *[Div(
             Label(field_details.header, cls="label", for_=field_details.name)
                 if field_details.form_type != FormFieldTypes.HIDDEN else None,
+            generate_select(field_details, cell_value, options[field_details.name])
+                if field_details.name in options else
+            generate_choices(field_details, cell_value)
+                if field_details.choices else
             Input(value=str(cell_value), name=field_details.name, id=field_details.name,
-                  type=field_details.form_type, cls="input")
+                  type=field_details.form_type, cls="input"),
+            Small(labels[field_details.name]) if field_details.name in labels else None
         )
             for field_details, cell_value in zip(fields_details, record_data)
         ],
+        Input(type="hidden", name="version", value=version) if version is not None else None,
         Input(type="submit", value="Zapisz", cls="button is-primary"),
         action=submit_url,
         method="POST")
 
 
 @rt("/{table_name}")
-def get(table_name: str):
+async def get(table_name: str, request: Request, htmx: HtmxHeaders,  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+              after: int = None, before: int = None, limit: int = None, mode: str = None, key: str = None):
+    """
+    List view with keyset pagination, `mode` set to `more` or `scroll` replaces the page links
+    with htmx "load more" button or infinite scrolling. Sorting, filtering and searching
+    parameters are described in `parse_table_query`.
+    """
     if not db_interface.check_table_exists(table_name):
         return Response(status_code=404)
+    validators = page_validators(request, table_name)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        query, view_params = parse_table_query(table_name, request.query_params)
+        limit = min(max(limit or PAGE_SIZE, 1), PAGE_SIZE_MAX)
+        page = await db_call("get_table_page", table_name, after=after, before=before, limit=limit,
+                             query=query, key=json.loads(key) if key is not None else None)
+    except ValueError as error:
+        return Response(str(error), status_code=400)
+    labels = await db_call("resolve_references", table_name, page.rows)
+    table_headers = generate_sort_headers(table_name, view_params)
+    table_url = f"/{table_name}"
+
+    live = generate_live(table_url, tail=query == TableQuery() and page.next_after is None)
+
+    def content(rows):
+        if mode in ("more", "scroll"):
+            load_more = generate_load_more(table_url, page, limit, len(table_headers) + 1,
+                                           scroll=mode == "scroll", view_params=view_params)
+            if htmx.request and after is not None:
+                return *generate_rows(rows, table_url, labels), load_more
+            return page_template(header=table_name.capitalize(),
+                                 payload=(generate_search(table_url, view_params),
+                                          generate_table(table_headers, rows, table_url, load_more=load_more,
+                                                         labels=labels, live=live)))
+
+        return page_template(header=table_name.capitalize(),
+                             payload=(generate_search(table_url, view_params),
+                                      generate_table(table_headers, rows, table_url,
+                                                     navigation=generate_pagination(table_url, page, limit,
+                                                                                    view_params),
+                                                     labels=labels, live=live)))
+
+    if RENDER_MODE == "fast" and page.rows:
+        return render_streaming(request, content([sentinel_row(len(table_headers))]), page.rows, labels,
+                                validators)
+    return with_headers(content(page.rows), validators)
+
+
+def render_streaming(request, content, rows, labels,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                     headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Serializes `content` rendered with the sentinel row like FastHTML does, the rows are streamed in its place.
+    """
+    parts = split_page(_xt_cts(request, content))
+    return StreamingResponse(stream_page(parts, rows, labels), media_type="text/html; charset=utf-8",
+                             headers={**(headers or {}), "vary": VARY})
+
+
+@rt("/{table_name}/export")
+def get(table_name: str, format: str = "csv", gzip: bool = False):  # pylint: disable=redefined-builtin
+    if not db_interface.check_table_exists(table_name) or format not in ExportFormats:
+        return Response(status_code=404)
 
-    table_data = db_interface.get_table_data(table_name)
-    table_headers = db_interface.get_table_headers(table_name)
+    batches = db_interface.iter_table_data(table_name, batch_size=EXPORT_BATCH_SIZE)
+    if format == ExportFormats.CSV:
+        chunks = csv_chunks(db_interface.get_table_headers(table_name), batches)
+    else:
+        chunks = jsonl_chunks([field.name for field in db_interface.get_table_fields_details(table_name)], batches)
+
+    headers = {"Content-Disposition": f'attachment; filename="{table_name}.{format}{".gz" if gzip else ""}"'}
+    if gzip:
+        # the file itself is compressed, with Content-Encoding the clients would save it decompressed
+        return StreamingResponse(gzip_chunks(chunks), media_type=GZIP_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
 
-    return page_template(header=table_name.capitalize(),
-                         payload=generate_table(table_headers, table_data, f"/{table_name}"))
+
+@rt("/{table_name}/changes")
+async def get(table_name: str, tail: bool = False):
+    """
+    Server-Sent Events with the changes of the table, see `change_fragment`.
+    """
+    if not db_interface.check_table_exists(table_name) or db_interface.change_feed is None:
+        return Response(status_code=404)
+    return EventStream(change_events(table_name, tail))
+
+
+async def change_events(table_name: str, tail: bool):
+    """
+    Events of the changes committed by this process, the changes committed by other processes
+    are noticed by the table versions checked with every heartbeat.
+    """
+    tables = view_tables(table_name)
+    with db_interface.change_feed.subscribe(tables) as subscription:
+        version, _ = db_interface.get_table_version(tables)
+        while True:
+            event = await subscription.get(LIVE_HEARTBEAT)
+            current, _ = db_interface.get_table_version(tables)
+            if event is None:
+                if current == version:
+                    yield ": heartbeat\n\n"
+                    continue
+                event = ChangeEvent(table_name, None, ChangeKind.RELOAD)
+            version = current
+            yield sse_message(await change_fragment(table_name, event, tail), event="change")
+
+
+async def change_fragment(table_name: str, event: ChangeEvent, tail: bool):
+    """
+    Out-of-band fragment applying the change to the table view: the updated row replaces its row,
+    the removed one is deleted and the inserted one is appended when the view shows the last rows.
+    Other changes, e.g. bulk writes or changes of the referenced tables, show the notice to reload the view.
+    :param tail: the view shows the last rows in the primary key order
+    """
+    if event.table_name == table_name and event.kind == ChangeKind.DELETE:
+        return Tr(id=row_id(event.primary_key), hx_swap_oob="delete")
+    if event.table_name == table_name and event.kind in (ChangeKind.INSERT, ChangeKind.UPDATE):
+        record_data = await db_call("get_record_data", table_name, event.primary_key)
+        if record_data is None:
+            return Tr(id=row_id(event.primary_key), hx_swap_oob="delete")
+        labels = await db_call("resolve_references", table_name, [record_data])
+        row = generate_rows([record_data], f"/{table_name}", labels)[0]
+        if event.kind == ChangeKind.UPDATE:
+            return row(hx_swap_oob="true")
+        if tail:
+            return Tbody(row, hx_swap_oob="beforeend:#rows")
+    return Div(P(A("Dane tabeli zostały zmienione, odśwież widok", href="")), id="live-notice", hx_swap_oob="true")
 
 
 @rt("/{table_name}/remove")
-def delete(table_name: str, id:int):
+async def delete(table_name: str, id:int, htmx: HtmxHeaders):
+    """
+    The htmx request removes the row from the page with the empty response, the other views get it from the change feed.
+    """
     if not db_interface.check_table_exists(table_name):
         return Response(status_code=404)
 
-    db_interface.remove_table_row(table_name, id)
+    await db_call("remove_table_row", table_name, id)
+    if htmx.request:
+        return Response("")
     return Redirect(f"/{table_name}")
 
 
 @rt("/{table_name}/new")
-def get(table_name: str):
+async def get(table_name: str):
     if not db_interface.check_table_exists(table_name):
         return Response(status_code=404)
 
     table_fields_details = db_interface.get_table_fields_details(table_name)
     record_data = ['' for _ in table_fields_details]
+    options = await db_call("get_reference_options", table_name)
 
     return page_template(header=f"{table_name.capitalize()}, nowy record",
-                         payload=generate_form(table_fields_details, record_data, f"/{table_name}/0"))
+                         payload=generate_form(table_fields_details, record_data, f"/{table_name}/0", options))
 
 
 @rt("/{table_name}/edit/{id}")
-def get(table_name: str, id:int):
+async def get(table_name: str, id:int, request: Request):
     if not db_interface.check_table_exists(table_name):
         return Response(status_code=404)
+    validators = page_validators(request, table_name)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
 
     table_fields_details = db_interface.get_table_fields_details(table_name)
-    record_data = db_interface.get_record_data(table_name, id)
-
-    return page_template(header=f"{table_name.capitalize()}, record: {id}",
-                         payload=generate_form(table_fields_details, record_data, f"/{table_name}/{id}"))
-
-
-@rt("/kontraktorzy/{id}")
-def post(id:int, data:Kontraktor):
-    return post_processing('kontraktorzy', id, data)
-
-
-@rt("/pracownicy/{id}")
-def post(id:int, data:Pracownik):
-    return post_processing('pracownicy', id, data)
-
-
-@rt("/stanowiska/{id}")
-def post(id:int, data:Stanowisko):
-    return post_processing('stanowiska', id, data)
-
-
-@rt("/zespoly/{id}")
-def post(id:int, data:Zespol):
-    return post_processing('zespoly', id, data)
+    record_data = await db_call("get_record_data", table_name, id)
+    options = await db_call("get_reference_options", table_name)
+    references = await db_call("resolve_references", table_name, [record_data])
+    labels = {table_fields_details[index].name: names[record_data[index]]
+              for index, names in references.items()
+              if table_fields_details[index].name not in options and record_data[index] in names}
+
+    form = generate_form(table_fields_details, record_data, f"/{table_name}/{id}", options,
+                         db_interface.get_record_version(record_data), labels)
+    if db_interface.audit_log is not None:
+        form = Div(form, A("Historia zmian", href=f"/{table_name}/history/{id}"))
+    return with_headers(page_template(header=f"{table_name.capitalize()}, record: {id}", payload=form), validators)
+
+
+def describe_change(fields_details: List[FieldDetails], record: AuditRecord):
+    """
+    :return: changed fields of the audit record with their values before and after the change,
+        all the values of the inserted or removed record
+    """
+    before, after = record.before or {}, record.after or {}
+
+    def display(image: dict, name: str) -> str:
+        return "" if image.get(name) is None else str(image[name])
+
+    items = []
+    for field_details in fields_details:
+        old, new = display(before, field_details.name), display(after, field_details.name)
+        if record.before is not None and record.after is not None:
+            if old != new:
+                items.append(Li(f"{field_details.header}: {old} → ", Mark(new)))
+        elif old or new:
+            items.append(Li(f"{field_details.header}: {old or new}"))
+    return Ul(*items)
+
+
+@rt("/{table_name}/history/{id}")
+async def get(table_name: str, id: int, before: int = None):
+    """
+    Changes of the record from the audit log, newest first, paged with the id of the last shown change.
+    """
+    if not db_interface.check_table_exists(table_name) or db_interface.audit_log is None:
+        return Response(status_code=404)
 
+    records, has_more = await db_call("get_record_history", table_name, id, before, PAGE_SIZE)
+    fields_details = db_interface.get_table_fields_details(table_name)
+    kinds = {ChangeKind.INSERT: "dodanie", ChangeKind.UPDATE: "zmiana", ChangeKind.DELETE: "usunięcie"}
+    rows = [Tr(Td(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.changed_at))), Td(record.actor or ""),
+               Td(kinds.get(record.kind, str(record.kind))), Td(describe_change(fields_details, record)))
+            for record in records]
+    history_url = f"/{table_name}/history/{id}"
+    links = [A("Rekord", href=f"/{table_name}/edit/{id}", role="button", cls="button is-small")]
+    if before is not None:
+        links.append(A("Najnowsze", href=history_url, role="button", cls="button is-small"))
+    if has_more:
+        links.append(A("Starsze", href=page_url(history_url, {}, before=records[-1].id), role="button",
+                       cls="button is-small"))
+    queued = db_interface.audit_log.stats().queued
+    return page_template(header=f"{table_name.capitalize()}, historia rekordu: {id}",
+                         payload=Div(P(f"Zmiany oczekujące na zapis: {queued}") if queued else "",
+                                     Table(Thead(Tr(Th("Kiedy"), Th("Kto"), Th("Operacja"), Th("Pola"))),
+                                           Tbody(*rows)) if rows else P("Brak zapisanych zmian."),
+                                     Div(*links)))
+
+
+async def parse_bulk_request(table_name: str, request, op: str):
+    """
+    :return: mapping of operation (insert/update/delete) to records, or primary keys for delete;
+        JSON body is an object with the operations as keys, CSV body holds one operation given by `op`
+    """
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        if op not in ("insert", "update", "delete"):
+            raise ValueError(f"Invalid bulk operation {op}")
+        rows = list(csv.DictReader(io.StringIO((await request.body()).decode("utf-8"))))
+        payload = {op: rows}
+    else:
+        payload = await request.json()
+        if not isinstance(payload, dict):
+            raise ValueError("Invalid bulk request, JSON object expected")
+
+    primary_key = TABLE_DETAILS[table_name].primary_key
+    operations = {}
+    for operation in ("insert", "update"):
+        if payload.get(operation):
+            operations[operation] = [create_record(table_name, {primary_key: 0, **item} if operation == "insert"
+                                                   else item)
+                                     for item in payload[operation]]
+    if payload.get("delete"):
+        operations["delete"] = [item[primary_key] if isinstance(item, dict) else item for item in payload["delete"]]
+    return operations
+
+
+async def bulk(request: Request):
+    """
+    Plain Starlette endpoint, FastHTML parses a JSON body into the form fields before calling its handlers,
+    which fails with 500 for the bodies other than JSON objects.
+    """
+    table_name = request.path_params["table_name"]
+    if not db_interface.check_table_exists(table_name):
+        return Response(status_code=404)
 
-def post_processing(table_name: str, id:int, data: type[Kontraktor | Pracownik | Stanowisko | Zespol]):
+    try:
+        chunk_size = int(request.query_params.get("chunk_size") or 0)
+        operations = await parse_bulk_request(table_name, request, request.query_params.get("op"))
+    except (ValueError, TypeError, KeyError) as error:
+        return JSONResponse({"error": str(error)}, status_code=400)
+
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    methods = {"insert": "insert_table_rows", "update": "update_table_rows", "delete": "remove_table_rows"}
+    result = {}
+    for operation, items in operations.items():
+        try:
+            chunks = await db_call(methods[operation], table_name, items, chunk_size)
+        except DbError as error:
+            result[operation] = {"error": str(error)}
+            return JSONResponse(result, status_code=409)
+        result[operation] = {"rows": sum(chunk.rows for chunk in chunks),
+                             "seconds": sum(chunk.seconds for chunk in chunks),
+                             "chunks": [chunk._asdict() for chunk in chunks]}
+    return JSONResponse(result)
+
+
+app.routes.append(Route("/{table_name}/bulk", bulk, methods=["POST"]))
+
+
+@rt("/{table_name}/import")
+async def post(table_name: str, request: Request, chunk_size: int = None):
+    """
+    Imports CSV request body, the body is spooled to a temporary file and parsed row by row.
+    """
     if not db_interface.check_table_exists(table_name):
         return Response(status_code=404)
 
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        lines = io.TextIOWrapper(spool, encoding="utf-8", newline='')
+        try:
+            report = await blocking_call(import_csv, db_interface, table_name, lines,
+                                         chunk_size=chunk_size or BULK_CHUNK_SIZE)
+        except (ValueError, UnicodeDecodeError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        except DbError as error:
+            return JSONResponse({"error": str(error)}, status_code=409)
+        finally:
+            lines.detach()
+
+    return JSONResponse({"rows_read": report.rows_read,
+                         "rows_inserted": report.rows_inserted,
+                         "rows_rejected": report.rows_rejected,
+                         "rejects": [reject._asdict() for reject in report.rejects],
+                         "seconds": report.seconds,
+                         "rows_per_second": report.rows_per_second})
+
+
+@rt("/{table_name}/{id}")
+async def post(table_name: str, id:int, request: Request):
+    """
+    Saves the record of any registered table, the form fields are converted to the table's dataclass.
+    """
+    if not db_interface.check_table_exists(table_name):
+        return Response(status_code=404)
+    form = await request.form()
+    try:
+        data = parse_form_record(table_name, form)
+    except ValueError as error:
+        return Response(str(error), status_code=400)
+    return await post_processing(table_name, id, data, request, form.get("version"))
+
+
+def generate_conflict(table_name: str, id: int, data, current_data,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                      options: Dict[str, List[Tuple[int, str]]]):
+    """
+    :return: submitted and current values side by side, with the form to save the submitted values over the current ones
+    """
+    fields_details = db_interface.get_table_fields_details(table_name)
+    if current_data is None:
+        return Div(P("Rekord został usunięty przez innego użytkownika."),
+                   A("Powrót", href=f"/{table_name}", role="button", cls="button is-small"))
+
+    def display(field_details: FieldDetails, value) -> str:
+        # submitted values are converted from the form, the current ones and the option keys are the column types
+        labels = {str(key): label for key, label in options.get(field_details.name, [])}
+        return labels.get(str(value), str(value)) if value is not None else ""
+
+    submitted = data.to_params()
+    rows = []
+    for index, field_details in enumerate(fields_details):
+        mine, theirs = display(field_details, submitted[index]), display(field_details, current_data[index])
+        rows.append(Tr(Td(field_details.header), *[Td(Mark(value) if mine != theirs else value)
+                                                     for value in (mine, theirs)]))
+    return Div(P("Rekord został zmieniony przez innego użytkownika. Zapisanie formularza nadpisze aktualne wartości."),
+               Table(Thead(Tr(Th("Pole"), Th("Twoja wartość"), Th("Aktualna wartość"))), Tbody(*rows)),
+               generate_form(fields_details, submitted, f"/{table_name}/{id}", options,
+                             db_interface.get_record_version(current_data)))
+
+
+async def post_processing(table_name: str, id:int, data: type[Kontraktor | Pracownik | Stanowisko | Zespol],
+                          request: Request, version: str = None):
     if id > 0:
-        db_interface.update_table_row(table_name, id, data)
+        try:
+            await db_call("update_table_row", table_name, id, data, version)
+        except RecordConflictError:
+            current_data = await db_call("get_record_data", table_name, id)
+            options = await db_call("get_reference_options", table_name)
+            content = page_template(header=f"{table_name.capitalize()}, konflikt edycji rekordu: {id}",
+                                    payload=generate_conflict(table_name, id, data, current_data, options))
+            return HTMLResponse(_xt_cts(request, content), status_code=409)
     else:
-        db_interface.insert_table_row(table_name, data)
+        await db_call("insert_table_row", table_name, data)
 
     return Redirect(f"/{table_name}")
 
@@ -0,0 +1,313 @@
+"""
+Audit log of the writes done through `DbInterface`: before and after images of the rows, recorded when
+the transaction commits and written in batches by a background thread, off the request path.
+"""
+import contextvars
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from crud_app.changes import ChangeKind
+from crud_app.db_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+AUDIT_TABLE = "audit_log"
+INSERT_STATEMENT = (f"INSERT INTO {AUDIT_TABLE} (table_name, record_id, kind, actor, changed_at, before_data, "
+                    "after_data) VALUES (%s, %s, %s, %s, %s, %s, %s)")
+HISTORY_STATEMENT = (f"SELECT id, table_name, record_id, kind, actor, changed_at, before_data, after_data "
+                     f"FROM {AUDIT_TABLE} WHERE table_name = %s AND record_id = %s AND id < %s "
+                     "ORDER BY id DESC LIMIT %s")
+
+AUDIT_ACTOR: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("audit_actor", default=None)
+
+
+class AuditSettings(NamedTuple):
+    """
+    NamedTuple representing the configuration of the audit log, records are written to the `audit_log` table
+    or, with `file` set, appended to the JSON lines file. When the queue is full the write waits up to
+    `block_timeout` seconds for the space, the record is dropped then.
+    """
+    queue_size: int = 10000
+    batch_size: int = 200
+    flush_delay: float = 0.0
+    block_timeout: float = 0.0
+    retries: int = 3
+    backoff: float = 0.5
+    file: str = ""
+
+
+class AuditRecord(NamedTuple):
+    """
+    NamedTuple representing the change of the row, `before` is not set for the inserted rows and `after`
+    for the removed ones. `id` is assigned by the audit log storage.
+    """
+    table_name: str
+    primary_key: Optional[int]
+    kind: ChangeKind
+    before: Optional[dict]
+    after: Optional[dict]
+    actor: Optional[str]
+    changed_at: float
+    id: Optional[int] = None
+
+
+class AuditStats(NamedTuple):
+    """
+    NamedTuple representing a snapshot of the audit log counters, `queued` and `dropped` show the backpressure.
+    """
+    recorded: int
+    written: int
+    dropped: int
+    failed: int
+    batches: int
+    queued: int
+    queue_size: int
+    blocked_seconds: float
+    last_batch_seconds: float
+
+
+def audit_record(table_name: str, primary_key: Optional[int], kind: ChangeKind,
+                 before: Optional[dict], after: Optional[dict]) -> AuditRecord:
+    """
+    :return: record of the change made now by the actor of the current request
+    """
+    return AuditRecord(table_name=table_name, primary_key=primary_key, kind=kind, before=before, after=after,
+                       actor=AUDIT_ACTOR.get(), changed_at=time.time())
+
+
+def _dumps(image: Optional[dict]) -> Optional[str]:
+    # dates and DECIMAL values are stored as their text
+    return json.dumps(image, default=str, ensure_ascii=False) if image is not None else None
+
+
+def _loads(image: Optional[str]) -> Optional[dict]:
+    return json.loads(image) if image is not None else None
+
+
+class DbAuditSink:
+    """
+    Class representing the `audit_log` table, see `db/migrations/003_audit_log.sql`, the rows are only inserted.
+    """
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def write(self, records: List[AuditRecord]):
+        """
+        :param records: records inserted with a single multi-row INSERT and committed
+        """
+        with self.pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.executemany(INSERT_STATEMENT, [
+                    (record.table_name, record.primary_key, str(record.kind), record.actor,
+                     datetime.fromtimestamp(record.changed_at), _dumps(record.before), _dumps(record.after))
+                    for record in records])
+            connection.commit()
+
+    def history(self, table_name: str, primary_key: int, before: Optional[int], limit: int) -> List[AuditRecord]:
+        """
+        :param before: id of the record the page ends before, the newest records when not set
+        :param limit: maximal number of records
+        :return: records of the row, the newest first
+        """
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(HISTORY_STATEMENT, (table_name, primary_key, before or 2 ** 63 - 1, limit))
+            rows = cursor.fetchall()
+        return [AuditRecord(table_name=table, primary_key=key, kind=ChangeKind(kind), before=_loads(before_data),
+                            after=_loads(after_data), actor=actor, changed_at=changed_at.timestamp(), id=id)
+                for id, table, key, kind, actor, changed_at, before_data, after_data in rows]
+
+
+class FileAuditSink:
+    """
+    Class representing the local audit log file, one JSON object per line, the line number is the id of the record.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, records: List[AuditRecord]):
+        """
+        :param records: records appended to the file and flushed
+        """
+        lines = "".join(json.dumps(record._asdict(), default=str, ensure_ascii=False) + "\n"
+                        for record in records)
+        with self._lock, open(self.path, "a", encoding="utf-8") as log_file:
+            log_file.write(lines)
+
+    def history(self, table_name: str, primary_key: int, before: Optional[int], limit: int) -> List[AuditRecord]:
+        """
+        Scans the whole file, meant for small deployments.
+        """
+        records = []
+        try:
+            with self._lock, open(self.path, encoding="utf-8") as log_file:
+                for number, line in enumerate(log_file, start=1):
+                    if before is not None and number >= before:
+                        break
+                    item = json.loads(line)
+                    if item["table_name"] == table_name and item["primary_key"] == primary_key:
+                        records.append(AuditRecord(**{**item, "kind": ChangeKind(item["kind"]), "id": number}))
+        except FileNotFoundError:
+            return []
+        return records[::-1][:limit]
+
+
+_STOP = object()
+
+
+class AuditLog:  # pylint: disable=too-many-instance-attributes
+    """
+    Class representing the bounded queue of the audit records and its writer thread. The writer takes all
+    the queued records, up to `batch_size`, so the batches grow with the load; failed batches are retried
+    with the backoff, and counted as failed afterwards. The thread is started by the first record.
+    """
+    def __init__(self, sink: DbAuditSink | FileAuditSink, settings: AuditSettings = AuditSettings()):
+        if settings.queue_size < 1 or settings.batch_size < 1:
+            raise ValueError(f"Invalid audit queue size {settings.queue_size} or batch size {settings.batch_size}")
+        self.sink = sink
+        self.settings = settings
+        self._queue: queue.Queue = queue.Queue(settings.queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._recorded = self._written = self._dropped = self._failed = self._batches = 0
+        self._blocked_seconds = self._last_batch_seconds = 0.0
+
+    def record(self, records: Iterable[AuditRecord]):
+        """
+        Queues the records of the committed transaction, waits for the space at most `block_timeout`.
+        """
+        self._start()
+        recorded = dropped = 0
+        blocked = 0.0
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+                recorded += 1
+                continue
+            except queue.Full:
+                if not self.settings.block_timeout:
+                    dropped += 1
+                    continue
+            started = time.perf_counter()
+            try:
+                self._queue.put(record, timeout=self.settings.block_timeout)
+                recorded += 1
+            except queue.Full:
+                dropped += 1
+            blocked += time.perf_counter() - started
+        with self._lock:
+            self._recorded += recorded
+            self._dropped += dropped
+            self._blocked_seconds += blocked
+        if dropped:
+            logger.warning("audit log queue is full, %d records dropped", dropped)
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            if self.settings.flush_delay:
+                time.sleep(self.settings.flush_delay)
+            while len(batch) < self.settings.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[AuditRecord]):
+        started = time.perf_counter()
+        for attempt in range(self.settings.retries + 1):
+            try:
+                self.sink.write(batch)
+                break
+            except Exception:  # pylint: disable=broad-exception-caught
+                if attempt == self.settings.retries:
+                    logger.exception("audit log batch of %d records failed", len(batch))
+                    with self._lock:
+                        self._failed += len(batch)
+                    return
+                time.sleep(self.settings.backoff * 2 ** attempt)
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_batch_seconds = time.perf_counter() - started
+
+    def history(self, table_name: str, primary_key: int, before: Optional[int] = None,
+                limit: int = 20) -> Tuple[List[AuditRecord], bool]:
+        """
+        Records still in the queue are not seen.
+        :return: page of the records of the row, the newest first, and whether older records follow
+        """
+        records = self.sink.history(table_name, primary_key, before, limit + 1)
+        return records[:limit], len(records) > limit
+
+    def close(self, timeout: float = 10.0):
+        """
+        Writes the queued records and stops the writer thread.
+        """
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("audit log writer is not keeping up, %d records not written", self._queue.qsize())
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> AuditStats:
+        """
+        :return: audit log counters and the current length of the queue
+        """
+        with self._lock:
+            return AuditStats(recorded=self._recorded, written=self._written, dropped=self._dropped,
+                              failed=self._failed, batches=self._batches, queued=self._queue.qsize(),
+                              queue_size=self.settings.queue_size, blocked_seconds=self._blocked_seconds,
+                              last_batch_seconds=self._last_batch_seconds)
+
+
+class AuditActorMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware setting the actor of the audited writes: the user name passed by the authenticating
+    reverse proxy in the `header`, the client address otherwise. Any client may send the header, so it is
+    only read from the `trusted_proxies` addresses (`*` for all) and not at all when the header is not set.
+    """
+    def __init__(self, app, header: str = "", trusted_proxies: Sequence[str] = ("127.0.0.1",)):
+        self.app = app
+        self.header = header.lower().encode("latin-1") if header else None
+        self.trusted_proxies = frozenset(trusted_proxies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else None
+        actor = None
+        if self.header is not None and ("*" in self.trusted_proxies or client in self.trusted_proxies):
+            actor = next((value.decode("latin-1") for name, value in scope["headers"] if name == self.header), None)
+        if actor is None:
+            actor = client
+        token = AUDIT_ACTOR.set(actor)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            AUDIT_ACTOR.reset(token)
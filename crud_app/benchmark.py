@@ -0,0 +1,479 @@
+"""
+Benchmark and load test of the `DbInterface` methods and the application routes against MariaDB/MySQL.
+
+Usage:
+    python -m crud_app.benchmark seed --rows 100000 [--volume kontraktorzy=10000] [--migrate]
+    python -m crud_app.benchmark run [--target db,routes] [--concurrency 1,4,16] [--requests 200]
+                                     [--output results.json] [--compare previous.json]
+
+The database is configured with the DB_* keys, like the application; `seed` tops the tables up to the volumes
+with generated rows following `db/lab_db_v3.sql`, so repeated runs measure the same data.
+The write benchmarks remove the rows they insert.
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from crud_app.db import DbInterface
+from crud_app.db_structure import Kontraktor, Pracownik, Stanowisko, TABLE_DETAILS, TableQuery, Tables, Zespol
+from crud_app.fast_render import sentinel_row, split_page, stream_page
+from crud_app.settings import create_db_interface, create_pool_settings
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "db" / "migrations"
+
+# rows of every table per `--rows`, the dictionary tables stay small like in the original data
+VOLUME_RATIOS = {
+    Tables.STANOWISKA: 0.001,
+    Tables.ZESPOLY: 0.001,
+    Tables.PRACOWNICY: 1.0,
+    Tables.KONTRAKTORZY: 0.1,
+}
+MIN_VOLUME = 10
+
+FIRST_NAMES = ("Jan", "Anna", "Marek", "Aleksandra", "Zdzislaw", "Michal", "Karol", "Krzysztof", "Ewa", "Maria")
+LAST_NAMES = ("Kowalski", "Nowak", "Marecki", "Olska", "Jablonski", "Testowy", "Michalski", "Karolewski",
+              "Wisniewski", "Wojcik")
+DEPARTMENTS = ("PRODUKCJA", "BADANIA I ROZWOJ", "ADMINISTRACJA")
+
+BENCHMARK_TABLE = Tables.PRACOWNICY
+
+
+class BenchmarkResult(NamedTuple):
+    """
+    NamedTuple representing the measurements of one operation at one concurrency level.
+    """
+    target: str
+    operation: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    throughput: float
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    :param sorted_values: values in ascending order
+    :param fraction: percentile as the fraction, e.g. 0.95
+    :return: nearest-rank percentile, 0 for no values
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+def run_operation(target: str, name: str, operation: Callable[[int], object],  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                  concurrency: int, requests: int) -> BenchmarkResult:
+    """
+    Calls `operation(index)` for indexes 0..requests-1 from `concurrency` threads.
+    :return: latency percentiles, throughput and number of failed calls
+    """
+    indexes = itertools.count()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        measured, failed = [], 0
+        while (index := next(indexes)) < requests:
+            started = time.perf_counter()
+            try:
+                operation(index)
+            except Exception:  # pylint: disable=broad-exception-caught
+                failed += 1
+            measured.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(measured)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return BenchmarkResult(target=target, operation=name, concurrency=concurrency, requests=requests,
+                           errors=errors, seconds=seconds,
+                           p50_ms=percentile(latencies, 0.50) * 1000,
+                           p95_ms=percentile(latencies, 0.95) * 1000,
+                           p99_ms=percentile(latencies, 0.99) * 1000,
+                           throughput=requests / seconds if seconds else 0.0)
+
+
+def compare_results(previous: dict, current: dict, tolerance: float = 0.2) -> List[str]:
+    """
+    :param previous: results saved by the earlier run
+    :param current: results of this run
+    :param tolerance: allowed relative increase of p95 and decrease of throughput
+    :return: description of every regression
+    """
+    baseline = {(item["target"], item["operation"], item["concurrency"]): item for item in previous["results"]}
+    regressions = []
+    for item in current["results"]:
+        before = baseline.get((item["target"], item["operation"], item["concurrency"]))
+        if before is None:
+            continue
+        label = f"{item['target']}/{item['operation']} x{item['concurrency']}"
+        if item["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {before['p95_ms']:.2f}ms -> {item['p95_ms']:.2f}ms")
+        if item["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput']:.1f}/s -> {item['throughput']:.1f}/s")
+    return regressions
+
+
+def volumes_for(rows: int, overrides: Dict[str, int] = None) -> Dict[Tables, int]:
+    """
+    :param rows: number of `pracownicy` rows, other tables are scaled by `VOLUME_RATIOS`
+    :param overrides: number of rows per table name
+    :return: number of rows to generate per table
+    """
+    volumes = {table: max(MIN_VOLUME, int(rows * ratio)) for table, ratio in VOLUME_RATIOS.items()}
+    for table_name, volume in (overrides or {}).items():
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+        volumes[Tables(table_name)] = volume
+    return volumes
+
+
+def _hire_date(rng: random.Random) -> str:
+    return (date(2000, 1, 1) + timedelta(days=rng.randrange(25 * 365))).isoformat()
+
+
+def generate_records(table_name: Tables, count: int, rng: random.Random,
+                     references: Dict[Tables, List[int]] = None) -> Iterator[object]:
+    """
+    :param table_name: table name
+    :param count: number of records
+    :param rng: random generator, seeded for repeatable data
+    :param references: primary keys of the referenced tables, required by `pracownicy` and `kontraktorzy`
+    :return: records with the primary key set to 0, assigned by the database
+    """
+    references = references or {}
+    for index in range(count):
+        if table_name == Tables.STANOWISKA:
+            low = rng.randrange(3000, 20000, 500)
+            yield Stanowisko(0, f"STANOWISKO {index}", low,
+                             None if rng.random() < 0.2 else low + rng.randrange(0, 10000, 500))
+        elif table_name == Tables.ZESPOLY:
+            yield Zespol(0, f"ZESPOL {index}", rng.choice(DEPARTMENTS))
+        elif table_name == Tables.PRACOWNICY:
+            yield Pracownik(0, rng.choice(FIRST_NAMES), f"{rng.choice(LAST_NAMES)} {index}",
+                            stanowisko=rng.choice(references[Tables.STANOWISKA]),
+                            przelozony=rng.choice(references[Tables.PRACOWNICY]),
+                            zespol=rng.choice(references[Tables.ZESPOLY]),
+                            data_zatrudn=_hire_date(rng), wynagrodzenie=rng.randrange(3000, 25000, 100),
+                            plec=rng.choice("KM"))
+        else:
+            yield Kontraktor(0, rng.choice(FIRST_NAMES), f"{rng.choice(LAST_NAMES)} {index}",
+                             przelozony=rng.choice(references[Tables.PRACOWNICY]),
+                             data_zatrudn=_hire_date(rng), stawka_godzinowa=rng.randrange(100, 250, 5),
+                             plec=rng.choice("KM"))
+
+
+def primary_keys(db_interface: DbInterface, table_name: Tables) -> List[int]:
+    """
+    :return: all the primary keys of the table, streamed from the database
+    """
+    return [row[0] for rows in db_interface.iter_table_data(table_name, batch_size=10000) for row in rows]
+
+
+def apply_migrations(db_interface: DbInterface, migrations_dir: Path = MIGRATIONS_DIR):
+    """
+    Runs the `db/migrations/*.sql` files in name order, the statements are idempotent.
+    """
+    for path in sorted(migrations_dir.glob("*.sql")):
+        script = "\n".join(line for line in path.read_text(encoding="utf-8").splitlines()
+                           if not line.lstrip().startswith("--"))
+        with db_interface.pool.connection() as connection, connection.cursor() as cursor:
+            for statement in filter(None, (item.strip() for item in script.split(";"))):
+                cursor.execute(statement)
+            connection.commit()
+
+
+def seed(db_interface: DbInterface, volumes: Dict[Tables, int], chunk_size: int = 5000,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+         rng_seed: int = 0, progress: Callable[[Tables, int, int], None] = None) -> Dict[Tables, int]:
+    """
+    Appends generated rows to the tables until they hold `volumes` rows, tables already at the volume
+    are skipped. Referenced tables go first so the foreign keys point to existing rows.
+    Records are generated and inserted chunk by chunk, memory does not grow with the volume.
+    :param progress: called with the table name, inserted and missing number of rows after every chunk
+    :return: number of inserted rows per table
+    """
+    rng = random.Random(rng_seed)
+    references: Dict[Tables, List[int]] = {}
+    missing: Dict[Tables, int] = {}
+    for table_name in (Tables.STANOWISKA, Tables.ZESPOLY, Tables.PRACOWNICY, Tables.KONTRAKTORZY):
+        existing = primary_keys(db_interface, table_name)
+        if table_name == Tables.PRACOWNICY:
+            # the first employees are the supervisors of the generated ones
+            references[Tables.PRACOWNICY] = existing[:1000] or [0]
+        missing[table_name] = max(0, volumes.get(table_name, 0) - len(existing))
+        records = generate_records(table_name, missing[table_name], rng, references)
+        inserted = 0
+        while chunk := list(itertools.islice(records, chunk_size)):
+            db_interface.insert_table_rows(table_name, chunk, chunk_size)
+            inserted += len(chunk)
+            if progress is not None:
+                progress(table_name, inserted, missing[table_name])
+        references[table_name] = primary_keys(db_interface, table_name) if inserted else existing
+    return missing
+
+
+def _marked_keys(db_interface: DbInterface, marker: str, count: int) -> List[int]:
+    # rows inserted through the routes, the redirect does not carry their primary keys
+    page = db_interface.get_table_page(BENCHMARK_TABLE, limit=count,
+                                       query=TableQuery(filters=(("nazwisko", "=", marker),)))
+    return [row[0] for row in page.rows]
+
+
+def _new_employee(index: int, references: Dict[Tables, List[int]]) -> Pracownik:
+    return Pracownik(0, "Benchmark", f"Nowy {index}",
+                     stanowisko=references[Tables.STANOWISKA][index % len(references[Tables.STANOWISKA])],
+                     przelozony=references[Tables.PRACOWNICY][index % len(references[Tables.PRACOWNICY])],
+                     zespol=references[Tables.ZESPOLY][index % len(references[Tables.ZESPOLY])],
+                     data_zatrudn="2024-01-01", wynagrodzenie=5000, plec="K")
+
+
+def _benchmark_inserts(db_interface: DbInterface, references: Dict[Tables, List[int]], concurrency: int,
+                       requests: int) -> Tuple[BenchmarkResult, Tuple[int, ...]]:
+    """
+    :return: measurements of `insert_table_row` and the primary keys of the inserted rows
+    """
+    inserted: List[int] = []
+    result = run_operation("db", "insert_table_row", lambda index: inserted.append(
+        db_interface.insert_table_row(BENCHMARK_TABLE, _new_employee(index, references))), concurrency, requests)
+    return result, tuple(inserted)
+
+
+def benchmark_db(db_interface: DbInterface, concurrency_levels: List[int], requests: int,  # pylint: disable=too-many-locals
+                 page_size: int = 100) -> List[BenchmarkResult]:
+    """
+    Measures the `DbInterface` methods on the `pracownicy` table.
+    """
+    references = {table: primary_keys(db_interface, table)
+                  for table in (Tables.STANOWISKA, Tables.ZESPOLY, Tables.PRACOWNICY)}
+    ids = references[Tables.PRACOWNICY]
+    page_rows = db_interface.get_table_page(BENCHMARK_TABLE, limit=page_size).rows
+    sorted_query = TableQuery(sort="nazwisko", search="Nowak")
+
+    reads = {
+        "get_table_page": lambda index: db_interface.get_table_page(BENCHMARK_TABLE, limit=page_size),
+        "get_table_page_deep": lambda index: db_interface.get_table_page(
+            BENCHMARK_TABLE, after=ids[index * 7919 % len(ids)], limit=page_size),
+        "get_table_page_sorted": lambda index: db_interface.get_table_page(
+            BENCHMARK_TABLE, limit=page_size, query=sorted_query),
+        "get_record_data": lambda index: db_interface.get_record_data(BENCHMARK_TABLE, ids[index * 7919 % len(ids)]),
+        "resolve_references": lambda index: db_interface.resolve_references(BENCHMARK_TABLE, page_rows),
+        "get_reference_options": lambda index: db_interface.get_reference_options(BENCHMARK_TABLE),
+    }
+    results = []
+    for concurrency in concurrency_levels:
+        for name, operation in reads.items():
+            results.append(run_operation("db", name, operation, concurrency, requests))
+
+        result, new_ids = _benchmark_inserts(db_interface, references, concurrency, requests)
+        results.append(result)
+
+        def update(index, new_ids=new_ids):
+            record = _new_employee(index, references)
+            record.idprac = new_ids[index % len(new_ids)]
+            db_interface.update_table_row(BENCHMARK_TABLE, record.idprac, record)
+
+        results.append(run_operation("db", "update_table_row", update, concurrency, requests))
+        results.append(run_operation("db", "remove_table_row", lambda index, new_ids=new_ids:
+                                     db_interface.remove_table_row(BENCHMARK_TABLE, new_ids[index]),
+                                     concurrency, len(new_ids)))
+    return results
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return response
+
+
+def benchmark_routes(client, db_interface: DbInterface, concurrency_levels: List[int],
+                     requests: int) -> List[BenchmarkResult]:
+    """
+    Measures the list, edit form, insert, update and delete routes of the `pracownicy` table.
+    :param client: HTTP client with `get`/`post`/`delete`, Starlette `TestClient` or `httpx.Client`
+    """
+    references = {table: primary_keys(db_interface, table)
+                  for table in (Tables.STANOWISKA, Tables.ZESPOLY, Tables.PRACOWNICY)}
+    ids = references[Tables.PRACOWNICY]
+    url = f"/{BENCHMARK_TABLE}"
+
+    def form(index, marker):
+        return {**{details.name: "" if value is None else str(value)
+                   for details, value in zip(TABLE_DETAILS[BENCHMARK_TABLE].fields_details,
+                                             _new_employee(index, references).to_params())},
+                "nazwisko": marker}
+
+    reads = {
+        "list": lambda index: _checked(client.get(url)),
+        "list_deep": lambda index: _checked(client.get(url, params={"after": ids[index * 7919 % len(ids)]})),
+        "edit_form": lambda index: _checked(client.get(f"{url}/edit/{ids[index * 7919 % len(ids)]}")),
+    }
+    results = []
+    for concurrency in concurrency_levels:
+        for name, operation in reads.items():
+            results.append(run_operation("routes", name, operation, concurrency, requests))
+
+        marker = f"Benchmark {concurrency} {time.time_ns()}"
+        results.append(run_operation("routes", "insert", lambda index, marker=marker: _checked(
+            client.post(f"{url}/0", data=form(index, marker), follow_redirects=False)), concurrency, requests))
+        new_ids = _marked_keys(db_interface, marker, requests)
+        results.append(run_operation("routes", "update", lambda index, new_ids=new_ids, marker=marker: _checked(
+            client.post(f"{url}/{new_ids[index % len(new_ids)]}",
+                        data={**form(index, marker), "idprac": str(new_ids[index % len(new_ids)])},
+                        follow_redirects=False)), concurrency, requests))
+        results.append(run_operation("routes", "delete", lambda index, new_ids=new_ids: _checked(
+            client.delete(f"{url}/remove", params={"id": new_ids[index]}, follow_redirects=False)),
+                                     concurrency, len(new_ids)))
+    return results
+
+
+def benchmark_render(rows_count: int, requests: int) -> List[BenchmarkResult]:
+    """
+    Compares rendering of the table with `rows_count` generated rows by the FastHTML components
+    and by the fast row template, the outputs are checked to be identical first.
+    """
+    from fasthtml.common import to_xml  # pylint: disable=import-outside-toplevel
+    from crud_app.app import generate_table  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(0)
+    references = {Tables.STANOWISKA: list(range(1, 8)), Tables.ZESPOLY: list(range(1, 9)),
+                  Tables.PRACOWNICY: list(range(100, 110))}
+    rows = [(index + 1, *record.to_params()[1:])
+            for index, record in enumerate(generate_records(BENCHMARK_TABLE, rows_count, rng, references))]
+    labels = {3: {key: f"STANOWISKO {key}" for key in references[Tables.STANOWISKA]},
+              4: {key: f"Jan Kowalski {key}" for key in references[Tables.PRACOWNICY]},
+              6: {key: f"ZESPOL {key}" for key in references[Tables.ZESPOLY]}}
+    headers = [field.header for field in TABLE_DETAILS[BENCHMARK_TABLE].fields_details]
+    url = f"/{BENCHMARK_TABLE}"
+
+    def components(_):
+        return to_xml(generate_table(headers, rows, url, labels=labels))
+
+    parts = split_page(to_xml(generate_table(headers, [sentinel_row(len(headers))], url, labels=labels)))
+
+    def fast(_):
+        return b"".join(stream_page(parts, rows, labels)).decode("utf-8")
+
+    if fast(0) != components(0):
+        raise RuntimeError("fast renderer output differs from the components")
+    return [run_operation("render", f"{name}_{rows_count}", operation, 1, requests)
+            for name, operation in (("components", components), ("fast", fast))]
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def _volume(value: str):
+    table_name, _, volume = value.partition("=")
+    return table_name, int(volume)
+
+
+def _print_results(results: List[BenchmarkResult]):
+    print(f"{'target':<8}{'operation':<24}{'conc':>5}{'reqs':>7}{'errors':>7}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for item in results:
+        print(f"{item.target:<8}{item.operation:<24}{item.concurrency:>5}{item.requests:>7}{item.errors:>7}"
+              f"{item.p50_ms:>10.2f}{item.p95_ms:>10.2f}{item.p99_ms:>10.2f}{item.throughput:>10.1f}")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark of the CRUD application")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed_parser = commands.add_parser("seed", help="top the tables up to the volume with generated rows")
+    seed_parser.add_argument("--rows", type=int, default=1000, help="rows of pracownicy, other tables are scaled")
+    seed_parser.add_argument("--volume", type=_volume, action="append", default=[], help="table=rows override")
+    seed_parser.add_argument("--chunk-size", type=int, default=5000)
+    seed_parser.add_argument("--seed", type=int, default=0)
+    seed_parser.add_argument("--migrate", action="store_true", help="apply db/migrations first")
+    run_parser = commands.add_parser("run", help="measure the methods and routes")
+    run_parser.add_argument("--target", default="db,routes,render")
+    run_parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    run_parser.add_argument("--requests", type=int, default=200, help="calls per operation and concurrency level")
+    run_parser.add_argument("--url", help="base URL of a running server, the app is called in-process when not set")
+    run_parser.add_argument("--output", help="JSON file for the results")
+    run_parser.add_argument("--compare", help="JSON results of the previous run, regressions fail the run")
+    run_parser.add_argument("--tolerance", type=float, default=0.2)
+    run_parser.add_argument("--render-rows", type=int, default=10000, help="rows of the rendering benchmark")
+    return parser
+
+
+def main(argv: List[str] = None):  # pylint: disable=too-many-locals
+    """
+    Command line entry point.
+    """
+    args = _parser().parse_args(argv)
+
+    pool_settings = create_pool_settings()
+    db_interface = create_db_interface(pool_settings)
+
+    if args.command == "seed":
+        if args.migrate:
+            apply_migrations(db_interface)
+        volumes = volumes_for(args.rows, dict(args.volume))
+        started = time.perf_counter()
+        inserted = seed(db_interface, volumes, args.chunk_size, args.seed,
+                        progress=lambda table_name, rows, missing: print(f"{table_name}: {rows}/{missing} rows",
+                                                                         file=sys.stderr))
+        print(f"seeded {sum(inserted.values())} rows in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    targets = args.target.split(",")
+    results = []
+    if "db" in targets:
+        # the read cache would measure the memory instead of the database
+        db_interface.cache = None
+        results += benchmark_db(db_interface, args.concurrency, args.requests)
+    if "routes" in targets:
+        if args.url:
+            import httpx  # pylint: disable=import-outside-toplevel
+            client = httpx.Client(base_url=args.url, timeout=60)
+        else:
+            from starlette.testclient import TestClient  # pylint: disable=import-outside-toplevel
+            from crud_app.app import app  # pylint: disable=import-outside-toplevel
+            client = TestClient(app)
+        results += benchmark_routes(client, db_interface, args.concurrency, args.requests)
+    if "render" in targets:
+        results += benchmark_render(args.render_rows, max(1, args.requests // 20))
+    _print_results(results)
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(),
+              "python": platform.python_version(),
+              "pool_size": pool_settings.max_size,
+              "rows": {table: len(primary_keys(db_interface, table)) for table in Tables},
+              "results": [item._asdict() for item in results]}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent="\t")
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous:
+            regressions = compare_results(json.load(previous), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
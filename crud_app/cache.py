@@ -0,0 +1,266 @@
+"""
+Read-through cache for `DbInterface` reads, invalidated by the write methods.
+"""
+import fcntl
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Dict, NamedTuple, Optional, Tuple
+
+MISSING = object()
+
+KeyRange = Tuple[float, float]
+FULL_RANGE: KeyRange = (-math.inf, math.inf)
+
+
+class CacheStats(NamedTuple):
+    """
+    NamedTuple representing a snapshot of the cache counters.
+    """
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    size: int
+
+
+class CacheBackend(ABC):
+    """
+    Base class of the cache storage. Entries are grouped per table and carry the range of primary keys
+    they depend on, so a write to a single row drops only the entries covering that row.
+    Multi-worker deployments implement this interface on top of a shared store.
+    The table generations double as the table versions of the HTTP validators, `epoch` tells apart
+    the counters of different stores, e.g. before and after a restart of the in-process one.
+    """
+    epoch: str = ""
+
+    @abstractmethod
+    def generation(self, table_name: str) -> int:
+        """
+        :param table_name: table name
+        :return: counter increased by every invalidation of the table, used to reject stale `set` calls
+        """
+
+    @abstractmethod
+    def modified(self, table_name: str) -> float:
+        """
+        :param table_name: table name
+        :return: UNIX time of the last invalidation of the table, or of the store creation
+        """
+
+    @abstractmethod
+    def get(self, table_name: str, key: Hashable):
+        """
+        :param table_name: table name
+        :param key: key of the entry within the table
+        :return: cached value or `MISSING`
+        """
+
+    @abstractmethod
+    def set(self, table_name: str, key: Hashable, value,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            key_range: KeyRange, generation: int):
+        """
+        :param table_name: table name
+        :param key: key of the entry within the table
+        :param value: value to cache
+        :param key_range: closed range of primary keys the value depends on
+        :param generation: table generation read before the value was fetched from the database
+        """
+
+    @abstractmethod
+    def invalidate(self, table_name: str, primary_key: Optional[int] = None):
+        """
+        :param table_name: table name
+        :param primary_key: drop only entries depending on this row, all entries of the table when not set
+        """
+
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        """
+        :return: cache counters
+        """
+
+
+class SharedGenerations:
+    """
+    Class representing the table generations shared by the worker processes in a memory-mapped file,
+    so the write done by one worker invalidates the entries of the other ones and they all send the same ETags.
+    Tables are hashed into a fixed number of slots, tables sharing the slot only invalidate each other more often.
+    """
+    _HEADER = struct.Struct("<8sd")
+    _SLOT = struct.Struct("<qd")
+
+    def __init__(self, path: str, slots: int = 1024):
+        if slots < 1:
+            raise ValueError(f"Invalid number of slots {slots}")
+        self.slots = slots
+        size = self._HEADER.size + slots * self._SLOT.size
+        with open(path, "a+b") as shared_file:
+            fcntl.lockf(shared_file, fcntl.LOCK_EX)
+            if os.fstat(shared_file.fileno()).st_size < size:
+                shared_file.truncate(0)
+                shared_file.write(self._HEADER.pack(uuid.uuid4().hex[:8].encode("ascii"), time.time()))
+                shared_file.write(bytes(size - self._HEADER.size))
+                shared_file.flush()
+            fcntl.lockf(shared_file, fcntl.LOCK_UN)
+            self._file = open(path, "r+b")  # pylint: disable=consider-using-with
+        self._map = mmap.mmap(self._file.fileno(), size)
+        # the file lock excludes the other processes, not the threads of this one
+        self._lock = threading.Lock()
+        epoch, self.created = self._HEADER.unpack_from(self._map)
+        self.epoch = epoch.decode("ascii")
+
+    def _offset(self, table_name: str) -> int:
+        return self._HEADER.size + zlib.crc32(table_name.encode("utf-8")) % self.slots * self._SLOT.size
+
+    def read(self, table_name: str) -> Tuple[int, float]:
+        """
+        :param table_name: table name
+        :return: generation and UNIX time of the last invalidation of the table, done by any process
+        """
+        generation, modified = self._SLOT.unpack_from(self._map, self._offset(table_name))
+        return generation, modified or self.created
+
+    def increment(self, table_name: str) -> Tuple[int, float]:
+        """
+        :param table_name: invalidated table name
+        :return: new generation of the table and the time of the invalidation
+        """
+        offset = self._offset(table_name)
+        with self._lock:
+            fcntl.lockf(self._file, fcntl.LOCK_EX, self._SLOT.size, offset)
+            try:
+                generation, modified = self._SLOT.unpack_from(self._map, offset)[0] + 1, time.time()
+                self._SLOT.pack_into(self._map, offset, generation, modified)
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN, self._SLOT.size, offset)
+        return generation, modified
+
+    def close(self):
+        """
+        Unmaps the file, the file itself is left for the other processes.
+        """
+        self._map.close()
+        self._file.close()
+
+
+class MemoryCacheBackend(CacheBackend):  # pylint: disable=too-many-instance-attributes
+    """
+    In-process LRU cache with TTL and per-table size limits. With `shared` generations the entries stay
+    in the process, the writes of the other processes drop all the entries of the written table.
+    """
+    def __init__(self, ttl: float = 60.0, default_size: int = 256, table_sizes: Dict[str, int] = None,
+                 shared: Optional[SharedGenerations] = None):
+        self.ttl = ttl
+        self.default_size = default_size
+        self.table_sizes = table_sizes or {}
+        self._lock = threading.Lock()
+        self._entries: Dict[str, OrderedDict] = {}
+        self._generations: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+        self._created = time.time()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.shared = shared
+        if shared is not None:
+            self._created, self.epoch = shared.created, shared.epoch
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _sync(self, table_name: str):
+        """
+        Drops the entries of the table written by another process, must be called with the lock held.
+        """
+        if self.shared is None:
+            return
+        generation, modified = self.shared.read(table_name)
+        if generation != self._generations.get(table_name, 0):
+            self._generations[table_name] = generation
+            self._modified[table_name] = modified
+            if entries := self._entries.get(table_name):
+                self._invalidations += len(entries)
+                entries.clear()
+
+    def generation(self, table_name: str) -> int:
+        with self._lock:
+            self._sync(table_name)
+            return self._generations.get(table_name, 0)
+
+    def modified(self, table_name: str) -> float:
+        with self._lock:
+            self._sync(table_name)
+            return self._modified.get(table_name, self._created)
+
+    def get(self, table_name: str, key: Hashable):
+        with self._lock:
+            self._sync(table_name)
+            entries = self._entries.get(table_name)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                self._misses += 1
+                return MISSING
+            value, _, expires = entry
+            if expires < time.monotonic():
+                del entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+            entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, table_name: str, key: Hashable, value,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            key_range: KeyRange, generation: int):
+        size = self.table_sizes.get(table_name, self.default_size)
+        if size <= 0:
+            return
+        with self._lock:
+            self._sync(table_name)
+            if self._generations.get(table_name, 0) != generation:
+                return
+            entries = self._entries.setdefault(table_name, OrderedDict())
+            entries[key] = (value, key_range, time.monotonic() + self.ttl)
+            entries.move_to_end(key)
+            while len(entries) > size:
+                entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, table_name: str, primary_key: Optional[int] = None):
+        with self._lock:
+            previous = self._generations.get(table_name, 0)
+            generation, modified = self.shared.increment(table_name) if self.shared is not None \
+                else (previous + 1, time.time())
+            self._generations[table_name] = generation
+            self._modified[table_name] = modified
+            entries = self._entries.get(table_name)
+            if not entries:
+                return
+            # other processes wrote the table since the last sync, the row range is not known
+            if primary_key is None or generation != previous + 1:
+                self._invalidations += len(entries)
+                entries.clear()
+                return
+            stale = [key for key, (_, (low, high), _) in entries.items() if low <= primary_key <= high]
+            for key in stale:
+                del entries[key]
+            self._invalidations += len(stale)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits,
+                              misses=self._misses,
+                              evictions=self._evictions,
+                              expirations=self._expirations,
+                              invalidations=self._invalidations,
+                              size=sum(len(entries) for entries in self._entries.values()))
@@ -0,0 +1,115 @@
+"""
+Change feed of the writes done through `DbInterface`, delivered to the open table views.
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from enum import StrEnum
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+
+class ChangeKind(StrEnum):
+    """
+    Enum of the changes of the table, RELOAD stands for a change of many rows, e.g. a bulk write.
+    """
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+    RELOAD = "reload"
+
+
+class ChangeEvent(NamedTuple):
+    """
+    NamedTuple representing the committed change of the row, or of the whole table when `primary_key` is not set.
+    """
+    table_name: str
+    primary_key: Optional[int]
+    kind: ChangeKind
+
+
+class Subscription:
+    """
+    Class representing the subscriber of the changes of the tables, consumed by the event loop it was created in.
+    Events published when its queue is full are replaced with a single RELOAD event of the first table.
+    """
+    def __init__(self, table_names: Tuple[str, ...], queue_size: int):
+        self.table_names = table_names
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    def put(self, event: ChangeEvent):
+        """
+        :param event: change of the table, may be published from any thread
+        """
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # the event loop was closed, the subscriber is gone
+            pass
+
+    def _put(self, event: ChangeEvent):
+        if self._queue.full():
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            event = ChangeEvent(self.table_names[0], None, ChangeKind.RELOAD)
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[ChangeEvent]:
+        """
+        :param timeout: seconds to wait for the event
+        :return: next change, None when there was none within the timeout
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ChangeFeed:
+    """
+    Class representing the publish/subscribe of the committed changes within the process,
+    writes of the other processes are only seen as the change of the table version.
+    """
+    def __init__(self, queue_size: int = 256):
+        if queue_size < 1:
+            raise ValueError(f"Invalid queue size {queue_size}")
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    def publish(self, events: Iterable[ChangeEvent]):
+        """
+        :param events: committed changes, in the commit order
+        """
+        for event in events:
+            with self._lock:
+                subscriptions = list(self._subscriptions.get(event.table_name, ()))
+            for subscription in subscriptions:
+                subscription.put(event)
+
+    @contextmanager
+    def subscribe(self, table_names: Iterable[str]):
+        """
+        Context manager of the subscription to the changes of the tables, must be entered in the event loop.
+        :param table_names: table names, the first one is the main table of the subscriber
+        :return: subscription
+        """
+        subscription = Subscription(tuple(table_names), self.queue_size)
+        if not subscription.table_names:
+            raise ValueError("No tables to subscribe to")
+        with self._lock:
+            for table_name in subscription.table_names:
+                self._subscriptions.setdefault(table_name, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                for table_name in subscription.table_names:
+                    self._subscriptions[table_name].discard(subscription)
+
+    def subscribers(self, table_name: str) -> int:
+        """
+        :return: number of the subscribers of the table
+        """
+        with self._lock:
+            return len(self._subscriptions.get(table_name, ()))
@@ -1,32 +1,343 @@
 """
 Database interface definition for FastHTML application backend.
 """
-from dataclasses import asdict
-from typing import List, Set
+import functools
+import hashlib
+import math
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-import mysql.connector
+from mysql.connector.constants import ClientFlag
+from mysql.connector.errors import Error, InterfaceError, OperationalError, PoolError
 
-from crud_app.db_structure import (FieldDetails, Kontraktor, Pracownik,
-                                   Stanowisko, TABLE_DETAILS, Tables, Zespol)
+from crud_app.audit import AuditLog, AuditRecord, AuditSettings, DbAuditSink, FileAuditSink, audit_record
+from crud_app.cache import CacheBackend, CacheStats, FULL_RANGE, KeyRange, MISSING, MemoryCacheBackend
+from crud_app.changes import ChangeFeed, ChangeKind
+from crud_app.db_pool import ConnectionPool, PoolSettings, PoolStats
+from crud_app.db_structure import (ChunkReport, FieldDetails, Kontraktor, Pracownik, Stanowisko,
+                                   TABLE_DETAILS, TablePage, TableQuery, Tables, Zespol)
+from crud_app.metrics import InstrumentedCursor, QueryMetrics
+from crud_app.replicas import Replica, ReplicaSet, ReplicaSettings, mark_write, parse_host, primary_required
+from crud_app.rows import ColumnRows
+from crud_app.statements import (FILTER_OPERATORS, STATEMENTS, SelectShape, delete_many_statement,
+                                 labels_statement, lock_many_statement, search_fields, select_statement)
+from crud_app.transactions import (GroupCommit, IsolationLevel, Transaction, TransactionSettings, backoff_delay,
+                                   is_retryable)
 
 
-class DbInterface:
+def _timed(method):
+    """
+    Reports the time of the method call to `DbInterface.metrics`.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metrics.observe_method(method.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+def _padded(ids: Sequence) -> tuple:
+    """
+    Pads the keys of the `IN (...)` list to the power of two with the last one,
+    so a few prepared statements serve any number of keys.
+    """
+    ids = tuple(ids)
+    return ids + ids[-1:] * ((1 << (len(ids) - 1).bit_length()) - len(ids))
+
+
+class RecordConflictError(Exception):
+    """
+    Raised when the record was changed or removed since its version was read.
+    """
+
+
+class DbInterface:  # pylint: disable=too-many-public-methods,too-many-instance-attributes
     """
     Class representing the interface to the database, depends on `db_structure` objects.
     """
-    def __init__(self, db_user: str, db_pass: str, db_host: str, db_name: str):
-        self.connection = mysql.connector.connect(user = db_user, password = db_pass,
-                                                  host = db_host, database = db_name)
+    def __init__(self, db_user: str, db_pass: str, db_host: str, db_name: str,  # pylint: disable=too-many-arguments,too-many-locals
+                 *, pool_settings: PoolSettings = PoolSettings(), cache: Optional[CacheBackend] = None,
+                 prepared_statements: bool = True, metrics: Optional[QueryMetrics] = None,
+                 transaction_settings: TransactionSettings = TransactionSettings(),
+                 replica_hosts: Sequence[str] = (), replica_settings: ReplicaSettings = ReplicaSettings(),
+                 change_feed: Optional[ChangeFeed] = None, audit_settings: Optional[AuditSettings] = None,
+                 max_options: int = 200, prepared_cache_size: int = 64):
+        # affected rows of UPDATE count the matched rows, also the ones written with unchanged values
+        connect_args = {'user': db_user, 'password': db_pass, 'database': db_name,
+                        'client_flags': [ClientFlag.FOUND_ROWS]}
+        self.pool = ConnectionPool({**connect_args, 'host': db_host}, pool_settings)
+        self.replicas = ReplicaSet([Replica(host, ConnectionPool({**connect_args, **parse_host(host)}, pool_settings))
+                                    for host in replica_hosts], replica_settings) if replica_hosts else None
+        self.cache = cache
+        # table versions are kept by the cache, or by a store without entries when caching is disabled
+        self.versions = cache if cache is not None else MemoryCacheBackend(default_size=0)
+        self.prepared_statements = prepared_statements
+        # server-side statements per connection, bounded by the server's max_prepared_stmt_count
+        self.prepared_cache_size = prepared_cache_size
+        self.metrics = metrics
+        self._prepared_cursors = weakref.WeakKeyDictionary()
+        self._prepared_cursors_lock = threading.Lock()
+        self.transaction_settings = transaction_settings
+        self.change_feed = change_feed
+        # foreign keys of larger tables are entered by the key, without loading the rows into the select box
+        self.max_options = max_options
+        self.audit_log = AuditLog(FileAuditSink(audit_settings.file) if audit_settings.file
+                                  else DbAuditSink(self.pool), audit_settings) if audit_settings is not None else None
+        self.group_commit = GroupCommit(self.run_in_transaction, transaction_settings.group_commit_size,
+                                        transaction_settings.group_commit_delay) \
+            if transaction_settings.group_commit_size else None
 
     def __del__(self):
-        self.connection.close()
+        if hasattr(self, 'pool'):
+            self.pool.close()
+        if getattr(self, 'replicas', None) is not None:
+            self.replicas.close()
+
+    def get_pool_stats(self) -> PoolStats:
+        """
+        :return: statistics of the connection pool (in use, waiting, checkout latency)
+        """
+        return self.pool.stats()
+
+    def ping(self):
+        """
+        Checks the connection to the primary, used by the readiness probe.
+        :raises Error: when the database is not reachable
+        """
+        with self.pool.connection() as connection:
+            connection.ping(reconnect=False)
+
+    @_timed
+    def warm_up(self, page_size: int = 100) -> int:
+        """
+        Reads the first page with its labels and the select box options of every table, so the statements
+        are built and prepared and the read cache holds the dictionaries of the foreign keys before the first request.
+        :param page_size: number of rows of the first page, as served by the table view
+        :return: number of tables read
+        """
+        for table_name in TABLE_DETAILS:
+            self.resolve_references(table_name, self.get_table_page(table_name, limit=page_size).rows)
+            self.get_reference_options(table_name)
+        return len(TABLE_DETAILS)
+
+    def get_cache_stats(self) -> Optional[CacheStats]:
+        """
+        :return: hit/miss/eviction counters of the read cache, None when caching is disabled
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    def _read_pool(self, table_names: Iterable[Tables]) -> Tuple[ConnectionPool, Optional[Replica]]:
+        """
+        :param table_names: tables read by the query
+        :return: pool of the replica chosen for the read and the replica, the primary pool when no replica is usable
+        """
+        if self.replicas is None or primary_required():
+            return self.pool, None
+        replica = self.replicas.choose(max(self.versions.modified(name) for name in table_names))
+        return (replica.pool, replica) if replica is not None else (self.pool, None)
+
+    def _read(self, table_names: Iterable[Tables], query: Callable[[ConnectionPool], object]):
+        """
+        Runs the read on a replica, failing over to the primary when the replica is not reachable.
+        :param table_names: tables read by the query
+        :param query: function reading with the connection of the given pool
+        :return: result of the query
+        """
+        pool, replica = self._read_pool(table_names)
+        if replica is None:
+            return query(pool)
+        try:
+            return query(pool)
+        except (OperationalError, InterfaceError, PoolError):
+            self.replicas.mark_failed(replica)
+            return query(self.pool)
+
+    def _cached(self, table_name: Tables, key: tuple, fetch, key_range):
+        """
+        Read-through helper, `fetch` is called on cache miss and `key_range` computes
+        the range of primary keys the fetched value depends on.
+        """
+        if self.cache is None:
+            return fetch()
+
+        value = self.cache.get(table_name, key)
+        if value is MISSING:
+            generation = self.cache.generation(table_name)
+            value = fetch()
+            self.cache.set(table_name, key, value, key_range(value), generation)
+        return value
+
+    @contextmanager
+    def _statement_cursor(self, connection, statement: str, prepare: bool = True):
+        """
+        Cursor for the registry statement, in prepared mode the statement is prepared server-side
+        once per connection and the cursor is reused for its next executions. The least recently used
+        of more than `prepared_cache_size` statements of the connection is closed, deallocating it on the server.
+        :param prepare: False for the one-off statements, run with a plain cursor
+        """
+        if not self.prepared_statements or not prepare:
+            with connection.cursor() as cursor, self._instrumented(cursor) as instrumented:
+                yield instrumented
+            return
+
+        with self._prepared_cursors_lock:
+            cursors = self._prepared_cursors.setdefault(connection, OrderedDict())
+        cursor = cursors.get(statement)
+        if cursor is None:
+            cursor = cursors[statement] = connection.cursor(prepared=True)
+            while len(cursors) > self.prepared_cache_size:
+                _, evicted = cursors.popitem(last=False)
+                with suppress(Error):
+                    evicted.close()
+        else:
+            cursors.move_to_end(statement)
+        with self._instrumented(cursor) as instrumented:
+            yield instrumented
+
+    @contextmanager
+    def _instrumented(self, cursor):
+        """
+        Cursor reporting its queries to `metrics`, the cursor itself when instrumentation is disabled.
+        """
+        if self.metrics is None:
+            yield cursor
+            return
+
+        instrumented = InstrumentedCursor(cursor, self.metrics)
+        try:
+            yield instrumented
+        finally:
+            instrumented.finish()
+
+    def _invalidate(self, table_name: Tables, primary_key: Optional[int] = None):
+        self.versions.invalidate(table_name, primary_key)
+
+    @contextmanager
+    def transaction(self, isolation_level: Optional[IsolationLevel] = None):
+        """
+        Context manager of the transaction, committed when the block ends and rolled back on error.
+        Without the isolation level the transaction is started implicitly by the first statement,
+        saving the `START TRANSACTION` round-trip.
+        :param isolation_level: isolation level of the transaction, `transaction_settings` one when not set
+        :return: transaction object
+        """
+        isolation_level = isolation_level or self.transaction_settings.isolation_level
+        with self.pool.connection() as connection:
+            if isolation_level is not None:
+                connection.start_transaction(isolation_level=str(isolation_level))
+            transaction = Transaction(connection, self._statement_cursor)
+            committed = False
+            try:
+                yield transaction
+                connection.commit()
+                if self.replicas is not None and transaction.invalidations:
+                    mark_write(self.replicas.settings.max_lag + self.replicas.settings.check_interval)
+                committed = True
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                for table_name, primary_key in transaction.invalidations:
+                    self._invalidate(table_name, primary_key)
+                # published after the invalidation, so the subscribers read the committed rows
+                if committed and self.change_feed is not None and transaction.changes:
+                    self.change_feed.publish(transaction.changes)
+                if committed and self.audit_log is not None and transaction.audit_records:
+                    self.audit_log.record(transaction.audit_records)
+
+    def run_in_transaction(self, work: Callable[[Transaction], object],
+                           isolation_level: Optional[IsolationLevel] = None):
+        """
+        Runs the function in a transaction, deadlocked transactions are run again after the backoff delay.
+        :param work: function of the transaction, it may be called more than once
+        :param isolation_level: isolation level of the transaction
+        :return: result of the function
+        """
+        for attempt in range(self.transaction_settings.retries + 1):
+            try:
+                with self.transaction(isolation_level) as transaction:
+                    return work(transaction)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if not is_retryable(error) or attempt == self.transaction_settings.retries:
+                    raise
+            time.sleep(backoff_delay(self.transaction_settings.backoff, attempt))
+        return None
+
+    def _write(self, work: Callable[[Transaction], object]):
+        """
+        Runs the single record write, grouped with the concurrent writes into one commit when group commit is enabled.
+        """
+        if self.group_commit is not None:
+            result = self.group_commit.submit(work)
+            # the batch is committed in the context of the leading write, the reads of this one go to the primary too
+            if self.replicas is not None:
+                mark_write(self.replicas.settings.max_lag + self.replicas.settings.check_interval)
+            return result
+        return self.run_in_transaction(work)
+
+    @staticmethod
+    def _row_image(table_name: Tables, row: Sequence) -> dict:
+        return dict(zip((field.name for field in TABLE_DETAILS[table_name].fields_details), row))
+
+    @staticmethod
+    def _params_image(table_name: Tables, params: tuple) -> dict:
+        """
+        :param params: `update_values` of the record, the primary key is the last one
+        """
+        details = TABLE_DETAILS[table_name]
+        names = [field.name for field in details.fields_details if field.name != details.primary_key]
+        values = dict(zip(names + [details.primary_key], params))
+        return {field.name: values[field.name] for field in details.fields_details}
+
+    def _before_images(self, transaction: Transaction, table_name: Tables, ids: Sequence[int]) -> Dict[int, dict]:
+        """
+        Locks the rows to be written by the transaction and reads their values, nothing is read
+        when the audit log is disabled. The keys of the `IN (...)` list are padded to the power of two.
+        :return: values of the existing rows by the primary key
+        """
+        if self.audit_log is None or not ids:
+            return {}
+        params = _padded(ids)
+        statement = STATEMENTS[table_name].lock_record if len(params) == 1 \
+            else lock_many_statement(table_name, len(params))
+        return {row[0]: self._row_image(table_name, row) for row in transaction.execute(statement, params).rows}
+
+    def _audit(self, transaction: Transaction, table_name: Tables, kind: ChangeKind,
+               images: Iterable[Tuple[Optional[int], Optional[dict], Optional[dict]]]):
+        """
+        :param images: primary key, values before and after the write of every written row
+        """
+        if self.audit_log is None:
+            return
+        for primary_key, before, after in images:
+            transaction.audit(audit_record(table_name, primary_key, kind, before, after))
+
+    def get_table_version(self, table_names: Iterable[Tables]) -> Tuple[str, float]:
+        """
+        Versions change with every write done through this interface, or through another one sharing the cache.
+        :param table_names: tables the response depends on
+        :return: version tag of the tables, usable as the ETag, and UNIX time of their last modification
+        """
+        table_names = sorted(set(table_names))
+        tag = "-".join([self.versions.epoch, *(str(self.versions.generation(name)) for name in table_names)])
+        return tag, max(self.versions.modified(name) for name in table_names)
 
     @staticmethod
     def get_tables() -> Set[str]:
         """
         :return: Set of table names available for CRUD operations
         """
-        return {table.value for table in Tables}
+        return {str(table_name) for table_name in TABLE_DETAILS}
 
     @staticmethod
     def check_table_exists(table_name: Tables):
@@ -34,97 +345,471 @@ class DbInterface:
         :param table_name: Table name to check
         :return: bool value indicating if the table exists
         """
-        return table_name in Tables
+        return table_name in TABLE_DETAILS
+
+    @_timed
+    def get_table_data(self, table_name: Tables, after: Optional[int] = None,  # pylint: disable=too-many-arguments
+                       before: Optional[int] = None, limit: Optional[int] = None,
+                       *, query: TableQuery = TableQuery(), key=None):
+        """
+        :param table_name: Table name to get data from
+        :param after: return only rows following the row with this primary key
+        :param before: return only rows preceding the row with this primary key
+        :param limit: maximal number of rows to return, all rows when not set
+        :param query: sorting, filtering and searching, ordered by primary key when not set
+        :param key: sort column value of the `after`/`before` row, when sorting by other column than primary key
+        :return: rows of the table, stored per column and behaving as the list of tuples
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+        if after is not None and before is not None:
+            raise ValueError("Only one of after/before can be used")
+        self._validate_query(table_name, query)
+
+        key_range = self._rows_key_range if query == TableQuery() else lambda *_: FULL_RANGE
+        return self._cached(table_name, ('data', after, before, limit, query, key),
+                            lambda: self._query_table_data(table_name, after, before, limit, query, key),
+                            lambda rows: key_range(rows, after, before, limit))
+
+    @staticmethod
+    def _validate_query(table_name: Tables, query: TableQuery):
+        field_names = {field.name for field in TABLE_DETAILS[table_name].fields_details}
+        if query.sort is not None and query.sort not in field_names:
+            raise ValueError(f"Invalid sort field {query.sort}")
+        for name, operator, _ in query.filters:
+            if name not in field_names or operator not in FILTER_OPERATORS:
+                raise ValueError(f"Invalid filter {name} {operator}")
+        if query.search and not search_fields(table_name):
+            raise ValueError(f"No text fields to search in {table_name}")
+
+    def _query_table_data(self, table_name: Tables, after: Optional[int],  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+                          before: Optional[int], limit: Optional[int], query: TableQuery, key):
+        primary_key = TABLE_DETAILS[table_name].primary_key
+        sort = query.sort or primary_key
+        direction = 'after' if after is not None else 'before' if before is not None else None
+        null_cursor = direction is not None and sort != primary_key and key is None
+
+        params = [value for _, _, value in query.filters]
+        if query.search:
+            pattern = re.sub(r"([\\%_])", r"\\\1", query.search) + "%"
+            params.extend([pattern] * len(search_fields(table_name)))
+        if direction is not None:
+            cursor_id = after if after is not None else before
+            params.extend([cursor_id] if sort == primary_key or null_cursor else [key, key, cursor_id])
+        if limit is not None:
+            params.append(limit)
+
+        statement = select_statement(table_name, SelectShape(
+            sort=sort, descending=query.descending,
+            filters=tuple((name, operator) for name, operator, _ in query.filters),
+            search=bool(query.search), direction=direction, null_cursor=null_cursor, limited=limit is not None))
+
+        def query_rows(pool: ConnectionPool) -> ColumnRows:
+            with pool.connection() as connection, self._statement_cursor(connection, statement) as cursor:
+                cursor.execute(statement, tuple(params))
+                return ColumnRows.from_rows(cursor.fetchall())
+
+        rows = self._read((table_name,), query_rows)
+
+        return rows[::-1] if before is not None else rows
+
+    @staticmethod
+    def _rows_key_range(rows, after: Optional[int], before: Optional[int], limit: Optional[int]) -> KeyRange:
+        """
+        :return: range of primary keys which, when written, could change the result of the query
+        """
+        full = limit is not None and len(rows) >= limit
+        if before is not None:
+            return (rows[0][0] if full else -math.inf), before - 1
+        return (after + 1 if after is not None else -math.inf), (rows[-1][0] if full else math.inf)
 
-    def get_table_data(self, table_name: Tables):
+    def iter_table_data(self, table_name: Tables, batch_size: int = 1000):
         """
+        Streams all rows of the table from an unbuffered cursor, only one batch is held in memory.
+        The connection stays checked out until the generator is exhausted or closed.
         :param table_name: Table name to get data from
-        :return: list of tuples with the data from the table
+        :param batch_size: number of rows fetched from the server at once
+        :return: generator of lists of tuples, ordered by primary key
         """
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
-        with self.connection.cursor() as cursor:
-            table_fields = ','.join([field.name for field in TABLE_DETAILS[table_name].fields_details])
-            cursor.execute(f"SELECT {table_fields} FROM {table_name}")
-            return cursor.fetchall()
+        pool, replica = self._read_pool((table_name,))
+        try:
+            connection = pool.checkout()
+        except (OperationalError, InterfaceError, PoolError):
+            if replica is None:
+                raise
+            self.replicas.mark_failed(replica)
+            pool = self.pool
+            connection = pool.checkout()
+        exhausted = False
+        try:
+            cursor = connection.cursor(buffered=False)
+            with self._instrumented(cursor) as instrumented:
+                instrumented.execute(STATEMENTS[table_name].select_all)
+                while rows := instrumented.fetchmany(batch_size):
+                    yield rows
+            exhausted = True
+            cursor.close()
+        finally:
+            # rows left unread on the server make the connection unusable for the next request
+            pool.checkin(connection, broken=not exhausted)
+
+    @_timed
+    def get_table_page(self, table_name: Tables, after: Optional[int] = None,  # pylint: disable=too-many-arguments
+                       before: Optional[int] = None, limit: int = 100,
+                       *, query: TableQuery = TableQuery(), key=None) -> TablePage:
+        """
+        Keyset pagination over the sort column and primary key, memory used is bounded by the `limit`.
+        :param table_name: Table name to get data from
+        :param after: primary key of the last row of the previous page
+        :param before: primary key of the first row of the next page, for paging backwards
+        :param limit: number of rows on the page
+        :param query: sorting, filtering and searching
+        :param key: sort column value of the `after`/`before` row
+        :return: page of rows with the keys to use for the next and previous pages
+        """
+        if limit < 1:
+            raise ValueError(f"Invalid page limit {limit}")
+
+        rows = self.get_table_data(table_name, after=after, before=before, limit=limit + 1, query=query, key=key)
+        has_more = len(rows) > limit
+        if before is not None:
+            rows = rows[1:] if has_more else rows
+            has_next, has_prev = True, has_more
+        else:
+            rows = rows[:limit]
+            has_next, has_prev = has_more, after is not None
+
+        fields = [field.name for field in TABLE_DETAILS[table_name].fields_details]
+        sort_index = fields.index(query.sort) if query.sort else 0
+        return TablePage(rows=rows,
+                         next_after=rows[-1][0] if rows and has_next else None,
+                         prev_before=rows[0][0] if rows and has_prev else None,
+                         next_key=rows[-1][sort_index] if rows and has_next else None,
+                         prev_key=rows[0][sort_index] if rows and has_prev else None)
+
+    @staticmethod
+    def get_record_version(record_data: Optional[tuple]) -> Optional[str]:
+        """
+        :param record_data: row as returned by `get_record_data`
+        :return: version token of the record, a hash of its values
+        """
+        if record_data is None:
+            return None
+        return hashlib.blake2b(repr(tuple(record_data)).encode("utf-8"), digest_size=8).hexdigest()
 
+    @_timed
     def get_record_data(self, table_name: Tables, id: int):
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+
+        return self._cached(table_name, ('record', id),
+                            lambda: self._query_record_data(table_name, id),
+                            lambda _: (id, id))
+
+    def _query_record_data(self, table_name: Tables, id: int):
+        statement = STATEMENTS[table_name].select_record
+
+        def query_record(pool: ConnectionPool):
+            with pool.connection() as connection, self._statement_cursor(connection, statement) as cursor:
+                cursor.execute(statement, (id,))
+                rows = cursor.fetchall()
+            return rows[0] if rows else None
+
+        return self._read((table_name,), query_record)
+
+    @_timed
+    def run_query(self, table_names: Sequence[Tables], statement: str, params: Sequence = ()) -> List[tuple]:
+        """
+        Read-only statement of the modules built on this interface, e.g. the reports, routed like the other reads.
+        The statement is not prepared, it is run once per version of the tables.
+        :param table_names: tables read by the statement
+        :param statement: SELECT statement
+        :param params: positional parameters of the statement
+        :return: fetched rows
+        """
+        if not table_names:
+            raise ValueError("No tables read by the statement")
+
+        def query_rows(pool: ConnectionPool) -> List[tuple]:
+            with pool.connection() as connection, \
+                    self._statement_cursor(connection, statement, prepare=False) as cursor:
+                cursor.execute(statement, tuple(params))
+                return cursor.fetchall()
+
+        return self._read(table_names, query_rows)
+
+    @staticmethod
+    def _label(values: tuple) -> str:
+        return " ".join(str(value) for value in values if value is not None)
+
+    @_timed
+    def get_labels(self, table_name: Tables, label_fields: Tuple[str, ...], ids: Iterable[int]) -> Dict[int, str]:
+        """
+        One `IN (...)` query for all the keys, the list is padded to the power of two.
+        :param table_name: referenced table name
+        :param label_fields: fields joined into the label
+        :param ids: primary keys to resolve
+        :return: mapping of the primary key to the label, missing rows are skipped
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+        ids = tuple(sorted({key for key in ids if key is not None}))
+        if not ids:
+            return {}
+
+        def query_labels(pool: ConnectionPool) -> Dict[int, str]:
+            params = _padded(ids)
+            statement = labels_statement(table_name, label_fields, len(params))
+            with pool.connection() as connection, self._statement_cursor(connection, statement) as cursor:
+                cursor.execute(statement, params)
+                return {row[0]: self._label(row[1:]) for row in cursor.fetchall()}
+
+        return self._cached(table_name, ('labels', label_fields, ids),
+                            lambda: self._read((table_name,), query_labels), lambda _: (ids[0], ids[-1]))
+
+    @_timed
+    def get_options(self, table_name: Tables, label_fields: Tuple[str, ...]) -> Optional[List[Tuple[int, str]]]:
+        """
+        At most `max_options` + 1 rows are read, the referenced tables of the select boxes are the small dictionaries.
+        :param table_name: referenced table name
+        :param label_fields: fields joined into the label
+        :return: primary keys and labels of all the rows, ordered by the labels, None when there are more
+            than `max_options` rows
+        """
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
-        with self.connection.cursor() as cursor:
-            table_fields = ','.join([field.name for field in TABLE_DETAILS[table_name].fields_details])
-            cursor.execute(f"SELECT {table_fields} FROM {table_name} "
-                           f"WHERE {TABLE_DETAILS[table_name].primary_key} = %(id)s",
-                           {'id':id})
-            return cursor.fetchone()
+        def query_options(pool: ConnectionPool) -> Optional[List[Tuple[int, str]]]:
+            statement = labels_statement(table_name, label_fields)
+            with pool.connection() as connection, self._statement_cursor(connection, statement) as cursor:
+                cursor.execute(statement, (self.max_options + 1,))
+                rows = cursor.fetchall()
+            if len(rows) > self.max_options:
+                return None
+            return [(row[0], self._label(row[1:])) for row in rows]
+
+        return self._cached(table_name, ('options', label_fields),
+                            lambda: self._read((table_name,), query_options), lambda _: FULL_RANGE)
+
+    @_timed
+    def resolve_references(self, table_name: Tables, rows: Sequence[tuple]) -> Dict[int, Dict[int, str]]:
+        """
+        Resolves the foreign keys of the page with one query per referenced table instead of one per row.
+        :param table_name: table name of the rows
+        :param rows: rows in `TABLE_DETAILS` column order
+        :return: mapping of the column index to the labels of its keys
+        """
+        columns = [(index, field.references)
+                   for index, field in enumerate(TABLE_DETAILS[table_name].fields_details) if field.references]
+        if not isinstance(rows, ColumnRows):
+            rows = ColumnRows.from_rows(rows)
+        ids = {}
+        for index, references in columns:
+            ids.setdefault(references, set()).update(rows.column(index))
+        labels = {references: self.get_labels(references.table_name, references.label_fields, keys)
+                  for references, keys in ids.items()}
+        return {index: labels[references] for index, references in columns}
+
+    @_timed
+    def get_reference_options(self, table_name: Tables) -> Dict[str, List[Tuple[int, str]]]:
+        """
+        Self-references, e.g. the superior of the employee, and references to the tables with more
+        than `max_options` rows have no select box, the key is entered with its label resolved.
+        :param table_name: table name
+        :return: mapping of the foreign key field name to the options of its select box
+        """
+        options = {field.name: self.get_options(field.references.table_name, field.references.label_fields)
+                   for field in TABLE_DETAILS[table_name].fields_details
+                   if field.references and field.references.table_name != table_name}
+        return {name: items for name, items in options.items() if items is not None}
 
+    @_timed
     def remove_table_row(self, table_name: Tables, id: int):
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(f"DELETE FROM {table_name} "
-                           f"WHERE {TABLE_DETAILS[table_name].primary_key} = %(id)s",
-                           {'id':id})
-        self.connection.commit()
+        def work(transaction: Transaction):
+            before = self._before_images(transaction, table_name, [id])
+            transaction.execute(STATEMENTS[table_name].delete, (id,))
+            transaction.invalidate(table_name, id, ChangeKind.DELETE)
+            self._audit(transaction, table_name, ChangeKind.DELETE,
+                        [(key, image, None) for key, image in before.items()])
 
+        self._write(work)
+
+    @_timed
     def update_table_row(self, table_name: Tables, id: int,
-                         data: type[Kontraktor | Pracownik | Stanowisko | Zespol]):
-        if table_name not in Tables:
+                         data: type[Kontraktor | Pracownik | Stanowisko | Zespol], version: Optional[str] = None):
+        """
+        Optimistic concurrency without locks: with the `version` the row is written only if its values
+        are still the ones the version was computed from.
+        :param version: version token of the edited record, see `get_record_version`, overwrites the row when not set
+        :raises RecordConflictError: when the record was changed or removed since the version was read
+        """
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
         if id != int(getattr(data, TABLE_DETAILS[table_name].primary_key)):
             raise ValueError("Primary key value mismatch")
 
-        if table_name == Tables.KONTRAKTORZY:
-            query_template = Kontraktor.generate_update_query_str()
-        elif table_name == Tables.PRACOWNICY:
-            query_template = Pracownik.generate_update_query_str()
-        elif table_name == Tables.STANOWISKA:
-            query_template = Stanowisko.generate_update_query_str()
-        elif table_name == Tables.ZESPOLY:
-            query_template = Zespol.generate_update_query_str()
-        else:
-            raise ValueError(f"No query template available for {table_name}")
+        statements = STATEMENTS[table_name]
+        params = statements.update_values(data)
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query_template, asdict(data))
+        def work(transaction: Transaction):
+            if version is None:
+                before = self._before_images(transaction, table_name, [id])
+                transaction.execute(statements.update, params)
+            else:
+                rows = transaction.execute(statements.select_record, (id,)).rows
+                if not rows or self.get_record_version(rows[0]) != version:
+                    raise RecordConflictError(f"Record {id} of {table_name} was changed")
+                # the row may be changed between the read and the write, the condition catches it
+                if not transaction.execute(statements.update_if_unchanged,
+                                           params + statements.unchanged_values(rows[0])).rowcount:
+                    raise RecordConflictError(f"Record {id} of {table_name} was changed")
+                before = {id: self._row_image(table_name, rows[0])}
+            transaction.invalidate(table_name, id, ChangeKind.UPDATE)
+            self._audit(transaction, table_name, ChangeKind.UPDATE,
+                        [(key, image, self._params_image(table_name, params[:-1] + (id,)))
+                         for key, image in before.items()])
 
-        self.connection.commit
+        self._write(work)
 
+    @_timed
     def insert_table_row(self, table_name: Tables,
                          data: type[Kontraktor | Pracownik | Stanowisko | Zespol]):
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
-        if table_name == Tables.KONTRAKTORZY:
-            query_template = Kontraktor.generate_insert_query_str()
-        elif table_name == Tables.PRACOWNICY:
-            query_template = Pracownik.generate_insert_query_str()
-        elif table_name == Tables.STANOWISKA:
-            query_template = Stanowisko.generate_insert_query_str()
-        elif table_name == Tables.ZESPOLY:
-            query_template = Zespol.generate_insert_query_str()
-        else:
-            raise ValueError(f"No query template available for {table_name}")
+        statements = STATEMENTS[table_name]
+        params = statements.insert_values(data)
+
+        def work(transaction: Transaction) -> Optional[int]:
+            new_id = transaction.execute(statements.insert, params).lastrowid
+            transaction.invalidate(table_name, new_id or None, ChangeKind.INSERT)
+            self._audit(transaction, table_name, ChangeKind.INSERT,
+                        [(new_id or None, None, self._params_image(table_name, params + (new_id or None,)))])
+            return new_id
+
+        return self._write(work)
+
+    def _execute_chunks(self, table_name: Tables, items: list, chunk_size: int, execute) -> List[ChunkReport]:
+        """
+        Runs `execute(transaction, chunk)` for every chunk of `items` in its own transaction, committed once.
+        Chunks committed before a failing chunk stay committed, the failing one is rolled back.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"Invalid chunk size {chunk_size}")
+
+        def work(transaction: Transaction, chunk: list):
+            execute(transaction, chunk)
+            transaction.invalidate(table_name)
+
+        reports = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            started = time.perf_counter()
+            self.run_in_transaction(lambda transaction, chunk=chunk: work(transaction, chunk))
+            reports.append(ChunkReport(rows=len(chunk), seconds=time.perf_counter() - started))
+        return reports
+
+    @_timed
+    def insert_table_rows(self, table_name: Tables, data: Iterable[Kontraktor | Pracownik | Stanowisko | Zespol],
+                          chunk_size: int = 1000) -> List[ChunkReport]:
+        """
+        Inserts records using multi-row INSERT statements, one transaction per chunk.
+        :param table_name: table name
+        :param data: dataclass objects of the table
+        :param chunk_size: number of records per statement and transaction
+        :return: timing of the processed chunks
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+
+        statements = STATEMENTS[table_name]
+
+        def execute(transaction: Transaction, chunk):
+            transaction.executemany(statements.insert, chunk)
+            # keys generated by the multi-row INSERT are not reported per row
+            self._audit(transaction, table_name, ChangeKind.INSERT,
+                        [(None, None, self._params_image(table_name, params + (None,))) for params in chunk])
+
+        return self._execute_chunks(table_name, [statements.insert_values(item) for item in data], chunk_size, execute)
+
+    @_timed
+    def update_table_rows(self, table_name: Tables, data: Iterable[Kontraktor | Pracownik | Stanowisko | Zespol],
+                          chunk_size: int = 1000) -> List[ChunkReport]:
+        """
+        Updates records identified by their primary keys, one transaction per chunk.
+        :param table_name: table name
+        :param data: dataclass objects of the table
+        :param chunk_size: number of records per transaction
+        :return: timing of the processed chunks
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+
+        statements = STATEMENTS[table_name]
 
-        with self.connection.cursor() as cursor:
-            cursor.execute(query_template, asdict(data))
+        def execute(transaction: Transaction, chunk):
+            # primary keys of the records parsed from CSV or JSON may be strings
+            ids = [int(params[-1]) for params in chunk]
+            before = self._before_images(transaction, table_name, ids)
+            transaction.executemany(statements.update, chunk)
+            self._audit(transaction, table_name, ChangeKind.UPDATE,
+                        [(key, before[key], self._params_image(table_name, params[:-1] + (key,)))
+                         for key, params in zip(ids, chunk) if key in before])
 
-        self.connection.commit
+        return self._execute_chunks(table_name, [statements.update_values(item) for item in data], chunk_size, execute)
+
+    @_timed
+    def remove_table_rows(self, table_name: Tables, ids: Iterable[int], chunk_size: int = 1000) -> List[ChunkReport]:
+        """
+        Removes records with a single `DELETE ... WHERE pk IN (...)` per chunk, padded to the power of two.
+        :param table_name: table name
+        :param ids: primary keys of the records to remove
+        :param chunk_size: number of records per statement and transaction
+        :return: timing of the processed chunks
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+
+        def execute(transaction: Transaction, chunk):
+            before = self._before_images(transaction, table_name, chunk)
+            params = _padded(chunk)
+            transaction.execute(delete_many_statement(table_name, len(params)), params)
+            self._audit(transaction, table_name, ChangeKind.DELETE,
+                        [(key, image, None) for key, image in before.items()])
+
+        return self._execute_chunks(table_name, [int(item) for item in ids], chunk_size, execute)
+
+    @_timed
+    def get_record_history(self, table_name: Tables, id: int, before: Optional[int] = None,
+                           limit: int = 20) -> Tuple[List[AuditRecord], bool]:
+        """
+        :param before: id of the audit record the page ends before, the newest changes when not set
+        :param limit: number of the changes per page
+        :return: changes of the record from the audit log, the newest first, and whether older changes follow
+        """
+        if table_name not in TABLE_DETAILS:
+            raise ValueError(f"Invalid table {table_name}")
+        if self.audit_log is None:
+            return [], False
+        return self.audit_log.history(table_name, id, before, limit)
 
     @staticmethod
     def get_table_headers(table_name: Tables) -> List[str]:
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
         return [item.header for item in TABLE_DETAILS[table_name].fields_details]
 
     @staticmethod
     def get_table_fields_details(table_name: Tables) -> List[FieldDetails]:
-        if table_name not in Tables:
+        if table_name not in TABLE_DETAILS:
             raise ValueError(f"Invalid table {table_name}")
 
         return list(TABLE_DETAILS[table_name].fields_details)
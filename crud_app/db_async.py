@@ -0,0 +1,50 @@
+"""
+Asynchronous interface to the database for the async FastHTML handlers.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from crud_app.db import DbInterface
+
+
+class AsyncDbInterface:
+    """
+    Class representing the asynchronous counterpart of `DbInterface` with the same method surface.
+    Blocking methods return awaitables executed in a bounded thread pool, so slow queries do not block
+    the event loop, methods not touching the database are passed through unchanged.
+    """
+    NON_BLOCKING_METHODS = frozenset({'get_tables', 'check_table_exists', 'get_table_headers',
+                                      'get_table_fields_details', 'get_pool_stats', 'get_cache_stats',
+                                      'get_table_version', 'get_record_version'})
+
+    def __init__(self, db_interface: DbInterface, max_workers: int):
+        self.db_interface = db_interface
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.db_interface, name)
+        if name in self.NON_BLOCKING_METHODS or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        async def method(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        return method
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs the blocking function using the database, e.g. of the module built on `DbInterface`, in the thread pool.
+        :return: result of the function
+        """
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, function, *args, **kwargs))
+
+    def close(self):
+        """
+        Stops the worker threads, pending calls are finished first.
+        """
+        self.executor.shutdown(wait=True)
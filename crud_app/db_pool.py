@@ -0,0 +1,220 @@
+"""
+Thread-safe pool of MySQL connections used by `DbInterface`.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import mysql.connector
+from mysql.connector.errors import Error, PoolError
+
+
+class PoolSettings(NamedTuple):
+    """
+    NamedTuple representing the configuration of the connection pool.
+    """
+    min_size: int = 1
+    max_size: int = 1
+    timeout: float = 30.0
+    ping_interval: float = 1.0
+
+
+class PoolStats(NamedTuple):
+    """
+    NamedTuple representing a snapshot of the connection pool statistics.
+    """
+    size: int
+    idle: int
+    in_use: int
+    waiting: int
+    checkouts: int
+    timeouts: int
+    reconnects: int
+    checkout_time_total: float
+    checkout_time_max: float
+
+
+class ConnectionPool:  # pylint: disable=too-many-instance-attributes
+    """
+    Class representing a bounded pool of connections, every request checks out its own connection
+    and returns it when done. Idle connections are health-checked on checkout and replaced when broken.
+    A process forked from the one which opened the connections does not use them, it opens its own.
+    """
+    def __init__(self, connect_args: dict, settings: PoolSettings = PoolSettings()):
+        if not 0 <= settings.min_size <= settings.max_size or settings.max_size < 1:
+            raise ValueError(f"Invalid pool size: min={settings.min_size}, max={settings.max_size}")
+
+        self.connect_args = connect_args
+        self.settings = settings
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._pid = os.getpid()
+
+        for _ in range(settings.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _discard_inherited(self):
+        """
+        Forgets the connections inherited from the parent process, must be called with the condition held.
+        They are not closed, closing would end the sessions still used by the parent through the same sockets.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._idle = []
+        self._size = 0
+
+    def _connect(self):
+        return mysql.connector.connect(**self.connect_args)
+
+    def _ensure_healthy(self, connection, idle_since: float):
+        """
+        :param connection: connection taken from the idle list
+        :param idle_since: monotonic time of the connection's last return to the pool
+        :return: working connection, either the checked one or a replacement
+        """
+        if time.monotonic() - idle_since < self.settings.ping_interval:
+            return connection
+
+        try:
+            connection.ping(reconnect=False)
+            return connection
+        except Error:
+            pass
+
+        with self._condition:
+            self._reconnects += 1
+        try:
+            connection.close()
+        except Error:
+            pass
+        return self._connect()
+
+    def checkout(self):
+        """
+        Takes a connection from the pool, opening a new one if the pool is below its maximum size.
+        :return: connection object
+        :raises PoolError: when no connection becomes available within the configured timeout
+        """
+        started = time.monotonic()
+        deadline = started + self.settings.timeout
+        connection = None
+
+        with self._condition:
+            self._discard_inherited()
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        connection, idle_since = self._idle.pop()
+                        break
+                    if self._size < self.settings.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolError(f"No connection available within {self.settings.timeout}s")
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        try:
+            if connection is None:
+                connection = self._connect()
+            else:
+                connection = self._ensure_healthy(connection, idle_since)
+        except Error:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._condition:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return connection
+
+    def checkin(self, connection, broken: bool = False):
+        """
+        Returns the connection to the pool, any transaction left open is rolled back.
+        :param connection: connection obtained from `checkout`
+        :param broken: drop the connection instead of reusing it
+        """
+        if self._pid != os.getpid():
+            return
+        if not broken:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except Error:
+                broken = True
+
+        with self._condition:
+            if broken:
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+        if broken:
+            try:
+                connection.close()
+            except Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager checking out a connection for the duration of the block.
+        """
+        connection = self.checkout()
+        broken = False
+        try:
+            yield connection
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.checkin(connection, broken)
+
+    def stats(self) -> PoolStats:
+        """
+        :return: current pool statistics
+        """
+        with self._condition:
+            return PoolStats(size=self._size,
+                             idle=len(self._idle),
+                             in_use=self._size - len(self._idle),
+                             waiting=self._waiting,
+                             checkouts=self._checkouts,
+                             timeouts=self._timeouts,
+                             reconnects=self._reconnects,
+                             checkout_time_total=self._checkout_time_total,
+                             checkout_time_max=self._checkout_time_max)
+
+    def close(self):
+        """
+        Closes all idle connections, connections in use are closed when returned.
+        """
+        with self._condition:
+            self._discard_inherited()
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Error:
+                pass
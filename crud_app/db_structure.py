@@ -2,9 +2,11 @@
 Definition of the Python structures required to operate on database
 """
 
-from dataclasses import dataclass
+from dataclasses import field, make_dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
 from enum import StrEnum, auto
-from typing import List, NamedTuple
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
 
 
 class Tables(StrEnum):
@@ -32,14 +34,26 @@ class FormFieldTypes(StrEnum):
     TEXT = auto()
 
 
+class ForeignKey(NamedTuple):
+    """
+    NamedTuple representing the table referenced by the field,
+    values of `label_fields` are shown instead of the referenced primary key.
+    """
+    table_name: Tables
+    label_fields: Tuple[str, ...]
+
+
 class FieldDetails(NamedTuple):
     """
-    NamedTuple representing the details of the field in the database table.
+    NamedTuple representing the details of the field in the database table,
+    `choices` are the allowed values of the field, e.g. of the `enum` column.
     """
     name: str
     header: str
     form_type: FormFieldTypes
     required: bool
+    references: Optional[ForeignKey] = None
+    choices: Tuple[str, ...] = ()
 
 
 class TableDetails(NamedTuple):
@@ -51,6 +65,30 @@ class TableDetails(NamedTuple):
     fields_details: List[FieldDetails]
 
 
+class TablePage(NamedTuple):
+    """
+    NamedTuple representing one page of table rows fetched with keyset pagination,
+    `next_key`/`prev_key` are the sort column values of the boundary rows.
+    """
+    rows: Sequence[tuple]
+    next_after: Optional[int]
+    prev_before: Optional[int]
+    next_key: Any = None
+    prev_key: Any = None
+
+
+class TableQuery(NamedTuple):
+    """
+    NamedTuple representing sorting, filtering and searching of the table view.
+    Filters are tuples of field name, operator (`=`, `>=` or `<=`) and value,
+    search matches the prefix of any TEXT field.
+    """
+    sort: Optional[str] = None
+    descending: bool = False
+    filters: Tuple[Tuple[str, str, Any], ...] = ()
+    search: Optional[str] = None
+
+
 TABLE_DETAILS = {
     Tables.KONTRAKTORZY: TableDetails(
         table_name='kontraktorzy',
@@ -59,10 +97,11 @@ TABLE_DETAILS = {
             FieldDetails('idkontr', 'ID', FormFieldTypes.HIDDEN, True),
             FieldDetails('imie', 'Imię', FormFieldTypes.TEXT, True),
             FieldDetails('nazwisko', 'Nazwisko', FormFieldTypes.TEXT, True),
-            FieldDetails('przelozony', 'Przełożony', FormFieldTypes.NUMBER, True),
+            FieldDetails('przelozony', 'Przełożony', FormFieldTypes.NUMBER, True,
+                         ForeignKey(Tables.PRACOWNICY, ('imie', 'nazwisko'))),
             FieldDetails('data_zatrudn', 'Data zatrudnienia', FormFieldTypes.DATE, False),
             FieldDetails('stawka_godzinowa', 'Stawka godzinowa', FormFieldTypes.NUMBER, False),
-            FieldDetails('plec', 'Płeć', FormFieldTypes.RADIO, False)
+            FieldDetails('plec', 'Płeć', FormFieldTypes.RADIO, False, choices=('K', 'M'))
         ]
     ),
     Tables.PRACOWNICY: TableDetails(
@@ -72,12 +111,15 @@ TABLE_DETAILS = {
             FieldDetails('idprac', 'ID', FormFieldTypes.HIDDEN, True),
             FieldDetails('imie', 'Imię', FormFieldTypes.TEXT, True),
             FieldDetails('nazwisko', 'Nazwisko', FormFieldTypes.TEXT, True),
-            FieldDetails('stanowisko', 'Stanowisko', FormFieldTypes.NUMBER, True),
-            FieldDetails('przelozony', 'Przełożony', FormFieldTypes.NUMBER, True),
+            FieldDetails('stanowisko', 'Stanowisko', FormFieldTypes.NUMBER, True,
+                         ForeignKey(Tables.STANOWISKA, ('nazwa',))),
+            FieldDetails('przelozony', 'Przełożony', FormFieldTypes.NUMBER, True,
+                         ForeignKey(Tables.PRACOWNICY, ('imie', 'nazwisko'))),
             FieldDetails('data_zatrudn', 'Data zatrudnienia', FormFieldTypes.DATE, False),
-            FieldDetails('zespol', 'Zespół', FormFieldTypes.NUMBER, True),
+            FieldDetails('zespol', 'Zespół', FormFieldTypes.NUMBER, True,
+                         ForeignKey(Tables.ZESPOLY, ('nazwa',))),
             FieldDetails('wynagrodzenie', 'Wynagrodzenie', FormFieldTypes.NUMBER, False),
-            FieldDetails('plec', 'Płeć', FormFieldTypes.RADIO, False)
+            FieldDetails('plec', 'Płeć', FormFieldTypes.RADIO, False, choices=('K', 'M'))
         ]
     ),
     Tables.STANOWISKA: TableDetails(
@@ -91,7 +133,7 @@ TABLE_DETAILS = {
         ]
     ),
     Tables.ZESPOLY: TableDetails(
-        table_name='zespoły',
+        table_name='zespoly',
         primary_key='idzespol',
         fields_details=[
             FieldDetails('idzespol', 'ID', FormFieldTypes.HIDDEN, True),
@@ -102,131 +144,124 @@ TABLE_DETAILS = {
 }
 
 
-@dataclass
-class Kontraktor:
-    """
-    Dataclass representing the Kontraktorzy table in the database,
-    required for processing POSTs by FastHTML framework.
-    """
-    idkontr: int
-    imie: str
-    nazwisko: str
-    przelozony: int
-    data_zatrudn: str = None
-    stawka_godzinowa: float = None
-    plec: str = None
-
-    @staticmethod
-    def generate_update_query_str():
-        """
-        UPDATE query template for the table
-        :return: string with the template
-        """
-        return "UPDATE kontraktorzy SET imie=%(imie)s, nazwisko=%(nazwisko)s, przelozony=%(przelozony)s, " \
-               "data_zatrudn=%(data_zatrudn)s, stawka_godzinowa=%(stawka_godzinowa)s, plec=%(plec)s " \
-               "WHERE idkontr=%(idkontr)s"
-
-    @staticmethod
-    def generate_insert_query_str():
-        """
-        INSERT query template for the table
-        :return: string with the template
-        """
-        return "INSERT INTO kontraktorzy (imie, nazwisko, przelozony, data_zatrudn, stawka_godzinowa, plec) " \
-               "VALUES (%(imie)s, %(nazwisko)s, %(przelozony)s, %(data_zatrudn)s, %(stawka_godzinowa)s, %(plec)s)"
-
-
-@dataclass
-class Pracownik: # pylint: disable=too-many-instance-attributes
-    """
-    Dataclass representing the Pracownicy table in the database,
-    required for processing POSTs by FastHTML framework.
-    """
-    idprac: int
-    imie: str
-    nazwisko: str
-    stanowisko: int
-    przelozony: int
-    zespol: int
-    data_zatrudn: str = None
-    wynagrodzenie: float = None
-    plec: str = None
-
-    @staticmethod
-    def generate_update_query_str():
-        """
-        UPDATE query template for the table
-        :return: string with the template
-        """
-        return "UPDATE pracownicy SET imie=%(imie)s, nazwisko=%(nazwisko)s, stanowisko=%(stanowisko)s, " \
-               "przelozony=%(przelozony)s, data_zatrudn=%(data_zatrudn)s, zespol=%(zespol)s, " \
-               "wynagrodzenie=%(wynagrodzenie)s, plec=%(plec)s WHERE idprac=%(idprac)s"
-
-    @staticmethod
-    def generate_insert_query_str():
-        """
-        INSERT query template for the table
-        :return: string with the template
-        """
-        return ("INSERT INTO pracownicy "
-                "(imie, nazwisko, stanowisko, przelozony, data_zatrudn, zespol, wynagrodzenie, plec) "
-                "VALUES (%(imie)s, %(nazwisko)s, %(stanowisko)s, %(przelozony)s, "
-                "%(data_zatrudn)s, %(zespol)s, %(wynagrodzenie)s, %(plec)s)")
-
-
-@dataclass
-class Stanowisko:
-    """
-    Dataclass representing the Stanowsika table in the database,
-    required for processing POSTs by FastHTML framework.
-    """
-    idstanow: int
-    nazwa: str
-    placa_min: float = None
-    placa_max: float = None
-
-    @staticmethod
-    def generate_update_query_str():
-        """
-        UPDATE query template for the table
-        :return: string with the template
-        """
-        return ("UPDATE stanowiska "
-                "SET nazwa=%(nazwa)s, placa_min=%(placa_min)s, placa_max=%(placa_max)s "
-                "WHERE idstanow=%(idstanow)s")
-
-    @staticmethod
-    def generate_insert_query_str():
-        """
-        INSERT query template for the table
-        :return: string with the template
-        """
-        return ("INSERT INTO stanowiska (nazwa, placa_min, placa_max) "
-                "VALUES (%(nazwa)s, %(placa_min)s, %(placa_max)s)")
-
-
-@dataclass
-class Zespol:
-    """
-    Dataclass representing the Zespoly table in the database,
-    required for processing POSTs by FastHTML framework.
-    """
-    idzespol: int
-    nazwa: str
-    dzial: str
-
-    @staticmethod
-    def generate_update_query_str():
-        """
-        UPDATE query template for the table
-        :return: string with the template
-        """
-        return "UPDATE zespoly SET nazwa=%(nazwa)s, dzial=%(dzial)s WHERE idzespol=%(idzespol)s"
-
-    @staticmethod
-    def generate_insert_query_str():
-        """
-        INSERT query template for the table
-        :return: string with the template
-        """
-        return "INSERT INTO zespoly (nazwa, dzial) VALUES (%(nazwa)s, %(dzial)s)"
+def _field_type(details: TableDetails, field_details: FieldDetails) -> type:
+    """
+    :return: type of the dataclass field, used by FastHTML to convert the form values
+    """
+    if field_details.name == details.primary_key or field_details.references:
+        return int
+    return float if field_details.form_type == FormFieldTypes.NUMBER else str
+
+
+def _compile_to_params(names: List[str]) -> Callable[[Any], tuple]:
+    """
+    :return: method returning the field values in the column order, without building a dict like `asdict`
+    """
+    namespace = {}
+    exec(f"def to_params(self):\n    return ({''.join(f'self.{name}, ' for name in names)})\n",  # pylint: disable=exec-used
+         namespace)
+    return namespace["to_params"]
+
+
+def create_data_class(class_name: str, details: TableDetails) -> type:
+    """
+    Generates the slotted dataclass of the table, required fields come first in the column order,
+    followed by the optional ones defaulting to None.
+    :param class_name: name of the class
+    :param details: table details
+    :return: dataclass required for processing POSTs by FastHTML framework
+    """
+    fields_details = details.fields_details
+    data_class = make_dataclass(
+        class_name,
+        [(item.name, _field_type(details, item)) for item in fields_details if item.required] +
+        [(item.name, _field_type(details, item), field(default=None)) for item in fields_details if not item.required],
+        namespace={"to_params": _compile_to_params([item.name for item in fields_details])},
+        slots=True)
+    data_class.__doc__ = (f"Dataclass representing the {details.table_name.capitalize()} table in the database,\n"
+                          f"required for processing POSTs by FastHTML framework.")
+    return data_class
+
+
+# pylint: disable=invalid-name
+Kontraktor = create_data_class("Kontraktor", TABLE_DETAILS[Tables.KONTRAKTORZY])
+Pracownik = create_data_class("Pracownik", TABLE_DETAILS[Tables.PRACOWNICY])
+Stanowisko = create_data_class("Stanowisko", TABLE_DETAILS[Tables.STANOWISKA])
+Zespol = create_data_class("Zespol", TABLE_DETAILS[Tables.ZESPOLY])
+# pylint: enable=invalid-name
+
+
+DATA_CLASSES = {
+    Tables.KONTRAKTORZY: Kontraktor,
+    Tables.PRACOWNICY: Pracownik,
+    Tables.STANOWISKA: Stanowisko,
+    Tables.ZESPOLY: Zespol,
+}
+
+
+class ChunkReport(NamedTuple):
+    """
+    NamedTuple representing the result of one chunk of a bulk operation.
+    """
+    rows: int
+    seconds: float
+
+
+def create_record(table_name: Tables, values: dict):
+    """
+    Creates the dataclass object of the table from the mapping of field names to values,
+    empty strings are converted to None, unknown keys are ignored.
+    :param table_name: table name
+    :param values: mapping of field names to values, e.g. JSON object or CSV row
+    :return: dataclass object representing the record
+    """
+    field_names = [field.name for field in TABLE_DETAILS[table_name].fields_details]
+    return DATA_CLASSES[table_name](**{name: None if values[name] == '' else values[name]
+                                       for name in field_names if name in values})
+
+
+def _form_value(details: TableDetails, field_details: FieldDetails, value: str):
+    """
+    :return: form value converted to the type of the column: keys to int, numbers to Decimal, dates to date
+    """
+    if field_details.name == details.primary_key or field_details.references:
+        return int(value)
+    if field_details.form_type == FormFieldTypes.NUMBER:
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(value) from None
+        if not number.is_finite():
+            raise ValueError(value)
+        return number
+    if field_details.form_type == FormFieldTypes.DATE:
+        return date.fromisoformat(value)
+    if field_details.choices and value not in field_details.choices:
+        raise ValueError(value)
+    return value
+
+
+def parse_form_record(table_name: Tables, values: dict):
+    """
+    Creates the dataclass object of the table from the submitted form, the values are converted
+    by the field types and empty values to None, unknown keys are ignored.
+    :param table_name: table name
+    :param values: mapping of field names to the form values
+    :return: dataclass object representing the record
+    :raises ValueError: for the invalid values and the missing values of the required fields,
+        except the primary key which is empty in the form of a new record
+    """
+    details = TABLE_DETAILS[table_name]
+    record = {}
+    for field_details in details.fields_details:
+        value = values.get(field_details.name, '')
+        if value == '':
+            if field_details.required and field_details.name != details.primary_key:
+                raise ValueError(f"Missing value of {field_details.name}")
+            record[field_details.name] = None
+            continue
+        try:
+            record[field_details.name] = _form_value(details, field_details, value)
+        except ValueError:
+            raise ValueError(f"Invalid value of {field_details.name}: {value}") from None
+    return DATA_CLASSES[table_name](**record)
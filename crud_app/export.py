@@ -0,0 +1,64 @@
+"""
+Streaming serializers used by the table export endpoint.
+"""
+import csv
+import io
+import json
+import zlib
+from enum import StrEnum, auto
+from typing import Iterable, Iterator, List
+
+
+class ExportFormats(StrEnum):
+    """
+    Enum class representing the supported export formats
+    """
+    CSV = auto()
+    JSONL = auto()
+
+
+MEDIA_TYPES = {
+    ExportFormats.CSV: "text/csv; charset=utf-8",
+    ExportFormats.JSONL: "application/x-ndjson",
+}
+GZIP_MEDIA_TYPE = "application/gzip"
+
+
+def csv_chunks(headers: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    :param headers: column titles written as the first line
+    :param batches: batches of rows
+    :return: one encoded chunk per batch
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def jsonl_chunks(field_names: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    :param field_names: keys of the JSON objects, in column order
+    :param batches: batches of rows
+    :return: one encoded chunk per batch, one JSON object per line
+    """
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(field_names, row)), default=str, ensure_ascii=False) + "\n"
+                      for row in rows).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compresses the stream on the fly into the gzip format.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,104 @@
+"""
+Fast rendering of the table rows for the list view.
+
+The page is rendered by FastHTML once with a sentinel row in place of the data, the markup of the sentinel row
+becomes a format template filled with the escaped values of every row, so the output is identical
+to the component tree without building `Tr`/`Td` objects per cell.
+"""
+import re
+from functools import lru_cache
+from html import escape
+from typing import Callable, Dict, Iterator, NamedTuple, Sequence
+
+from crud_app.rows import ColumnRows
+
+# private use characters, left untouched by the HTML escaping
+_SENTINEL_START, _SENTINEL_END = "\ue000", "\ue001"
+_SENTINEL = _SENTINEL_START + "{}" + _SENTINEL_END
+_SENTINEL_PATTERN = re.compile(_SENTINEL_START + r"(\d+)" + _SENTINEL_END)
+
+
+def _escape(value: str) -> str:
+    return escape(value, quote=False)
+
+
+class PageParts(NamedTuple):
+    """
+    NamedTuple representing the rendered page split around the sentinel row.
+    """
+    prefix: str
+    row: str
+    suffix: str
+
+
+def sentinel_row(columns: int) -> tuple:
+    """
+    :param columns: number of columns of the table
+    :return: row rendered in place of the data, every cell holds its column index
+    """
+    return tuple(_SENTINEL.format(index) for index in range(columns))
+
+
+def split_page(html: str) -> PageParts:
+    """
+    :param html: page rendered with exactly one sentinel row
+    :return: markup before the row, of the row (with its indentation and line end) and after the row
+    """
+    first, last = html.index(_SENTINEL_START), html.rindex(_SENTINEL_END)
+    start = html.rindex("<tr", 0, first)
+    while start and html[start - 1] == " ":
+        start -= 1
+    end = html.index("</tr>", last) + len("</tr>")
+    if html.startswith("\n", end):
+        end += 1
+    return PageParts(prefix=html[:start], row=html[start:end], suffix=html[end:])
+
+
+@lru_cache(maxsize=64)
+def compile_row(row_html: str) -> Callable[..., str]:
+    """
+    :param row_html: markup of the sentinel row
+    :return: function taking the escaped cell values in column order and returning the row markup
+    """
+    parts = _SENTINEL_PATTERN.split(row_html)
+    template = "".join(part.replace("{", "{{").replace("}", "}}") if index % 2 == 0 else f"{{{part}}}"
+                       for index, part in enumerate(parts))
+    return template.format
+
+
+def render_rows(row_html: str, rows: Sequence[tuple], labels: Dict[int, Dict[int, str]] = None) -> Iterator[str]:
+    """
+    Converts and escapes the values column by column, so the conversions run in C over whole columns.
+    :param row_html: markup of the sentinel row
+    :param rows: rows of the table, `ColumnRows` are used without transposing
+    :param labels: labels of the foreign keys per column index, shown instead of the keys like in `generate_rows`
+    :return: markup of every row
+    """
+    if not rows:
+        return iter(())
+    labels = labels or {}
+    columns = rows.columns if isinstance(rows, ColumnRows) else tuple(zip(*rows))
+    texts = [map(_escape, _column_texts(column, labels.get(index))) for index, column in enumerate(columns)]
+    return map(compile_row(row_html), *texts)
+
+
+def _column_texts(column: Sequence, names: Dict[int, str] = None) -> Iterator[str]:
+    if names is None:
+        return map(str, column)
+    return (names.get(cell, str(cell)) for cell in column)
+
+
+def stream_page(parts: PageParts, rows: Sequence[tuple], labels: Dict[int, Dict[int, str]] = None,
+                chunk_rows: int = 200) -> Iterator[bytes]:
+    """
+    :param parts: page split around the sentinel row
+    :param rows: rows of the table
+    :param labels: labels of the foreign keys per column index
+    :param chunk_rows: number of rows per chunk of the response
+    :return: encoded chunks of the page
+    """
+    yield parts.prefix.encode("utf-8")
+    rendered = render_rows(parts.row, rows, labels)
+    while chunk := "".join(row for _, row in zip(range(chunk_rows), rendered)):
+        yield chunk.encode("utf-8")
+    yield parts.suffix.encode("utf-8")
@@ -0,0 +1,202 @@
+"""
+Streaming import of CSV files into the database tables, validated against `TABLE_DETAILS`.
+
+Usage: python -m crud_app.importer <table_name> <file.csv> [--chunk-size N]
+"""
+import argparse
+import csv
+import re
+import sys
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from crud_app.db import DbInterface
+from crud_app.db_structure import ChunkReport, FormFieldTypes, TABLE_DETAILS, Tables, create_record
+from crud_app.introspection import configure_tables
+from crud_app.settings import create_db_interface
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+class RowError(NamedTuple):
+    """
+    NamedTuple representing the rejected CSV row.
+    """
+    line: int
+    errors: List[str]
+
+
+class ImportReport(NamedTuple):
+    """
+    NamedTuple representing the result of the import.
+    """
+    rows_read: int
+    rows_inserted: int
+    rows_rejected: int
+    rejects: List[RowError]
+    chunks: List[ChunkReport]
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        :return: throughput of the whole import
+        """
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _check_number(value: str) -> Optional[str]:
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return "not a number"
+    # Decimal accepts NaN and Infinity, the DECIMAL columns do not
+    return None if number.is_finite() else "not a number"
+
+
+def _check_integer(value: str) -> Optional[str]:
+    try:
+        int(value)
+    except ValueError:
+        return "not an integer"
+    return None
+
+
+def _check_date(value: str) -> Optional[str]:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return "not a date (YYYY-MM-DD)"
+    return None
+
+
+def _check_email(value: str) -> Optional[str]:
+    return None if EMAIL_PATTERN.match(value) else "not an e-mail address"
+
+
+def _choices_check(choices: tuple) -> Callable[[str], Optional[str]]:
+    return lambda value: None if value in choices else f"not one of {', '.join(choices)}"
+
+
+VALUE_CHECKS = {
+    FormFieldTypes.NUMBER: _check_number,
+    FormFieldTypes.DATE: _check_date,
+    FormFieldTypes.EMAIL: _check_email,
+}
+
+
+def create_validator(table_name: Tables) -> Callable[[dict], List[str]]:
+    """
+    Prepares the validation rules of the table once, the primary key is skipped as it is generated by the database,
+    the foreign keys are integers.
+    :param table_name: table name
+    :return: function returning the list of errors of the CSV row
+    """
+    primary_key = TABLE_DETAILS[table_name].primary_key
+    rules = [(field.name, field.required,
+              _choices_check(field.choices) if field.choices else
+              _check_integer if field.references else VALUE_CHECKS.get(field.form_type))
+             for field in TABLE_DETAILS[table_name].fields_details if field.name != primary_key]
+
+    def validate(row: dict) -> List[str]:
+        errors = []
+        for name, required, check in rules:
+            value = row.get(name)
+            if value is None or value == '':
+                if required:
+                    errors.append(f"{name}: value required")
+            elif check is not None and (error := check(value)) is not None:
+                errors.append(f"{name}: {error}")
+        return errors
+
+    return validate
+
+
+def import_csv(db_interface: DbInterface, table_name: Tables, lines: Iterable[str],  # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+               chunk_size: int = 1000, max_rejects: int = 1000,
+               progress: Callable[[int, float], None] = None) -> ImportReport:
+    """
+    Reads the CSV rows one by one, valid rows are inserted in chunks, one transaction per chunk.
+    :param db_interface: database interface
+    :param table_name: table name
+    :param lines: text lines of the CSV file with the header in the first line, e.g. open file
+    :param chunk_size: number of rows per multi-row INSERT
+    :param max_rejects: number of rejected rows kept in the report, all are counted
+    :param progress: called with the number of rows read and elapsed seconds after every chunk
+    :return: import report
+    """
+    if table_name not in TABLE_DETAILS:
+        raise ValueError(f"Invalid table {table_name}")
+
+    reader = csv.DictReader(lines)
+    known_fields = {field.name for field in TABLE_DETAILS[table_name].fields_details}
+    if reader.fieldnames is None or not set(reader.fieldnames) & known_fields:
+        raise ValueError(f"CSV header does not contain any field of {table_name}")
+
+    validate = create_validator(table_name)
+    primary_key = TABLE_DETAILS[table_name].primary_key
+    started = time.perf_counter()
+    rows_read = rows_rejected = 0
+    rejects, chunks, chunk = [], [], []
+
+    def flush():
+        nonlocal chunk
+        chunks.extend(db_interface.insert_table_rows(table_name, chunk, chunk_size))
+        chunk = []
+        if progress is not None:
+            progress(rows_read, time.perf_counter() - started)
+
+    for row in reader:
+        rows_read += 1
+        if errors := validate(row):
+            rows_rejected += 1
+            if len(rejects) < max_rejects:
+                rejects.append(RowError(line=reader.line_num, errors=errors))
+            continue
+        chunk.append(create_record(table_name, {**row, primary_key: 0}))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    return ImportReport(rows_read=rows_read,
+                        rows_inserted=sum(report.rows for report in chunks),
+                        rows_rejected=rows_rejected,
+                        rejects=rejects,
+                        chunks=chunks,
+                        seconds=time.perf_counter() - started)
+
+
+def main(argv: List[str] = None):
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Import CSV file into the database table")
+    parser.add_argument("table_name")
+    parser.add_argument("csv_file")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    def report_progress(rows_read: int, seconds: float):
+        print(f"{rows_read} rows read, {rows_read / seconds:.0f} rows/s", file=sys.stderr)
+
+    db_interface = create_db_interface()
+    configure_tables(db_interface)
+    if not db_interface.check_table_exists(args.table_name):
+        parser.error(f"unknown table {args.table_name}, choose from {', '.join(sorted(db_interface.get_tables()))}")
+
+    with open(args.csv_file, newline='', encoding="utf-8") as csv_file:
+        report = import_csv(db_interface, args.table_name, csv_file,
+                            chunk_size=args.chunk_size, progress=report_progress)
+
+    for reject in report.rejects:
+        print(f"line {reject.line}: {'; '.join(reject.errors)}")
+    print(f"{report.rows_inserted} rows inserted, {report.rows_rejected} rejected "
+          f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)")
+    return 1 if report.rows_rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
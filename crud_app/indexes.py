@@ -0,0 +1,70 @@
+"""
+Index advisor for the sorting, filtering and searching of the table view.
+
+InnoDB secondary indexes carry the primary key, so an index on the sort column alone serves
+the keyset condition `(column, primary key)` and the prefix `LIKE` search.
+
+Usage: python -m crud_app.indexes > db/migrations/001_table_view_indexes.sql
+"""
+import sys
+from typing import Dict, List, NamedTuple, Set
+
+from crud_app.db_structure import FormFieldTypes, TABLE_DETAILS, Tables
+
+INDEXED_TYPES = (FormFieldTypes.TEXT, FormFieldTypes.NUMBER, FormFieldTypes.DATE, FormFieldTypes.EMAIL)
+
+# leading columns of the indexes created by db/lab_db_v3.sql, besides the primary keys
+SCHEMA_INDEXES: Dict[Tables, Set[str]] = {
+    Tables.PRACOWNICY: {"zespol", "stanowisko"},
+    Tables.KONTRAKTORZY: {"przelozony"},
+}
+
+
+class IndexRecommendation(NamedTuple):
+    """
+    NamedTuple representing the recommended index.
+    """
+    table_name: Tables
+    column: str
+
+    @property
+    def index_name(self) -> str:
+        """
+        :return: name of the index
+        """
+        return f"ix_{self.table_name}_{self.column}"
+
+    @property
+    def statement(self) -> str:
+        """
+        :return: DDL statement creating the index, safe to run more than once
+        """
+        return f"CREATE INDEX IF NOT EXISTS {self.index_name} ON {self.table_name} ({self.column});"
+
+
+def recommend_indexes(existing: Dict[Tables, Set[str]] = None) -> List[IndexRecommendation]:
+    """
+    :param existing: leading columns of the existing indexes per table, `SCHEMA_INDEXES` when not set
+    :return: indexes on the sortable and filterable columns not covered by the primary key or existing indexes
+    """
+    existing = SCHEMA_INDEXES if existing is None else existing
+    return [IndexRecommendation(table_name, field.name)
+            for table_name, details in TABLE_DETAILS.items()
+            for field in details.fields_details
+            if field.form_type in INDEXED_TYPES
+            and field.name != details.primary_key
+            and field.name not in existing.get(table_name, set())]
+
+
+def main():
+    """
+    Command line entry point, prints the migration.
+    """
+    print("-- indexes serving ORDER BY, filters and prefix search of the table view")
+    for recommendation in recommend_indexes():
+        print(recommendation.statement)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
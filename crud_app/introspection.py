@@ -0,0 +1,222 @@
+"""
+Table registry generated from `information_schema`, in place of the static `TABLE_DETAILS`.
+
+Usage: python -m crud_app.introspection [--output schema.json]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+from decouple import config
+
+from crud_app.audit import AUDIT_TABLE
+from crud_app.db import DbInterface
+from crud_app.db_structure import (DATA_CLASSES, TABLE_DETAILS, FieldDetails, ForeignKey, FormFieldTypes,
+                                   TableDetails, create_data_class)
+from crud_app.settings import create_db_interface
+from crud_app.statements import (STATEMENTS, build_statements, delete_many_statement, labels_statement,
+                                 lock_many_statement, select_statement)
+
+logger = logging.getLogger(__name__)
+
+COLUMNS_QUERY = (
+    "SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY, c.COLUMN_COMMENT "
+    "FROM information_schema.COLUMNS c JOIN information_schema.TABLES t "
+    "ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME "
+    "WHERE c.TABLE_SCHEMA = %s AND t.TABLE_TYPE = 'BASE TABLE' "
+    "ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION")
+REFERENCES_QUERY = (
+    "SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE "
+    "WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL")
+
+NUMBER_TYPES = frozenset({'tinyint', 'smallint', 'mediumint', 'int', 'bigint', 'decimal', 'float', 'double'})
+DATE_TYPES = frozenset({'date'})
+TEXT_TYPES = frozenset({'char', 'varchar'})
+ENUM_VALUE_PATTERN = re.compile(r"'((?:[^']|'')*)'")
+MAX_LABEL_FIELDS = 2
+
+
+def form_type(column_name: str, data_type: str) -> FormFieldTypes:
+    """
+    :return: type of the form field of the column
+    """
+    if data_type in NUMBER_TYPES:
+        return FormFieldTypes.NUMBER
+    if data_type in DATE_TYPES:
+        return FormFieldTypes.DATE
+    if data_type == 'enum':
+        return FormFieldTypes.RADIO
+    if 'mail' in column_name:
+        return FormFieldTypes.EMAIL
+    return FormFieldTypes.TEXT
+
+
+def enum_values(column_type: str) -> tuple:
+    """
+    :param column_type: column type, e.g. `enum('K','M')`
+    :return: values of the enum, empty for other types
+    """
+    if not column_type.startswith("enum("):
+        return ()
+    return tuple(value.replace("''", "'") for value in ENUM_VALUE_PATTERN.findall(column_type))
+
+
+def build_table_details(columns: List[tuple], references: List[tuple]) -> Dict[str, TableDetails]:  # pylint: disable=too-many-locals
+    """
+    Tables without a single column primary key are skipped, as the records are addressed by it,
+    and so is the append-only audit log.
+    :param columns: rows of `COLUMNS_QUERY`
+    :param references: rows of `REFERENCES_QUERY`
+    :return: table details by table name
+    """
+    tables: Dict[str, List[tuple]] = {}
+    for row in columns:
+        tables.setdefault(row[0], []).append(row[1:])
+    referenced = {(table_name, column_name): target for table_name, column_name, target in references}
+
+    def label_fields(table_name: str) -> tuple:
+        text_columns = [column[0] for column in tables.get(table_name, []) if column[1] in TEXT_TYPES]
+        return tuple(text_columns[:MAX_LABEL_FIELDS])
+
+    details = {}
+    for table_name, table_columns in tables.items():
+        if table_name == AUDIT_TABLE:
+            continue
+        primary_keys = [column[0] for column in table_columns if column[4] == 'PRI']
+        if len(primary_keys) != 1:
+            logger.warning("table %s skipped, no single column primary key", table_name)
+            continue
+        fields_details = []
+        for name, data_type, column_type, is_nullable, _, comment in table_columns:
+            target = referenced.get((table_name, name))
+            fields_details.append(FieldDetails(
+                name=name,
+                header="ID" if name == primary_keys[0] else comment or name.replace("_", " ").capitalize(),
+                form_type=FormFieldTypes.HIDDEN if name == primary_keys[0] else form_type(name, data_type),
+                required=is_nullable == 'NO',
+                references=ForeignKey(target, label_fields(target))
+                    if target in tables and label_fields(target) else None,
+                choices=enum_values(column_type)))
+        details[table_name] = TableDetails(table_name=table_name, primary_key=primary_keys[0],
+                                           fields_details=fields_details)
+    return details
+
+
+def read_schema(db_interface: DbInterface, schema: str) -> Dict[str, TableDetails]:
+    """
+    :param db_interface: database interface
+    :param schema: name of the database schema
+    :return: table details of every table of the schema
+    """
+    with db_interface.pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(COLUMNS_QUERY, (schema,))
+        columns = cursor.fetchall()
+        cursor.execute(REFERENCES_QUERY, (schema,))
+        references = cursor.fetchall()
+    return build_table_details(columns, references)
+
+
+def dump_snapshot(details: Dict[str, TableDetails], path: str):
+    """
+    :param details: table details by table name
+    :param path: path of the JSON snapshot file
+    """
+    snapshot = {table_name: {"primary_key": table.primary_key,
+                             "fields": [{"name": item.name, "header": item.header, "form_type": str(item.form_type),
+                                         "required": item.required,
+                                         "references": [str(item.references.table_name),
+                                                        list(item.references.label_fields)]
+                                             if item.references else None,
+                                         "choices": list(item.choices)}
+                                        for item in table.fields_details]}
+                for table_name, table in details.items()}
+    with open(path, "w", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file, indent="\t", ensure_ascii=False)
+        snapshot_file.write("\n")
+
+
+def load_snapshot(path: str) -> Dict[str, TableDetails]:
+    """
+    :param path: path of the JSON snapshot file written by `dump_snapshot`
+    :return: table details by table name
+    """
+    with open(path, encoding="utf-8") as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    return {table_name: TableDetails(
+        table_name=table_name,
+        primary_key=table["primary_key"],
+        fields_details=[FieldDetails(name=item["name"], header=item["header"],
+                                     form_type=FormFieldTypes(item["form_type"]), required=item["required"],
+                                     references=ForeignKey(item["references"][0], tuple(item["references"][1]))
+                                         if item["references"] else None,
+                                     choices=tuple(item["choices"]))
+                        for item in table["fields"]])
+        for table_name, table in snapshot.items()}
+
+
+def register_tables(details: Dict[str, TableDetails]):
+    """
+    Replaces the registry of the tables: `TABLE_DETAILS`, the dataclasses and the statements,
+    must be called before the application serves requests.
+    :param details: table details by table name
+    """
+    TABLE_DETAILS.clear()
+    TABLE_DETAILS.update(details)
+    DATA_CLASSES.clear()
+    DATA_CLASSES.update({table_name: create_data_class(table_name.capitalize(), table)
+                         for table_name, table in details.items()})
+    STATEMENTS.clear()
+    STATEMENTS.update({table_name: build_statements(table) for table_name, table in details.items()})
+    for statement_builder in (select_statement, labels_statement, delete_many_statement, lock_many_statement):
+        statement_builder.cache_clear()
+
+
+def load_tables(db_interface: DbInterface, schema: str, snapshot_path: Optional[str] = None) -> Dict[str, TableDetails]:
+    """
+    Reads the snapshot when it exists, otherwise introspects the schema and writes the snapshot,
+    so the next start does not query `information_schema`.
+    :param db_interface: database interface
+    :param schema: name of the database schema
+    :param snapshot_path: path of the JSON snapshot file, not used when not set
+    :return: table details by table name
+    """
+    if snapshot_path and os.path.exists(snapshot_path):
+        return load_snapshot(snapshot_path)
+    details = read_schema(db_interface, schema)
+    if snapshot_path:
+        dump_snapshot(details, snapshot_path)
+    return details
+
+
+def configure_tables(db_interface: DbInterface):
+    """
+    Replaces the static `TABLE_DETAILS` with the tables of the DB_NAME schema when DB_SCHEMA_INTROSPECT is set,
+    read from the DB_SCHEMA_SNAPSHOT file when it exists.
+    :param db_interface: database interface used to read `information_schema`
+    """
+    if not config("DB_SCHEMA_INTROSPECT", default=False, cast=bool):
+        return
+    register_tables(load_tables(db_interface, config("DB_NAME"), config("DB_SCHEMA_SNAPSHOT", default="") or None))
+
+
+def main(argv: List[str] = None):
+    """
+    Command line entry point, writes the snapshot of the schema configured with DB_* keys.
+    """
+
+    parser = argparse.ArgumentParser(description="Snapshot of the database schema for DB_SCHEMA_SNAPSHOT")
+    parser.add_argument("--output", default=config("DB_SCHEMA_SNAPSHOT", default="") or "schema.json")
+    args = parser.parse_args(argv)
+
+    details = read_schema(create_db_interface(), config("DB_NAME"))
+    dump_snapshot(details, args.output)
+    print(f"{len(details)} tables written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
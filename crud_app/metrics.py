@@ -0,0 +1,390 @@
+"""
+Query and request instrumentation aggregated into histograms, exposed in the Prometheus text format.
+"""
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger("crud_app.slow_query")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Class representing a histogram with cumulative buckets, one series per combination of label values.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        """
+        :param value: observed value
+        :param label_values: values of the labels, in `label_names` order
+        """
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        """
+        :return: lines of the text exposition format
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {label_values: (list(counts), total, count)
+                      for label_values, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.label_names, label_values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    """
+    Class representing a monotonic counter, one series per combination of label values.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        """
+        :param label_values: values of the labels, in `label_names` order
+        :param amount: increment
+        """
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def collect(self) -> List[str]:
+        """
+        :return: lines of the text exposition format
+        """
+        with self._lock:
+            series = dict(self._series)
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"] + \
+            [f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+             for label_values, value in sorted(series.items())]
+
+
+class Gauge:  # pylint: disable=too-few-public-methods
+    """
+    Class representing a gauge read at collection time, `read` returns the value per label values.
+    """
+    def __init__(self, name: str, documentation: str, read: Callable[[], Dict[tuple, float]],
+                 label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.read = read
+
+    def collect(self) -> List[str]:
+        """
+        :return: lines of the text exposition format
+        """
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"] + \
+            [f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+             for label_values, value in sorted(self.read().items())]
+
+
+class MetricsRegistry:
+    """
+    Class representing the set of metrics rendered by the `/metrics` endpoint.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        """
+        :param metric: histogram, counter or gauge, the metric registered before under the same name is replaced
+        :return: the metric
+        """
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        :return: all the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.collect()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def register_stats(registry: MetricsRegistry, prefix: str, documentation: str, read: Callable[[], Optional[tuple]]):
+    """
+    Exposes every field of the statistics NamedTuple as the gauge `<prefix>_<field>`.
+    :param read: returns the statistics snapshot, or None when not available
+    """
+    fields = read()
+    for field in fields._fields if fields is not None else ():
+        registry.register(Gauge(f"{prefix}_{field}", f"{documentation}: {field.replace('_', ' ')}",
+                                lambda field=field: {(): getattr(stats, field)} if (stats := read()) else {}))
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> Tuple[str, str]:
+    """
+    Normalizes the statement, so queries differing only by literals or IN list length are aggregated together.
+    :param statement: SQL statement
+    :return: short hash and normalized text of the statement
+    """
+    normalized = re.sub(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b|%s", "?", statement)
+    normalized = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12], normalized
+
+
+class QueryMetrics:
+    """
+    Class collecting the statistics of the queries and `DbInterface` methods,
+    queries slower than `slow_query_seconds` are logged with their normalized text.
+    """
+    def __init__(self, registry: MetricsRegistry, slow_query_seconds: Optional[float] = None):
+        self.slow_query_seconds = slow_query_seconds
+        self._statements: Dict[str, str] = {}
+        self.execute_seconds = registry.register(Histogram(
+            "db_query_execute_seconds", "Time of the statement execution", ("fingerprint",)))
+        self.fetch_seconds = registry.register(Histogram(
+            "db_query_fetch_seconds", "Time of fetching the result rows", ("fingerprint",)))
+        self.rows = registry.register(Histogram(
+            "db_query_rows", "Rows returned or affected by the statement", ("fingerprint",), ROWS_BUCKETS))
+        self.slow_queries = registry.register(Counter(
+            "db_slow_queries_total", "Queries exceeding the slow query threshold", ("fingerprint",)))
+        self.method_seconds = registry.register(Histogram(
+            "db_method_seconds", "Time of the DbInterface method calls", ("method",)))
+        registry.register(Gauge("db_query_info", "Normalized statement of the fingerprint",
+                                lambda: {item: 1 for item in list(self._statements.items())},
+                                ("fingerprint", "statement")))
+
+    def observe_query(self, statement: str, rows: int, execute_seconds: float, fetch_seconds: float):
+        """
+        :param statement: executed SQL statement
+        :param rows: number of rows fetched, or affected by the write
+        :param execute_seconds: time of the execute call
+        :param fetch_seconds: time of the fetch calls
+        """
+        key, normalized = fingerprint(statement)
+        self._statements.setdefault(key, normalized)
+        self.execute_seconds.observe(execute_seconds, key)
+        self.fetch_seconds.observe(fetch_seconds, key)
+        self.rows.observe(rows, key)
+        if self.slow_query_seconds is not None and execute_seconds + fetch_seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(key)
+            logger.warning("slow query %s: %.3fs execute, %.3fs fetch, %d rows: %s",
+                           key, execute_seconds, fetch_seconds, rows, normalized)
+
+    def observe_method(self, method: str, seconds: float):
+        """
+        :param method: name of the `DbInterface` method
+        :param seconds: time of the call, including waiting for the connection
+        """
+        self.method_seconds.observe(seconds, method)
+
+
+class InstrumentedCursor:
+    """
+    Class representing the cursor proxy measuring execute and fetch calls, the query is reported
+    by `finish`, called on the next execution and when the cursor is no longer used.
+    """
+    def __init__(self, cursor, metrics: QueryMetrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._statement = None
+        self._execute_seconds = self._fetch_seconds = 0.0
+        self._rows = 0
+        self._fetched = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _start(self, statement: str, execute: Callable, *args):
+        self.finish()
+        started = time.perf_counter()
+        result = execute(statement, *args)
+        self._statement = statement
+        self._execute_seconds = time.perf_counter() - started
+        self._fetch_seconds, self._rows, self._fetched = 0.0, 0, False
+        return result
+
+    def execute(self, statement: str, *args, **kwargs):
+        return self._start(statement, lambda *call_args: self._cursor.execute(*call_args, **kwargs), *args)
+
+    def executemany(self, statement: str, *args):
+        return self._start(statement, self._cursor.executemany, *args)
+
+    def _fetch(self, fetch: Callable, *args):
+        started = time.perf_counter()
+        result = fetch(*args)
+        self._fetch_seconds += time.perf_counter() - started
+        self._fetched = True
+        return result
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        self._rows += row is not None
+        return row
+
+    def finish(self):
+        """
+        Reports the last executed statement.
+        """
+        if self._statement is None:
+            return
+        rows = self._rows if self._fetched else max(self._cursor.rowcount or 0, 0)
+        self._metrics.observe_query(self._statement, rows, self._execute_seconds, self._fetch_seconds)
+        self._statement = None
+
+
+class RequestTiming:  # pylint: disable=too-few-public-methods
+    """
+    Class representing the time spent by the request in the database calls and in the handler.
+    """
+    __slots__ = ("started", "db_seconds", "handler_seconds")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.handler_seconds: Optional[float] = None
+
+
+REQUEST_TIMING: contextvars.ContextVar[Optional[RequestTiming]] = \
+    contextvars.ContextVar("request_timing", default=None)
+
+
+class RequestMetrics:  # pylint: disable=too-few-public-methods
+    """
+    Class collecting the time of the requests per route, split into database, render and serialization phases:
+    database is the time of awaited `DbInterface` calls, render is the rest of the handler time
+    and serialization is the time from the handler return to the response start.
+    """
+    def __init__(self, registry: MetricsRegistry):
+        self.request_seconds = registry.register(Histogram(
+            "http_request_seconds", "Time of the request until the response start", ("route", "method", "status")))
+        self.phase_seconds = registry.register(Histogram(
+            "http_request_phase_seconds", "Time of the request phases", ("route", "phase")))
+
+    def observe(self, route: str, method: str, status: int, timing: RequestTiming):
+        """
+        :param route: route path template
+        :param method: HTTP method
+        :param status: response status code
+        :param timing: timing of the request
+        """
+        total = time.perf_counter() - timing.started
+        self.request_seconds.observe(total, route, method, status)
+        self.phase_seconds.observe(timing.db_seconds, route, "db")
+        if timing.handler_seconds is not None:
+            self.phase_seconds.observe(max(timing.handler_seconds - timing.db_seconds, 0.0), route, "render")
+            self.phase_seconds.observe(max(total - timing.handler_seconds, 0.0), route, "serialization")
+
+
+class MetricsMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware measuring the HTTP requests, `route_of` maps the ASGI scope to the route template
+    so the number of series does not grow with the path parameters.
+    """
+    def __init__(self, app, metrics: RequestMetrics, route_of: Callable[[dict], str],
+                 skip: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.metrics = metrics
+        self.route_of = route_of
+        self.skip = frozenset(skip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = REQUEST_TIMING.set(timing)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self.metrics.observe(self.route_of(scope), scope["method"], status, timing)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_TIMING.reset(token)
+
+
+def record_db_time(seconds: float):
+    """
+    Adds the time of the database call to the current request.
+    """
+    if (timing := REQUEST_TIMING.get()) is not None:
+        timing.db_seconds += seconds
+
+
+def record_handler_end():
+    """
+    Marks the end of the handler of the current request, the rest of the request is serialization.
+    """
+    if (timing := REQUEST_TIMING.get()) is not None:
+        timing.handler_seconds = time.perf_counter() - timing.started
@@ -0,0 +1,196 @@
+"""
+Read replicas of `DbInterface`: lag-aware choice of the replica for the reads and read-your-writes
+consistency for the client which has just written.
+"""
+import contextvars
+import itertools
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import List, NamedTuple, Optional, Sequence
+
+from mysql.connector.errors import Error
+
+from crud_app.db_pool import ConnectionPool
+
+REPLICA_STATUS_QUERY = "SHOW SLAVE STATUS"
+PRIMARY_COOKIE = "db_primary_until"
+
+
+class ReplicaSettings(NamedTuple):
+    """
+    NamedTuple representing the configuration of the read replicas, replicas lagging more than `max_lag`
+    seconds are not used and the lag is checked at most once per `check_interval` seconds.
+    """
+    max_lag: float = 5.0
+    check_interval: float = 1.0
+
+
+class ReadConsistency:  # pylint: disable=too-few-public-methods
+    """
+    Class representing the consistency required by the current request, its reads go to the primary
+    until `primary_until` (UNIX time) so the client sees its own writes.
+    The object is changed in place, so the writes done in the `AsyncDbInterface` threads are seen by the request.
+    """
+    __slots__ = ("primary_until",)
+
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+
+
+READ_CONSISTENCY: contextvars.ContextVar[Optional[ReadConsistency]] = \
+    contextvars.ContextVar("read_consistency", default=None)
+
+
+def mark_write(window: float):
+    """
+    Routes the next reads of the current request and of its client to the primary for `window` seconds.
+    """
+    if (consistency := READ_CONSISTENCY.get()) is not None:
+        consistency.primary_until = max(consistency.primary_until, time.time() + window)
+
+
+def primary_required() -> bool:
+    """
+    :return: True when the current request has to read from the primary
+    """
+    consistency = READ_CONSISTENCY.get()
+    return consistency is not None and consistency.primary_until > time.time()
+
+
+def parse_host(host: str, default_port: int = 3306) -> dict:
+    """
+    :param host: `host` or `host:port`
+    :return: connect arguments of the host
+    """
+    name, _, port = host.partition(":")
+    if not name:
+        raise ValueError(f"Invalid replica host {host}")
+    return {'host': name, 'port': int(port) if port else default_port}
+
+
+class Replica:  # pylint: disable=too-few-public-methods
+    """
+    Class representing the read replica with its own connection pool and the last measured lag.
+    """
+    def __init__(self, name: str, pool: ConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.lag: Optional[float] = None
+
+    def check(self) -> Optional[float]:
+        """
+        Measures the replication lag, None when the replica is not reachable or its replication is stopped.
+        A server without replication status is not a replica and has no lag.
+        :return: lag in seconds
+        """
+        try:
+            with self.pool.connection() as connection, connection.cursor(dictionary=True) as cursor:
+                cursor.execute(REPLICA_STATUS_QUERY)
+                status = cursor.fetchall()
+        except Error:
+            self.lag = None
+            return None
+        if not status:
+            self.lag = 0.0
+        else:
+            lag = status[0].get("Seconds_Behind_Master")
+            self.lag = float(lag) if lag is not None else None
+        return self.lag
+
+
+class ReplicaSet:
+    """
+    Class representing the read replicas of the primary. Reads go to the least busy replica
+    which is healthy, lags at most `max_lag` and has already replayed the last write to the tables read.
+    """
+    def __init__(self, replicas: Sequence[Replica], settings: ReplicaSettings = ReplicaSettings()):
+        self.replicas: List[Replica] = list(replicas)
+        self.settings = settings
+        self._checked = -float("inf")
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def refresh(self, force: bool = False):
+        """
+        Checks the lag of the replicas once per `check_interval`, concurrent callers do not wait for the check.
+        """
+        if not force and time.monotonic() - self._checked < self.settings.check_interval:
+            return
+        if not self._lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return
+        try:
+            for replica in self.replicas:
+                replica.check()
+            self._checked = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def choose(self, modified: float = 0.0) -> Optional[Replica]:
+        """
+        :param modified: UNIX time of the last write to the tables read
+        :return: replica to read from, None when the primary has to be used
+        """
+        self.refresh()
+        age = time.time() - modified
+        # the lag is up to `check_interval` old, the replica may have fallen behind since
+        candidates = [replica for replica in self.replicas if replica.lag is not None
+                      and replica.lag <= self.settings.max_lag and replica.lag + self.settings.check_interval < age]
+        if not candidates:
+            return None
+        turn = next(self._turn)
+        candidates = candidates[turn % len(candidates):] + candidates[:turn % len(candidates)]
+        return min(candidates, key=lambda replica: replica.pool.stats().in_use)
+
+    @staticmethod
+    def mark_failed(replica: Replica):
+        """
+        Skips the replica until its next successful check.
+        """
+        replica.lag = None
+
+    def close(self):
+        """
+        Closes the idle connections of the replicas.
+        """
+        for replica in self.replicas:
+            replica.pool.close()
+
+
+class ReadYourWritesMiddleware:  # pylint: disable=too-few-public-methods
+    """
+    ASGI middleware keeping the reads of the client on the primary after its write, the time is sent back
+    in the cookie so the following requests, also the ones served by other processes, see the write.
+    """
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookie = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        try:
+            primary_until = float(cookie[PRIMARY_COOKIE].value) if PRIMARY_COOKIE in cookie else 0.0
+        except ValueError:
+            primary_until = 0.0
+        consistency = ReadConsistency(primary_until)
+        token = READ_CONSISTENCY.set(consistency)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and consistency.primary_until > primary_until:
+                header = (f"{PRIMARY_COOKIE}={consistency.primary_until:.3f}; Max-Age={int(self.window) + 1}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"set-cookie", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            READ_CONSISTENCY.reset(token)
@@ -0,0 +1,197 @@
+"""
+Reports of the tables: aggregates grouped by the foreign key, headcount by the period of the date column
+and compliance of the salaries with the ranges of the positions.
+The results are kept until the tables they are computed from are written, so the dashboards do not scan the tables.
+"""
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from decimal import Decimal
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from crud_app.db import DbInterface
+from crud_app.db_structure import TABLE_DETAILS, FormFieldTypes, Tables
+
+PERIODS = {
+    "year": "YEAR({column})",
+    "quarter": "CONCAT(YEAR({column}), '-Q', QUARTER({column}))",
+    "month": "CONCAT(YEAR({column}), '-', LPAD(MONTH({column}), 2, '0'))",
+}
+
+COMPLIANCE_STATEMENT = (
+    "SELECT s.idstanow, s.nazwa, s.placa_min, s.placa_max, COUNT(p.idprac), "
+    "COUNT(CASE WHEN p.wynagrodzenie < s.placa_min THEN 1 END), "
+    "COUNT(CASE WHEN p.wynagrodzenie > s.placa_max THEN 1 END), "
+    "COUNT(CASE WHEN p.idprac IS NOT NULL AND p.wynagrodzenie IS NULL THEN 1 END), "
+    "MIN(p.wynagrodzenie), MAX(p.wynagrodzenie) "
+    "FROM stanowiska s LEFT JOIN pracownicy p ON p.stanowisko = s.idstanow "
+    "GROUP BY s.idstanow, s.nazwa, s.placa_min, s.placa_max ORDER BY s.idstanow")
+COMPLIANCE_COLUMNS = ("stanowisko", "nazwa", "placa_min", "placa_max", "pracownicy", "ponizej_min",
+                      "powyzej_max", "bez_wynagrodzenia", "wynagrodzenie_min", "wynagrodzenie_max")
+
+
+class Report(NamedTuple):
+    """
+    NamedTuple representing the computed report, `version` is the version tag of the tables it was computed from.
+    """
+    columns: Tuple[str, ...]
+    rows: List[tuple]
+    version: str
+    seconds: float
+
+
+class ReportStats(NamedTuple):
+    """
+    NamedTuple representing a snapshot of the report cache counters.
+    """
+    hits: int
+    misses: int
+    size: int
+
+
+def _field_names(table_name: Tables, predicate: Callable) -> List[str]:
+    if table_name not in TABLE_DETAILS:
+        raise ValueError(f"Invalid table {table_name}")
+    details = TABLE_DETAILS[table_name]
+    return [field.name for field in details.fields_details if field.name != details.primary_key and predicate(field)]
+
+
+def group_fields(table_name: Tables) -> List[str]:
+    """
+    :return: foreign key and choice fields of the table, the rows can be grouped by
+    """
+    return _field_names(table_name, lambda field: field.references is not None or field.choices)
+
+
+def measure_fields(table_name: Tables) -> List[str]:
+    """
+    :return: numeric fields of the table which are not keys, the values can be aggregated
+    """
+    return _field_names(table_name, lambda field: field.form_type == FormFieldTypes.NUMBER and field.references is None)
+
+
+def date_fields(table_name: Tables) -> List[str]:
+    """
+    :return: date fields of the table, the headcount can be computed by
+    """
+    return _field_names(table_name, lambda field: field.form_type == FormFieldTypes.DATE)
+
+
+@lru_cache(maxsize=256)
+def group_statement(table_name: Tables, group_by: str, measure: Optional[str]) -> str:
+    """
+    :return: SELECT of the row count, and of the sum, average, minimum and maximum of the `measure`, per group
+    """
+    aggregates = f", SUM({measure}), ROUND(AVG({measure}), 2), MIN({measure}), MAX({measure})" if measure else ""
+    return f"SELECT {group_by}, COUNT(*){aggregates} FROM {table_name} GROUP BY {group_by} ORDER BY {group_by}"
+
+
+@lru_cache(maxsize=256)
+def headcount_statement(table_name: Tables, field_name: str, period: str) -> str:
+    """
+    :return: SELECT of the number of rows per period of the date field, rows without the date are skipped
+    """
+    expression = PERIODS[period].format(column=field_name)
+    return (f"SELECT {expression} AS period, COUNT(*) FROM {table_name} WHERE {field_name} IS NOT NULL "
+            "GROUP BY period ORDER BY period")
+
+
+def _plain(value):
+    """
+    :return: DECIMAL values as floats, so the reports are JSON serializable
+    """
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class Reports:
+    """
+    Class representing the reports computed with `DbInterface`, read from the database at most once per version
+    of the tables. The versions are bumped by the writes, also by the ones of the other worker processes.
+    """
+    def __init__(self, db_interface: DbInterface, max_size: int = 128):
+        self.db_interface = db_interface
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._results: OrderedDict = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def _report(self, key: Hashable, table_names: Sequence[Tables], columns: Tuple[str, ...],  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                statement: str, transform: Callable[[List[tuple]], List[tuple]] = None) -> Report:
+        # the version is read before the query, a write during the query leaves the result outdated at once
+        version, _ = self.db_interface.get_table_version(table_names)
+        with self._lock:
+            report = self._results.get(key)
+            if report is not None and report.version == version:
+                self._results.move_to_end(key)
+                self._hits += 1
+                return report
+            self._misses += 1
+
+        started = time.perf_counter()
+        rows = [tuple(_plain(value) for value in row) for row in self.db_interface.run_query(table_names, statement)]
+        report = Report(columns=columns, rows=transform(rows) if transform else rows, version=version,
+                        seconds=time.perf_counter() - started)
+        with self._lock:
+            self._results[key] = report
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+        return report
+
+    def groups(self, table_name: Tables, group_by: str, measure: Optional[str] = None) -> Report:
+        """
+        :param table_name: table name
+        :param group_by: foreign key or choice field, see `group_fields`
+        :param measure: numeric field aggregated per group, see `measure_fields`, only the rows are counted when not set
+        :return: report with the group value, count and, with the measure, its sum, average, minimum and maximum
+        """
+        if group_by not in group_fields(table_name):
+            raise ValueError(f"Invalid group field {group_by}")
+        if measure is not None and measure not in measure_fields(table_name):
+            raise ValueError(f"Invalid measure field {measure}")
+        columns = (group_by, "count") + (("sum", "avg", "min", "max") if measure else ())
+        return self._report(("groups", table_name, group_by, measure), (table_name,), columns,
+                            group_statement(table_name, group_by, measure))
+
+    def headcount(self, table_name: Tables, field_name: str, period: str = "year") -> Report:
+        """
+        :param table_name: table name
+        :param field_name: date field, e.g. the hiring date, see `date_fields`
+        :param period: `year`, `quarter` or `month`
+        :return: report with the period, number of rows dated in it and the running total
+        """
+        if field_name not in date_fields(table_name):
+            raise ValueError(f"Invalid date field {field_name}")
+        if period not in PERIODS:
+            raise ValueError(f"Invalid period {period}")
+
+        def running_total(rows: List[tuple]) -> List[tuple]:
+            total, result = 0, []
+            for period_value, count in rows:
+                total += count
+                result.append((str(period_value), count, total))
+            return result
+
+        return self._report(("headcount", table_name, field_name, period), (table_name,),
+                            ("okres", "liczba", "razem"), headcount_statement(table_name, field_name, period),
+                            running_total)
+
+    def compliance(self) -> Report:
+        """
+        :return: report with the salary range of every position and the numbers of its employees paid
+            below the minimum, above the maximum and without the salary
+        """
+        if Tables.PRACOWNICY not in TABLE_DETAILS or Tables.STANOWISKA not in TABLE_DETAILS:
+            raise ValueError("Compliance report requires pracownicy and stanowiska tables")
+        return self._report(("compliance",), (Tables.PRACOWNICY, Tables.STANOWISKA), COMPLIANCE_COLUMNS,
+                            COMPLIANCE_STATEMENT)
+
+    def stats(self) -> ReportStats:
+        """
+        :return: report cache counters
+        """
+        with self._lock:
+            return ReportStats(hits=self._hits, misses=self._misses, size=len(self._results))
@@ -0,0 +1,70 @@
+"""
+Column-oriented container of the rows read from the database.
+"""
+from array import array
+from typing import Iterator, List, Sequence, Tuple
+
+# typecodes of the columns stored as arrays, other columns are kept as tuples
+_ARRAY_TYPES = ((int, 'q'), (float, 'd'))
+
+
+def _compact(column: tuple) -> Sequence:
+    """
+    :return: column values as an array of machine values when they all are of one numeric type, the tuple otherwise
+    """
+    for value_type, typecode in _ARRAY_TYPES:
+        if column and all(type(value) is value_type for value in column):  # pylint: disable=unidiomatic-typecheck
+            try:
+                return array(typecode, column)
+            except OverflowError:
+                return column
+    return column
+
+
+class ColumnRows(Sequence[tuple]):
+    """
+    Class representing the rows stored per column, integer and float columns take 8 bytes per value
+    instead of a Python object and the row tuples are not kept. Behaves as the read-only list of tuples.
+    """
+    __slots__ = ("columns", "_length")
+
+    def __init__(self, columns: Tuple[Sequence, ...], length: int):
+        self.columns = columns
+        self._length = length
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple]) -> "ColumnRows":
+        """
+        :param rows: rows as fetched from the cursor
+        :return: rows transposed into the compact columns
+        """
+        return cls(tuple(_compact(column) for column in zip(*rows)), len(rows))
+
+    def column(self, index: int) -> Sequence:
+        """
+        :param index: column index in `TABLE_DETAILS` order
+        :return: values of the column
+        """
+        return self.columns[index] if self.columns else ()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = tuple(column[index] for column in self.columns)
+            return ColumnRows(columns, len(range(*index.indices(self._length))))
+        if not -self._length <= index < self._length:
+            raise IndexError("row index out of range")
+        return tuple(column[index] for column in self.columns)
+
+    def __iter__(self) -> Iterator[tuple]:
+        return zip(*self.columns)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ColumnRows({list(self)!r})"
@@ -0,0 +1,133 @@
+"""
+Production server: the application served by a number of worker processes sharing the listening socket.
+
+Usage: python -m crud_app.server [--workers N] [--host HOST] [--port PORT]
+
+Every worker imports the application itself, so it opens its own connection pool (DB_POOL_MAX connections
+per worker) and warms it up before taking requests. The worker processes share the table versions through
+the DB_CACHE_SHARED_FILE, a temporary one when not set. SIGHUP replaces the workers one by one,
+the old worker is stopped once its replacement has warmed up.
+"""
+import argparse
+import copy
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import List, NamedTuple, Optional
+
+import uvicorn
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+_IMPORTED = time.perf_counter()
+
+
+class WorkerStats(NamedTuple):
+    """
+    NamedTuple representing the start of the worker process and its memory.
+    """
+    startup_seconds: float
+    warm_up_seconds: float
+    rss_bytes: int
+
+
+def process_age() -> float:
+    """
+    :return: seconds since the start of the process, since the import of this module where /proc is not available
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as stat_file:
+            # fields following the command name, which may contain spaces, start with the 3rd one
+            started = int(stat_file.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime", encoding="ascii") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _IMPORTED
+    return uptime - started / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss() -> int:
+    """
+    :return: resident memory of the process in bytes, its peak where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class WorkerState:
+    """
+    Class representing the lifecycle of the worker process, the worker is ready once it has warmed up.
+    """
+    def __init__(self):
+        self.ready = False
+        self.startup_seconds = 0.0
+        self.warm_up_seconds = 0.0
+
+    def started(self, warm_up_seconds: float):
+        """
+        Marks the worker ready and reports its startup.
+        :param warm_up_seconds: time of the warm-up
+        """
+        self.ready = True
+        self.startup_seconds = process_age()
+        self.warm_up_seconds = warm_up_seconds
+        stats = self.stats()
+        logger.info("worker %d started in %.2fs (warm-up %.2fs), RSS %.1f MB", os.getpid(), stats.startup_seconds,
+                    stats.warm_up_seconds, stats.rss_bytes / 2 ** 20)
+
+    def stats(self) -> WorkerStats:
+        """
+        :return: startup time and the current resident memory of the worker
+        """
+        return WorkerStats(startup_seconds=self.startup_seconds, warm_up_seconds=self.warm_up_seconds,
+                           rss_bytes=process_rss())
+
+
+def log_config() -> dict:
+    """
+    :return: uvicorn logging configuration with the `crud_app` loggers, the workers configure their logging with it
+    """
+    logging_config = copy.deepcopy(uvicorn.config.LOGGING_CONFIG)
+    logging_config["loggers"]["crud_app"] = {"handlers": ["default"], "level": "INFO", "propagate": False}
+    return logging_config
+
+
+def main(argv: List[str] = None):
+    """
+    Command line entry point, serves the application until SIGINT or SIGTERM.
+    """
+
+    parser = argparse.ArgumentParser(description="Multi-process server of the CRUD application")
+    parser.add_argument("--workers", type=int, default=config("SERVER_WORKERS", default=os.cpu_count() or 1, cast=int))
+    parser.add_argument("--host", default=config("SERVER_HOST", default="0.0.0.0"))
+    parser.add_argument("--port", type=int, default=config("PORT", default=5001, cast=int))
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=config("SERVER_GRACEFUL_TIMEOUT", default=30.0, cast=float))
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error(f"invalid number of workers {args.workers}")
+
+    shared_file: Optional[str] = None
+    if not config("DB_CACHE_SHARED_FILE", default=""):
+        descriptor, shared_file = tempfile.mkstemp(prefix="crud_app-", suffix=".versions")
+        os.close(descriptor)
+        # the workers are started with the environment of this process
+        os.environ["DB_CACHE_SHARED_FILE"] = shared_file
+    try:
+        uvicorn.run("crud_app.app:app", host=args.host, port=args.port, workers=args.workers,
+                    timeout_graceful_shutdown=args.graceful_timeout, log_config=log_config())
+    finally:
+        if shared_file is not None:
+            os.unlink(shared_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
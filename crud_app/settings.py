@@ -0,0 +1,120 @@
+"""
+Application settings read with `decouple` from the environment or the `.env` file.
+"""
+from typing import Optional
+
+from decouple import Csv, config
+
+from crud_app.audit import AuditSettings
+from crud_app.cache import MemoryCacheBackend, SharedGenerations
+from crud_app.changes import ChangeFeed
+from crud_app.db import DbInterface
+from crud_app.db_pool import PoolSettings
+from crud_app.metrics import REGISTRY, MetricsRegistry, QueryMetrics
+from crud_app.replicas import ReplicaSettings
+from crud_app.transactions import IsolationLevel, TransactionSettings
+
+
+def create_pool_settings() -> PoolSettings:
+    """
+    :return: connection pool settings from DB_POOL_* keys
+    """
+    return PoolSettings(min_size=config("DB_POOL_MIN", default=1, cast=int),
+                        max_size=config("DB_POOL_MAX", default=10, cast=int),
+                        timeout=config("DB_POOL_TIMEOUT", default=30.0, cast=float),
+                        ping_interval=config("DB_POOL_PING_INTERVAL", default=1.0, cast=float))
+
+
+def create_cache():
+    """
+    :return: read cache from DB_CACHE_* keys, None when caching is disabled; with DB_CACHE_SHARED_FILE
+        a cache without entries is kept then, so the table versions are still shared by the worker processes
+    """
+    shared_file = config("DB_CACHE_SHARED_FILE", default="")
+    shared = SharedGenerations(shared_file) if shared_file else None
+    if not config("DB_CACHE_ENABLED", default=True, cast=bool):
+        return MemoryCacheBackend(default_size=0, shared=shared) if shared is not None else None
+    return MemoryCacheBackend(shared=shared,
+                              ttl=config("DB_CACHE_TTL", default=60.0, cast=float),
+                              default_size=config("DB_CACHE_SIZE", default=256, cast=int),
+                              table_sizes={table_name: int(size) for table_name, size in
+                                           (item.split(":") for item in
+                                            config("DB_CACHE_TABLE_SIZES", default="", cast=Csv()))})
+
+
+def create_transaction_settings() -> TransactionSettings:
+    """
+    :return: transaction settings from DB_ISOLATION_LEVEL, DB_DEADLOCK_* and DB_GROUP_COMMIT_* keys
+    """
+    isolation_level = config("DB_ISOLATION_LEVEL", default="")
+    return TransactionSettings(isolation_level=IsolationLevel(isolation_level.upper()) if isolation_level else None,
+                               retries=config("DB_DEADLOCK_RETRIES", default=3, cast=int),
+                               backoff=config("DB_DEADLOCK_BACKOFF", default=0.05, cast=float),
+                               group_commit_size=config("DB_GROUP_COMMIT_SIZE", default=64, cast=int),
+                               group_commit_delay=config("DB_GROUP_COMMIT_DELAY", default=0.0, cast=float))
+
+
+def create_replica_settings() -> ReplicaSettings:
+    """
+    :return: read replica settings from DB_REPLICA_* keys
+    """
+    return ReplicaSettings(max_lag=config("DB_REPLICA_MAX_LAG", default=5.0, cast=float),
+                           check_interval=config("DB_REPLICA_CHECK_INTERVAL", default=1.0, cast=float))
+
+
+def create_audit_settings() -> Optional[AuditSettings]:
+    """
+    :return: audit log settings from AUDIT_* keys, None when the audit log is disabled, as it is by default:
+        the `audit_log` table is created by db/migrations/003_audit_log.sql, unless AUDIT_FILE is used
+    """
+    if not config("AUDIT_ENABLED", default=False, cast=bool):
+        return None
+    return AuditSettings(queue_size=config("AUDIT_QUEUE_SIZE", default=10000, cast=int),
+                         batch_size=config("AUDIT_BATCH_SIZE", default=200, cast=int),
+                         flush_delay=config("AUDIT_FLUSH_DELAY", default=0.0, cast=float),
+                         block_timeout=config("AUDIT_BLOCK_TIMEOUT", default=0.0, cast=float),
+                         retries=config("AUDIT_RETRIES", default=3, cast=int),
+                         backoff=config("AUDIT_BACKOFF", default=0.5, cast=float),
+                         file=config("AUDIT_FILE", default=""))
+
+
+def create_audit_actor_options() -> dict:
+    """
+    :return: `AuditActorMiddleware` options from AUDIT_ACTOR_HEADER and AUDIT_TRUSTED_PROXIES keys,
+        the header is not read when it is not configured
+    """
+    return {"header": config("AUDIT_ACTOR_HEADER", default=""),
+            "trusted_proxies": config("AUDIT_TRUSTED_PROXIES", default="127.0.0.1", cast=Csv())}
+
+
+def create_query_metrics(registry: MetricsRegistry = REGISTRY):
+    """
+    :return: query metrics from METRICS_* and DB_SLOW_QUERY_SECONDS keys, None when metrics are disabled
+    """
+    if not config("METRICS_ENABLED", default=True, cast=bool):
+        return None
+    slow_query_seconds = config("DB_SLOW_QUERY_SECONDS", default="1.0")
+    return QueryMetrics(registry, slow_query_seconds=float(slow_query_seconds) if slow_query_seconds else None)
+
+
+def create_db_interface(pool_settings: PoolSettings = None) -> DbInterface:
+    """
+    :param pool_settings: connection pool settings, read from the config when not given
+    :return: database interface configured with DB_* keys
+    """
+    return DbInterface(db_user=config("DB_USER"),
+                       db_pass=config("DB_PASS"),
+                       db_host=config("DB_HOST"),
+                       db_name=config("DB_NAME"),
+                       pool_settings=pool_settings or create_pool_settings(),
+                       cache=create_cache(),
+                       prepared_statements=config("DB_PREPARED_STATEMENTS", default=True, cast=bool),
+                       prepared_cache_size=config("DB_PREPARED_CACHE_SIZE", default=64, cast=int),
+                       metrics=create_query_metrics(),
+                       transaction_settings=create_transaction_settings(),
+                       replica_hosts=config("DB_REPLICA_HOSTS", default="", cast=Csv()),
+                       replica_settings=create_replica_settings(),
+                       change_feed=ChangeFeed(config("LIVE_QUEUE_SIZE", default=256, cast=int))
+                       if config("LIVE_UPDATES_ENABLED", default=True, cast=bool) else None,
+                       audit_settings=create_audit_settings(),
+                       max_options=config("DB_OPTIONS_MAX", default=200, cast=int))
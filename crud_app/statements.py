@@ -0,0 +1,172 @@
+"""
+SQL statements of the tables, generated once at import time from `TABLE_DETAILS`.
+"""
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from crud_app.db_structure import FormFieldTypes, TABLE_DETAILS, TableDetails, Tables
+
+FILTER_OPERATORS = ('=', '>=', '<=')
+
+
+class TableStatements(NamedTuple):
+    """
+    NamedTuple representing the statements of the table, parameters are positional (`%s`)
+    so the same string can be used by prepared and regular cursors.
+    """
+    select_all: str
+    select_record: str
+    lock_record: str
+    insert: str
+    insert_values: Callable[[object], tuple]
+    update: str
+    update_values: Callable[[object], tuple]
+    update_if_unchanged: str
+    unchanged_values: Callable[[tuple], tuple]
+    delete: str
+
+
+def _values_getter(names: Tuple[str, ...]) -> Callable[[object], tuple]:
+    getter = attrgetter(*names)
+    return getter if len(names) > 1 else lambda record: (getter(record),)
+
+
+def _items_getter(indexes: Tuple[int, ...]) -> Callable[[tuple], tuple]:
+    getter = itemgetter(*indexes)
+    return getter if len(indexes) > 1 else lambda row: (getter(row),)
+
+
+def build_statements(details: TableDetails) -> TableStatements:
+    """
+    :param details: table details
+    :return: statements of the table
+    """
+    table_name = details.table_name
+    primary_key = details.primary_key
+    fields = [field.name for field in details.fields_details]
+    data_fields = tuple(name for name in fields if name != primary_key)
+    select_base = f"SELECT {','.join(fields)} FROM {table_name}"
+    update = f"UPDATE {table_name} SET {', '.join(f'{name}=%s' for name in data_fields)} WHERE {primary_key}=%s"
+
+    return TableStatements(
+        select_all=f"{select_base} ORDER BY {primary_key}",
+        select_record=f"{select_base} WHERE {primary_key} = %s",
+        lock_record=f"{select_base} WHERE {primary_key} = %s FOR UPDATE",
+        insert=f"INSERT INTO {table_name} ({', '.join(data_fields)}) "
+               f"VALUES ({', '.join(['%s'] * len(data_fields))})",
+        insert_values=_values_getter(data_fields),
+        update=update,
+        update_values=_values_getter(data_fields + (primary_key,)),
+        # NULL-safe comparison with the values read before, matches only when the row was not changed since
+        update_if_unchanged=f"{update} AND {' AND '.join(f'{name} <=> %s' for name in data_fields)}",
+        unchanged_values=_items_getter(tuple(fields.index(name) for name in data_fields)),
+        delete=f"DELETE FROM {table_name} WHERE {primary_key} = %s")
+
+
+STATEMENTS: Dict[Tables, TableStatements] = {table: build_statements(details)
+                                             for table, details in TABLE_DETAILS.items()}
+
+
+class SelectShape(NamedTuple):
+    """
+    NamedTuple representing the shape of the list query, the values are passed as parameters,
+    so every shape maps to one statement. Parameters follow the order: filters, search (one per text field),
+    keyset cursor, limit.
+    """
+    sort: str
+    descending: bool = False
+    filters: Tuple[Tuple[str, str], ...] = ()
+    search: bool = False
+    direction: Optional[str] = None
+    null_cursor: bool = False
+    limited: bool = False
+
+
+def search_fields(table_name: Tables) -> Tuple[str, ...]:
+    """
+    :param table_name: table name
+    :return: fields searched by the full-text search, i.e. TEXT fields
+    """
+    return tuple(field.name for field in TABLE_DETAILS[table_name].fields_details
+                 if field.form_type == FormFieldTypes.TEXT)
+
+
+def _keyset_condition(sort: str, primary_key: str, descending: bool, null_cursor: bool) -> str:
+    """
+    Condition selecting rows following the cursor row in `ORDER BY sort, primary_key` (both ascending or
+    both descending), NULL values of the sort column come first in the ascending order, like in MySQL.
+    Parameters: cursor primary key for NULL cursor, otherwise cursor value twice and primary key.
+    """
+    if sort == primary_key:
+        return f"{primary_key} {'<' if descending else '>'} %s"
+    if not descending:
+        if null_cursor:
+            return f"(({sort} IS NULL AND {primary_key} > %s) OR {sort} IS NOT NULL)"
+        return f"({sort} > %s OR ({sort} = %s AND {primary_key} > %s))"
+    if null_cursor:
+        return f"({sort} IS NULL AND {primary_key} < %s)"
+    return f"({sort} < %s OR ({sort} = %s AND {primary_key} < %s) OR {sort} IS NULL)"
+
+
+@lru_cache(maxsize=1024)
+def select_statement(table_name: Tables, shape: SelectShape) -> str:
+    """
+    :param table_name: table name
+    :param shape: shape of the query
+    :return: SELECT statement, the same object is returned for the same shape so prepared cursors are reused
+    """
+    details = TABLE_DETAILS[table_name]
+    primary_key = details.primary_key
+    conditions = [f"{name} {operator} %s" for name, operator in shape.filters]
+    if shape.search:
+        conditions.append(f"({' OR '.join(f'{name} LIKE %s' for name in search_fields(table_name))})")
+    # rows before the cursor are the rows following it in the reversed order
+    descending = shape.descending != (shape.direction == 'before')
+    if shape.direction is not None:
+        conditions.append(_keyset_condition(shape.sort, primary_key, descending, shape.null_cursor))
+
+    order = "DESC" if descending else "ASC"
+    order_by = f"{shape.sort} {order}" if shape.sort == primary_key else f"{shape.sort} {order}, {primary_key} {order}"
+    return (f"SELECT {','.join(field.name for field in details.fields_details)} FROM {details.table_name}"
+            f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''} ORDER BY {order_by}"
+            f"{' LIMIT %s' if shape.limited else ''}")
+
+
+@lru_cache(maxsize=256)
+def labels_statement(table_name: Tables, label_fields: Tuple[str, ...], count: Optional[int] = None) -> str:
+    """
+    :param table_name: referenced table name
+    :param label_fields: fields shown instead of the primary key
+    :param count: number of primary keys in the IN list, first rows ordered by the labels (`LIMIT %s`) when not set
+    :return: SELECT statement of the primary key and label fields
+    """
+    details = TABLE_DETAILS[table_name]
+    select_base = f"SELECT {details.primary_key},{','.join(label_fields)} FROM {details.table_name}"
+    if count is None:
+        return f"{select_base} ORDER BY {','.join(label_fields)},{details.primary_key} LIMIT %s"
+    return f"{select_base} WHERE {details.primary_key} IN ({','.join(['%s'] * count)})"
+
+
+@lru_cache(maxsize=64)
+def delete_many_statement(table_name: Tables, count: int) -> str:
+    """
+    :param table_name: table name
+    :param count: number of primary keys in the IN list
+    :return: DELETE statement for `count` primary keys
+    """
+    details = TABLE_DETAILS[table_name]
+    return f"DELETE FROM {details.table_name} WHERE {details.primary_key} IN ({','.join(['%s'] * count)})"
+
+
+@lru_cache(maxsize=64)
+def lock_many_statement(table_name: Tables, count: int) -> str:
+    """
+    :param table_name: table name
+    :param count: number of primary keys in the IN list
+    :return: SELECT ... FOR UPDATE of the records with `count` primary keys
+    """
+    details = TABLE_DETAILS[table_name]
+    fields = ','.join(field.name for field in details.fields_details)
+    return (f"SELECT {fields} FROM {details.table_name} "
+            f"WHERE {details.primary_key} IN ({','.join(['%s'] * count)}) FOR UPDATE")
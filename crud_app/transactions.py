@@ -0,0 +1,238 @@
+"""
+Transactions of `DbInterface`: isolation levels, savepoints, retries of deadlocked transactions
+and group commit of small writes.
+"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import StrEnum
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from mysql.connector import errorcode
+from mysql.connector.errors import Error
+
+from crud_app.audit import AuditRecord
+from crud_app.changes import ChangeEvent, ChangeKind
+
+# the whole transaction is rolled back by the server, running it again is safe
+RETRYABLE_ERRORS = frozenset({errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT})
+
+
+class IsolationLevel(StrEnum):
+    """
+    Enum of the transaction isolation levels, values are the SQL names.
+    """
+    READ_UNCOMMITTED = "READ UNCOMMITTED"
+    READ_COMMITTED = "READ COMMITTED"
+    REPEATABLE_READ = "REPEATABLE READ"
+    SERIALIZABLE = "SERIALIZABLE"
+
+
+class TransactionSettings(NamedTuple):
+    """
+    NamedTuple representing the configuration of the transactions, the isolation level of the server
+    is used when `isolation_level` is not set, group commit is disabled when `group_commit_size` is 0.
+    """
+    isolation_level: Optional[IsolationLevel] = None
+    retries: int = 3
+    backoff: float = 0.05
+    group_commit_size: int = 0
+    group_commit_delay: float = 0.0
+
+
+class ExecuteResult(NamedTuple):
+    """
+    NamedTuple representing the result of the statement executed in the transaction.
+    """
+    rows: List[tuple]
+    rowcount: int
+    lastrowid: Optional[int]
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    :param error: exception raised in the transaction
+    :return: True for deadlocks and lock wait timeouts
+    """
+    return isinstance(error, Error) and error.errno in RETRYABLE_ERRORS
+
+
+def backoff_delay(backoff: float, attempt: int) -> float:
+    """
+    :param backoff: delay of the first retry
+    :param attempt: number of the failed attempt, starting from 0
+    :return: exponential delay with full jitter, so the deadlocked transactions do not meet again
+    """
+    return random.uniform(0, backoff * 2 ** attempt)
+
+
+class Transaction:
+    """
+    Class representing the open transaction of `DbInterface.transaction`, cache invalidations, changes
+    and audit records are collected and applied by `DbInterface` once the transaction is committed.
+    """
+    def __init__(self, connection, statement_cursor: Callable):
+        self.connection = connection
+        self._statement_cursor = statement_cursor
+        self._savepoints = 0
+        self.invalidations: List[Tuple[str, Optional[int]]] = []
+        self.changes: List[ChangeEvent] = []
+        self.audit_records: List[AuditRecord] = []
+
+    def execute(self, statement: str, params: Sequence = (), prepare: bool = True) -> ExecuteResult:
+        """
+        :param statement: SQL statement, the registry statements are prepared once per connection
+        :param params: positional parameters of the statement
+        :param prepare: False for the one-off statements, not worth preparing
+        :return: fetched rows, number of affected rows and the generated primary key
+        """
+        with self._statement_cursor(self.connection, statement, prepare) as cursor:
+            cursor.execute(statement, params)
+            rows = cursor.fetchall() if cursor.with_rows else []
+            return ExecuteResult(rows=rows, rowcount=cursor.rowcount, lastrowid=cursor.lastrowid)
+
+    def executemany(self, statement: str, params: List[tuple]) -> int:
+        """
+        :param statement: INSERT statement is rewritten by the driver to a multi-row INSERT
+        :param params: parameters of every row
+        :return: number of affected rows
+        """
+        with self.connection.cursor() as cursor:
+            cursor.executemany(statement, params)
+            return cursor.rowcount
+
+    def invalidate(self, table_name: str, primary_key: Optional[int] = None, kind: ChangeKind = ChangeKind.RELOAD):
+        """
+        :param table_name: table written in the transaction
+        :param primary_key: primary key of the written row, the whole table when not set
+        :param kind: change of the row published to the change feed
+        """
+        self.invalidations.append((table_name, primary_key))
+        self.changes.append(ChangeEvent(table_name, primary_key,
+                                        kind if primary_key is not None else ChangeKind.RELOAD))
+
+    def audit(self, record: AuditRecord):
+        """
+        :param record: change of the row written to the audit log once the transaction is committed
+        """
+        self.audit_records.append(record)
+
+    def _command(self, statement: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute(statement)
+
+    @contextmanager
+    def savepoint(self):
+        """
+        Nested transaction, the block is rolled back to the savepoint on error and the error is re-raised.
+        Deadlocks roll back the whole transaction, they are not caught by the savepoint.
+        """
+        self._savepoints += 1
+        name = f"sp{self._savepoints}"
+        marks = len(self.invalidations), len(self.changes), len(self.audit_records)
+        self._command(f"SAVEPOINT {name}")
+        try:
+            yield self
+        except Exception as error:
+            if not is_retryable(error):
+                self._command(f"ROLLBACK TO SAVEPOINT {name}")
+            # the changes rolled back did not happen
+            invalidated, changed, audited = marks
+            del self.invalidations[invalidated:]
+            del self.changes[changed:]
+            del self.audit_records[audited:]
+            raise
+        self._command(f"RELEASE SAVEPOINT {name}")
+
+
+class _PendingWrite:  # pylint: disable=too-few-public-methods
+    def __init__(self, work: Callable[[Transaction], object]):
+        self.work = work
+        # the write is run by the leading thread, in the context of its own request, e.g. the audited actor
+        self.context = contextvars.copy_context()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.leads = False
+        self.wake = threading.Event()
+
+
+class GroupCommit:  # pylint: disable=too-few-public-methods
+    """
+    Class representing the group commit of small writes coming from concurrent requests.
+    The first waiting write leads: it runs the pending writes in one transaction, each in its own savepoint,
+    and commits once, the next pending write takes the lead for the writes queued in the meantime.
+    Callers return after the commit of their write, so the writes are as durable as with separate transactions.
+    """
+    def __init__(self, run_batch: Callable[[Callable[[Transaction], None]], None],
+                 max_size: int = 64, max_delay: float = 0.0):
+        """
+        :param run_batch: runs the function in a committed transaction, retrying deadlocks
+        :param max_size: maximal number of writes per transaction
+        :param max_delay: time the leader waits for more writes before running the batch
+        """
+        if max_size < 1:
+            raise ValueError(f"Invalid group commit size {max_size}")
+        self._run_batch = run_batch
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._pending: List[_PendingWrite] = []
+        self._leading = False
+
+    def submit(self, work: Callable[[Transaction], object]):
+        """
+        :param work: function writing with the transaction, it may be run again when the batch is retried
+        :return: result of the function, once it is committed
+        """
+        write = _PendingWrite(work)
+        with self._lock:
+            self._pending.append(write)
+            if not self._leading:
+                self._leading = write.leads = True
+        if not write.leads:
+            write.wake.wait()
+        if not write.finished:
+            self._lead()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _lead(self):
+        if self.max_delay:
+            time.sleep(self.max_delay)
+        with self._lock:
+            batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+        try:
+            self._run_batch(lambda transaction: self._execute(transaction, batch))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            for write in batch:
+                write.error = error
+        finally:
+            with self._lock:
+                if self._pending:
+                    successor = self._pending[0]
+                    successor.leads = True
+                    successor.wake.set()
+                else:
+                    self._leading = False
+            for write in batch:
+                write.finished = True
+                write.wake.set()
+
+    @staticmethod
+    def _execute(transaction: Transaction, batch: List[_PendingWrite]):
+        for write in batch:
+            write.result, write.error = None, None
+            if len(batch) == 1:
+                write.result = write.context.run(write.work, transaction)
+                continue
+            try:
+                with transaction.savepoint():
+                    write.result = write.context.run(write.work, transaction)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                if is_retryable(error):
+                    raise
+                write.error = error
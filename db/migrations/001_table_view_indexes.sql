@@ -0,0 +1,15 @@
+-- indexes serving ORDER BY, filters and prefix search of the table view
+CREATE INDEX IF NOT EXISTS ix_kontraktorzy_imie ON kontraktorzy (imie);
+CREATE INDEX IF NOT EXISTS ix_kontraktorzy_nazwisko ON kontraktorzy (nazwisko);
+CREATE INDEX IF NOT EXISTS ix_kontraktorzy_data_zatrudn ON kontraktorzy (data_zatrudn);
+CREATE INDEX IF NOT EXISTS ix_kontraktorzy_stawka_godzinowa ON kontraktorzy (stawka_godzinowa);
+CREATE INDEX IF NOT EXISTS ix_pracownicy_imie ON pracownicy (imie);
+CREATE INDEX IF NOT EXISTS ix_pracownicy_nazwisko ON pracownicy (nazwisko);
+CREATE INDEX IF NOT EXISTS ix_pracownicy_przelozony ON pracownicy (przelozony);
+CREATE INDEX IF NOT EXISTS ix_pracownicy_data_zatrudn ON pracownicy (data_zatrudn);
+CREATE INDEX IF NOT EXISTS ix_pracownicy_wynagrodzenie ON pracownicy (wynagrodzenie);
+CREATE INDEX IF NOT EXISTS ix_stanowiska_nazwa ON stanowiska (nazwa);
+CREATE INDEX IF NOT EXISTS ix_stanowiska_placa_min ON stanowiska (placa_min);
+CREATE INDEX IF NOT EXISTS ix_stanowiska_placa_max ON stanowiska (placa_max);
+CREATE INDEX IF NOT EXISTS ix_zespoly_nazwa ON zespoly (nazwa);
+CREATE INDEX IF NOT EXISTS ix_zespoly_dzial ON zespoly (dzial);
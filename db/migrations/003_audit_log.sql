@@ -0,0 +1,16 @@
+-- append-only history of the writes, inserted in batches by crud_app.audit.DbAuditSink
+CREATE TABLE IF NOT EXISTS audit_log (
+    id bigint NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    table_name varchar(64) NOT NULL,
+    record_id int DEFAULT NULL,
+    kind varchar(8) NOT NULL,
+    actor varchar(255) DEFAULT NULL,
+    changed_at datetime(6) NOT NULL,
+    before_data longtext DEFAULT NULL,
+    after_data longtext DEFAULT NULL,
+    KEY ix_audit_log_record (table_name, record_id, id)
+);
+CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log FOR EACH ROW
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'audit_log is append-only';
+CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log FOR EACH ROW
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'audit_log is append-only';
@@ -0,0 +1,81 @@
+import datetime
+import gzip
+import importlib
+from decimal import Decimal
+import pytest
+from unittest.mock import patch
+from fasthtml.common import to_xml
+from starlette.testclient import TestClient
+from crud_app.db_structure import Tables, create_record, parse_form_record
+from crud_app.importer import ImportReport
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    for name, value in {"DB_USER": "user", "DB_PASS": "pass", "DB_HOST": "host", "DB_NAME": "dbname"}.items():
+        monkeypatch.setenv(name, value)
+    with patch("mysql.connector.connect"):
+        yield importlib.import_module("crud_app.app")
+
+
+def test_conflict_marks_only_changed_fields(app_module):
+    data = create_record(Tables.PRACOWNICY, {"idprac": "1", "imie": "Jan", "nazwisko": "Nowak", "stanowisko": "2",
+                                             "przelozony": "", "data_zatrudn": "2021-01-01", "zespol": "3",
+                                             "wynagrodzenie": "4000.00", "plec": "M"})
+    current = (1, "Jan", "Kowalski", 2, None, datetime.date(2021, 1, 1), 3, Decimal("4000.00"), "M")
+    options = {"stanowisko": [(2, "Programista")], "przelozony": [(5, "Anna Nowak")], "zespol": [(3, "Zespół A")]}
+
+    html = to_xml(app_module.generate_conflict(Tables.PRACOWNICY, 1, data, current, options))
+
+    assert html.count("<mark>") == 2
+    assert "<mark>Nowak</mark>" in html and "<mark>Kowalski</mark>" in html
+    assert html.count("<td>Programista</td>") == 2
+
+
+def test_gzip_export_is_a_gzip_file(app_module):
+    with patch.object(app_module.db_interface, "iter_table_data", return_value=iter([[(1, "A", "IT")]])):
+        response = TestClient(app_module.app).get("/zespoly/export?gzip=true")
+
+    assert response.headers["content-type"] == "application/gzip"
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-disposition"] == 'attachment; filename="zespoly.csv.gz"'
+    assert gzip.decompress(response.content).startswith(b"ID,")
+
+
+def test_record_form_converted_by_field_types(app_module):
+    form = {"idprac": "", "imie": "Jan", "nazwisko": "Nowak", "stanowisko": "2", "przelozony": "1",
+            "data_zatrudn": "2021-01-01", "zespol": "3", "wynagrodzenie": "4000.00", "plec": ""}
+
+    with patch.object(app_module.db_interface, "insert_table_row") as insert_table_row:
+        response = TestClient(app_module.app).post("/pracownicy/0", data=form, follow_redirects=False)
+        invalid = [TestClient(app_module.app).post("/pracownicy/0", data={**form, **change}).status_code
+                   for change in ({"stanowisko": "2.5"}, {"wynagrodzenie": "NaN"}, {"data_zatrudn": "jutro"},
+                                  {"plec": "X"}, {"przelozony": ""})]
+
+    assert response.status_code < 400
+    (_, data), _ = insert_table_row.call_args
+    assert data == parse_form_record(Tables.PRACOWNICY, form)
+    assert (data.idprac, data.stanowisko, data.przelozony, data.zespol, data.plec) == (None, 2, 1, 3, None)
+    assert (data.data_zatrudn, data.wynagrodzenie) == (datetime.date(2021, 1, 1), Decimal("4000.00"))
+    assert invalid == [400] * 5
+    insert_table_row.assert_called_once()
+
+
+def test_bulk_request_not_an_object(app_module):
+    client = TestClient(app_module.app)
+
+    responses = [client.post("/zespoly/bulk", json=payload) for payload in ([1, 2], "insert", None)]
+
+    assert [response.status_code for response in responses] == [400] * 3
+
+
+def test_import_runs_in_the_db_thread_pool(app_module):
+    report = ImportReport(1, 1, 0, [], [], 0.5)
+
+    with patch.object(app_module, "import_csv", return_value=report) as import_csv, \
+            patch.object(app_module, "record_db_time") as record_db_time:
+        response = TestClient(app_module.app).post("/zespoly/import", content=b"nazwa,dzial\nA,IT\n")
+
+    assert response.status_code == 200 and response.json()["rows_inserted"] == 1
+    import_csv.assert_called_once()
+    record_db_time.assert_called_once()
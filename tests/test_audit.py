@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from crud_app.audit import AUDIT_ACTOR, AuditActorMiddleware, AuditLog, AuditSettings, FileAuditSink, audit_record
+from crud_app.changes import ChangeKind
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables, Zespol
+
+
+@pytest.fixture
+def mock_db():
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.__enter__.return_value = mock_cursor
+        yield mock_conn, mock_cursor
+
+
+def test_file_audit_log_pages_history(tmp_path):
+    audit_log = AuditLog(FileAuditSink(str(tmp_path / "audit.jsonl")))
+    token = AUDIT_ACTOR.set("anna")
+    try:
+        audit_log.record([audit_record(Tables.PRACOWNICY, 1, ChangeKind.UPDATE, {"wynagrodzenie": salary},
+                                       {"wynagrodzenie": salary + 100}) for salary in range(1000, 1500, 100)])
+        audit_log.record([audit_record(Tables.PRACOWNICY, 2, ChangeKind.DELETE, {"wynagrodzenie": 900}, None)])
+    finally:
+        AUDIT_ACTOR.reset(token)
+    audit_log.close()
+
+    first, has_more = audit_log.history(Tables.PRACOWNICY, 1, limit=3)
+    second, has_more_second = audit_log.history(Tables.PRACOWNICY, 1, before=first[-1].id, limit=3)
+
+    assert [record.after["wynagrodzenie"] for record in first] == [1500, 1400, 1300]
+    assert has_more and not has_more_second
+    assert [record.after["wynagrodzenie"] for record in second] == [1200, 1100]
+    assert first[0].actor == "anna" and first[0].kind == ChangeKind.UPDATE
+    assert audit_log.stats().written == 6
+
+
+def test_full_queue_drops_records():
+    writing, release = threading.Event(), threading.Event()
+
+    class BlockedSink:
+        def write(self, records):
+            writing.set()
+            release.wait(5)
+
+    audit_log = AuditLog(BlockedSink(), AuditSettings(queue_size=1))
+    records = [audit_record(Tables.ZESPOLY, key, ChangeKind.DELETE, {}, None) for key in range(3)]
+    audit_log.record(records[:1])
+    assert writing.wait(5)
+    audit_log.record(records[1:])
+    stats = audit_log.stats()
+    release.set()
+    audit_log.close()
+
+    assert (stats.recorded, stats.dropped, stats.queued) == (2, 1, 1)
+    assert audit_log.stats().written == 2
+
+
+def test_db_interface_audits_committed_writes(mock_db, tmp_path):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(3, "Stara", "IT")]
+    db_interface = DbInterface("user", "pass", "host", "dbname",
+                               audit_settings=AuditSettings(file=str(tmp_path / "audit.jsonl")))
+    recorded = []
+
+    with patch.object(db_interface.audit_log, "record", side_effect=recorded.extend):
+        db_interface.update_table_row(Tables.ZESPOLY, 3, Zespol(idzespol=3, nazwa="Nowa", dzial="IT"))
+        mock_cursor.execute.side_effect = [None, RuntimeError("failed")]
+        with pytest.raises(RuntimeError):
+            db_interface.remove_table_row(Tables.ZESPOLY, 3)
+
+    assert [(record.primary_key, record.kind, record.before, record.after) for record in recorded] == \
+        [(3, ChangeKind.UPDATE, {"idzespol": 3, "nazwa": "Stara", "dzial": "IT"},
+          {"idzespol": 3, "nazwa": "Nowa", "dzial": "IT"})]
+
+
+def test_bulk_update_audits_string_primary_keys(mock_db, tmp_path):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(3, "Stara", "IT"), (4, "Druga", "HR")]
+    db_interface = DbInterface("user", "pass", "host", "dbname",
+                               audit_settings=AuditSettings(file=str(tmp_path / "audit.jsonl")))
+    recorded = []
+
+    with patch.object(db_interface.audit_log, "record", side_effect=recorded.extend):
+        db_interface.update_table_rows(Tables.ZESPOLY, [Zespol(idzespol="3", nazwa="Nowa", dzial="IT"),
+                                                        Zespol(idzespol="4", nazwa="Druga", dzial="IT")])
+
+    assert [(record.primary_key, record.before["nazwa"], record.after) for record in recorded] == \
+        [(3, "Stara", {"idzespol": 3, "nazwa": "Nowa", "dzial": "IT"}),
+         (4, "Druga", {"idzespol": 4, "nazwa": "Druga", "dzial": "IT"})]
+
+
+def test_before_images_lock_padded(mock_db, tmp_path):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = []
+    db_interface = DbInterface("user", "pass", "host", "dbname",
+                               audit_settings=AuditSettings(file=str(tmp_path / "audit.jsonl")))
+
+    db_interface.remove_table_rows(Tables.ZESPOLY, [1, 2, 3])
+
+    query, params = mock_cursor.execute.call_args_list[0].args
+    assert query.endswith("IN (%s,%s,%s,%s) FOR UPDATE")
+    assert params == (1, 2, 3, 3)
+
+
+def test_actor_header_read_only_from_trusted_proxies():
+    actors = []
+
+    async def app(scope, receive, send):
+        actors.append(AUDIT_ACTOR.get())
+
+    def request(client, header="X-Remote-User", trusted_proxies=("10.0.0.1",)):
+        scope = {"type": "http", "client": (client, 5000), "headers": [(b"x-remote-user", b"anna")]}
+        asyncio.run(AuditActorMiddleware(app, header, trusted_proxies)(scope, None, None))
+
+    request("10.0.0.1")
+    request("10.0.0.2")
+    request("10.0.0.1", header="")
+    request("10.0.0.2", trusted_proxies=("*",))
+
+    assert actors == ["anna", "10.0.0.2", "10.0.0.1", "anna"]
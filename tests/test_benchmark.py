@@ -0,0 +1,61 @@
+import random
+import pytest
+from unittest.mock import MagicMock
+from crud_app.benchmark import compare_results, generate_records, percentile, run_operation, seed, volumes_for
+from crud_app.db_structure import Pracownik, Tables
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_run_operation_counts_errors():
+    def operation(index):
+        if index % 2:
+            raise RuntimeError("failed")
+
+    result = run_operation("db", "operation", operation, concurrency=4, requests=10)
+
+    assert result.requests == 10
+    assert result.errors == 5
+    assert result.p50_ms <= result.p99_ms
+
+
+def test_compare_results():
+    previous = {"results": [{"target": "db", "operation": "get", "concurrency": 1, "p95_ms": 10.0, "throughput": 100.0}]}
+    current = {"results": [{"target": "db", "operation": "get", "concurrency": 1, "p95_ms": 13.0, "throughput": 95.0}]}
+
+    assert compare_results(previous, current, tolerance=0.2) == ["db/get x1: p95 10.00ms -> 13.00ms"]
+
+
+def test_generate_records_follow_references():
+    volumes = volumes_for(1000, {"zespoly": 3})
+    references = {Tables.STANOWISKA: [1, 2], Tables.ZESPOLY: [7], Tables.PRACOWNICY: [100]}
+
+    records = list(generate_records(Tables.PRACOWNICY, 5, random.Random(0), references))
+
+    assert volumes[Tables.ZESPOLY] == 3 and volumes[Tables.KONTRAKTORZY] == 100
+    assert all(isinstance(record, Pracownik) and record.zespol == 7 and record.stanowisko in (1, 2)
+               for record in records)
+
+
+def test_volumes_for_invalid_table():
+    with pytest.raises(ValueError):
+        volumes_for(1000, {"audit_log": 10})
+
+
+def test_seed_tops_up_to_volume():
+    existing = {Tables.STANOWISKA: 10, Tables.ZESPOLY: 10, Tables.PRACOWNICY: 7, Tables.KONTRAKTORZY: 20}
+    db_interface = MagicMock()
+    db_interface.iter_table_data.side_effect = lambda table_name, batch_size: \
+        iter([[(key,) for key in range(1, existing[table_name] + 1)]])
+
+    inserted = seed(db_interface, volumes_for(10))
+
+    assert inserted == {Tables.STANOWISKA: 0, Tables.ZESPOLY: 0, Tables.PRACOWNICY: 3, Tables.KONTRAKTORZY: 0}
+    (table_name, records, _), = [call.args for call in db_interface.insert_table_rows.call_args_list]
+    assert table_name == Tables.PRACOWNICY and len(records) == 3
@@ -0,0 +1,98 @@
+import math
+import pytest
+from unittest.mock import patch
+from crud_app.cache import FULL_RANGE, MISSING, CacheBackend, MemoryCacheBackend, SharedGenerations
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables
+
+
+@pytest.fixture
+def cache():
+    return MemoryCacheBackend(ttl=60, default_size=2, table_sizes={"zespoly": 3})
+
+
+def test_get_set(cache):
+    assert cache.get("pracownicy", "key") is MISSING
+
+    cache.set("pracownicy", "key", [1], FULL_RANGE, cache.generation("pracownicy"))
+
+    assert cache.get("pracownicy", "key") == [1]
+    assert cache.stats().hits == 1
+    assert cache.stats().misses == 1
+
+
+def test_backend_implements_every_method():
+    class PartialBackend(CacheBackend):
+        def get(self, table_name, key):
+            return MISSING
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+def test_lru_eviction_with_table_size(cache):
+    for key in range(4):
+        cache.set("zespoly", key, key, FULL_RANGE, 0)
+        cache.set("pracownicy", key, key, FULL_RANGE, 0)
+
+    assert cache.get("zespoly", 0) is MISSING
+    assert cache.get("zespoly", 3) == 3
+    assert cache.get("pracownicy", 1) is MISSING
+    assert cache.stats().evictions == 3
+
+
+def test_ttl_expiration():
+    cache = MemoryCacheBackend(ttl=0)
+    cache.set("zespoly", "key", "value", FULL_RANGE, 0)
+
+    assert cache.get("zespoly", "key") is MISSING
+    assert cache.stats().expirations == 1
+
+
+def test_invalidate_by_primary_key(cache):
+    cache.set("zespoly", "first", 1, (-math.inf, 10), 0)
+    cache.set("zespoly", "second", 2, (11, math.inf), 0)
+
+    cache.invalidate("zespoly", 12)
+
+    assert cache.get("zespoly", "first") == 1
+    assert cache.get("zespoly", "second") is MISSING
+
+
+def test_stale_set_rejected(cache):
+    generation = cache.generation("zespoly")
+    cache.invalidate("zespoly")
+
+    cache.set("zespoly", "key", "stale", FULL_RANGE, generation)
+
+    assert cache.get("zespoly", "key") is MISSING
+
+
+def test_db_interface_read_through_and_invalidation(cache):
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchall.return_value = [(1, "John Doe")]
+        db_interface = DbInterface("user", "pass", "host", "dbname", cache=cache)
+
+        assert db_interface.get_record_data(Tables.ZESPOLY, 1) == (1, "John Doe")
+        assert db_interface.get_record_data(Tables.ZESPOLY, 1) == (1, "John Doe")
+        assert mock_cursor.execute.call_count == 1
+
+        db_interface.remove_table_row(Tables.ZESPOLY, 1)
+        db_interface.get_record_data(Tables.ZESPOLY, 1)
+        assert mock_cursor.execute.call_count == 3
+
+
+def test_shared_generations_invalidate_other_process(tmp_path):
+    path = str(tmp_path / "versions")
+    first = MemoryCacheBackend(shared=SharedGenerations(path))
+    second = MemoryCacheBackend(shared=SharedGenerations(path))
+    second.set("zespoly", "key", "value", FULL_RANGE, second.generation("zespoly"))
+
+    first.invalidate("zespoly", 1)
+
+    assert second.get("zespoly", "key") is MISSING
+    assert second.generation("zespoly") == first.generation("zespoly") == 1
+    assert second.modified("zespoly") == first.modified("zespoly")
+    assert first.epoch == second.epoch
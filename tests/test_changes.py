@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from crud_app.changes import ChangeEvent, ChangeFeed, ChangeKind
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables, Zespol
+
+
+@pytest.fixture
+def mock_db():
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.__enter__.return_value = mock_cursor
+        yield mock_conn, mock_cursor
+
+
+def test_feed_delivers_events_of_subscribed_tables():
+    feed = ChangeFeed(queue_size=2)
+
+    async def run():
+        with feed.subscribe(["pracownicy", "zespoly"]) as subscription:
+            assert feed.subscribers("zespoly") == 1
+            feed.publish([ChangeEvent("zespoly", 1, ChangeKind.UPDATE), ChangeEvent("stanowiska", 2, ChangeKind.DELETE)])
+            first = await subscription.get(1.0)
+            assert await subscription.get(0.01) is None
+            for key in range(3):
+                feed.publish([ChangeEvent("pracownicy", key, ChangeKind.INSERT)])
+            overflow = await subscription.get(1.0)
+        return first, overflow
+
+    first, overflow = asyncio.run(run())
+
+    assert first == ChangeEvent("zespoly", 1, ChangeKind.UPDATE)
+    assert overflow == ChangeEvent("pracownicy", None, ChangeKind.RELOAD)
+    assert feed.subscribers("zespoly") == 0
+
+
+def test_db_interface_publishes_committed_changes(mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.lastrowid = 5
+    db_interface = DbInterface("user", "pass", "host", "dbname", change_feed=ChangeFeed())
+    published = []
+
+    with patch.object(db_interface.change_feed, "publish", side_effect=published.extend):
+        db_interface.insert_table_row(Tables.ZESPOLY, Zespol(idzespol=0, nazwa="Nowy", dzial="IT"))
+        db_interface.remove_table_row(Tables.ZESPOLY, 5)
+        db_interface.remove_table_rows(Tables.ZESPOLY, [1, 2])
+        with pytest.raises(RuntimeError):
+            with db_interface.transaction() as transaction:
+                transaction.invalidate(Tables.ZESPOLY, 7, ChangeKind.UPDATE)
+                raise RuntimeError("failed")
+
+    assert published == [ChangeEvent(Tables.ZESPOLY, 5, ChangeKind.INSERT),
+                         ChangeEvent(Tables.ZESPOLY, 5, ChangeKind.DELETE),
+                         ChangeEvent(Tables.ZESPOLY, None, ChangeKind.RELOAD)]
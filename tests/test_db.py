@@ -1,14 +1,16 @@
 import pytest
+from dataclasses import fields
 from unittest.mock import MagicMock, patch
-from crud_app.db import DbInterface
-from crud_app.db_structure import Tables, FieldDetails
+from crud_app.db import DbInterface, RecordConflictError
+from crud_app.db_structure import Tables, FieldDetails, Pracownik, TableQuery, Zespol, create_record
 
 
 @pytest.fixture
 def mock_db():
     with patch("mysql.connector.connect") as mock_connect:
         mock_conn = mock_connect.return_value
-        mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.__enter__.return_value = mock_cursor
         yield mock_conn, mock_cursor
 
 
@@ -39,9 +41,109 @@ def test_get_table_data(db_interface, mock_db):
     assert result == [(1, "John Doe"), (2, "Jane Doe")]
 
 
+def test_get_table_data_keyset(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(5, "Jane Doe"), (4, "John Doe")]
+
+    result = db_interface.get_table_data(Tables.PRACOWNICY, before=6, limit=2)
+
+    query, params = mock_cursor.execute.call_args.args
+    assert "idprac < %s ORDER BY idprac DESC LIMIT %s" in query
+    assert params == (6, 2)
+    assert result == [(4, "John Doe"), (5, "Jane Doe")]
+
+
+def test_get_table_data_sorted_filtered_and_searched(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = []
+    query = TableQuery(sort="nazwisko", filters=(("zespol", "=", "4"),), search="Now_")
+
+    db_interface.get_table_data(Tables.PRACOWNICY, after=101, limit=2, query=query, key="Nowak")
+
+    statement, params = mock_cursor.execute.call_args.args
+    assert "WHERE zespol = %s AND (imie LIKE %s OR nazwisko LIKE %s) AND (nazwisko > %s" in statement
+    assert statement.endswith("ORDER BY nazwisko ASC, idprac ASC LIMIT %s")
+    assert params == ("4", "Now\\_%", "Now\\_%", "Nowak", "Nowak", 101, 2)
+
+
+def test_get_table_data_invalid_query(db_interface):
+    with pytest.raises(ValueError):
+        db_interface.get_table_data(Tables.PRACOWNICY, query=TableQuery(sort="haslo"))
+    with pytest.raises(ValueError):
+        db_interface.get_table_data(Tables.PRACOWNICY, query=TableQuery(filters=(("imie", "LIKE", "J"),)))
+
+
+def test_resolve_references_batched(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.side_effect = [[(1, "prezes"), (2, "kierownik"), (3, "asystent")],
+                                        [(100, "Jan", "Kowalski")],
+                                        [(4, "IT")]]
+    rows = [(101, "Marek", "Nowak", 1, 100, None, 4, 17000, None),
+            (102, "Anna", "Nowak", 2, 100, None, 4, 10000, None),
+            (103, "Jan", "Nowak", 3, 100, None, None, 9000, None)]
+
+    labels = db_interface.resolve_references(Tables.PRACOWNICY, rows)
+
+    assert labels == {3: {1: "prezes", 2: "kierownik", 3: "asystent"}, 4: {100: "Jan Kowalski"}, 6: {4: "IT"}}
+    assert mock_cursor.execute.call_count == 3
+    statement, params = mock_cursor.execute.call_args_list[0].args
+    assert statement == "SELECT idstanow,nazwa FROM stanowiska WHERE idstanow IN (%s,%s,%s,%s)"
+    assert params == (1, 2, 3, 3)
+
+
+def test_get_table_data_after_and_before(db_interface):
+    with pytest.raises(ValueError):
+        db_interface.get_table_data(Tables.PRACOWNICY, after=1, before=5)
+
+
+def test_iter_table_data(db_interface, mock_db):
+    mock_conn, mock_cursor = mock_db
+    mock_cursor.fetchmany.side_effect = [[(1, "a"), (2, "b")], [(3, "c")], []]
+
+    batches = list(db_interface.iter_table_data(Tables.ZESPOLY, batch_size=2))
+
+    assert batches == [[(1, "a"), (2, "b")], [(3, "c")]]
+    mock_conn.cursor.assert_called_with(buffered=False)
+    assert db_interface.get_pool_stats().in_use == 0
+
+
+def test_iter_table_data_closed_early(db_interface, mock_db):
+    mock_conn, _ = mock_db
+    mock_conn.cursor.return_value.fetchmany.return_value = [(1, "a")]
+
+    batches = db_interface.iter_table_data(Tables.ZESPOLY)
+    next(batches)
+    batches.close()
+
+    mock_conn.close.assert_called()
+    assert db_interface.get_pool_stats().size == 0
+
+
+def test_get_table_page(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(3, "a"), (4, "b"), (5, "c")]
+
+    page = db_interface.get_table_page(Tables.PRACOWNICY, after=2, limit=2)
+
+    assert page.rows == [(3, "a"), (4, "b")]
+    assert page.next_after == 4
+    assert page.prev_before == 3
+
+
+def test_get_table_page_last(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(1, "a")]
+
+    page = db_interface.get_table_page(Tables.PRACOWNICY, limit=2)
+
+    assert page.rows == [(1, "a")]
+    assert page.next_after is None
+    assert page.prev_before is None
+
+
 def test_get_record_data(db_interface, mock_db):
     _, mock_cursor = mock_db
-    mock_cursor.fetchone.return_value = (1, "John Doe")
+    mock_cursor.fetchall.return_value = [(1, "John Doe")]
 
     result = db_interface.get_record_data(Tables.PRACOWNICY, 1)
 
@@ -49,6 +151,31 @@ def test_get_record_data(db_interface, mock_db):
     assert result == (1, "John Doe")
 
 
+def test_prepared_cursor_reused(db_interface, mock_db):
+    mock_conn, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(1, "John Doe")]
+
+    db_interface.get_record_data(Tables.PRACOWNICY, 1)
+    db_interface.get_record_data(Tables.PRACOWNICY, 2)
+
+    mock_conn.cursor.assert_called_once_with(prepared=True)
+    assert mock_cursor.execute.call_args.args[1] == (2,)
+
+
+def test_prepared_cursors_bounded(mock_db):
+    mock_conn, _ = mock_db
+    cursors = {}
+    mock_conn.cursor.side_effect = lambda **kwargs: cursors.setdefault(len(cursors), MagicMock())
+    db_interface = DbInterface("user", "pass", "host", "dbname", prepared_cache_size=2)
+
+    for table_name in (Tables.PRACOWNICY, Tables.ZESPOLY, Tables.PRACOWNICY, Tables.STANOWISKA):
+        db_interface.get_record_data(table_name, 1)
+
+    assert len(cursors) == 3
+    cursors[1].close.assert_called_once()
+    cursors[0].close.assert_not_called()
+
+
 def test_remove_table_row(db_interface, mock_db):
     mock_conn, mock_cursor = mock_db
 
@@ -58,6 +185,49 @@ def test_remove_table_row(db_interface, mock_db):
     mock_conn.commit.assert_called()
 
 
+def test_insert_table_rows_chunks(db_interface, mock_db):
+    mock_conn, mock_cursor = mock_db
+    data = [Zespol(0, f"Zespol {i}", "Dzial") for i in range(5)]
+
+    reports = db_interface.insert_table_rows(Tables.ZESPOLY, data, chunk_size=2)
+
+    assert [report.rows for report in reports] == [2, 2, 1]
+    assert mock_cursor.executemany.call_count == 3
+    assert mock_conn.commit.call_count == 3
+
+
+def test_remove_table_rows_rollback(db_interface, mock_db):
+    mock_conn, mock_cursor = mock_db
+    mock_cursor.execute.side_effect = [None, RuntimeError("deadlock")]
+
+    with pytest.raises(RuntimeError):
+        db_interface.remove_table_rows(Tables.ZESPOLY, [1, 2, 3], chunk_size=2)
+
+    query, params = mock_cursor.execute.call_args_list[0].args
+    assert query.endswith("idzespol IN (%s,%s)")
+    assert params == (1, 2)
+    mock_conn.commit.assert_called_once()
+    mock_conn.rollback.assert_called()
+
+
+def test_remove_table_rows_padded(db_interface, mock_db):
+    _, mock_cursor = mock_db
+
+    db_interface.remove_table_rows(Tables.ZESPOLY, [1, 2, 3, 4, 5], chunk_size=3)
+
+    statements = [call.args for call in mock_cursor.execute.call_args_list]
+    assert statements[0][0].endswith("idzespol IN (%s,%s,%s,%s)")
+    assert statements[0][1] == (1, 2, 3, 3)
+    assert statements[1][0].endswith("idzespol IN (%s,%s)")
+    assert statements[1][1] == (4, 5)
+
+
+def test_create_record():
+    record = create_record(Tables.ZESPOLY, {"idzespol": "1", "nazwa": "A", "dzial": "", "unknown": "x"})
+
+    assert record == Zespol("1", "A", None)
+
+
 # def test_update_table_row(db_interface, mock_db):
 #     mock_conn, mock_cursor = mock_db
 #
@@ -72,6 +242,14 @@ def test_remove_table_row(db_interface, mock_db):
 #     mock_conn.commit.assert_called()
 
 
+def test_generated_data_classes():
+    record = Pracownik(7, "Jan", "Kowalski", 1, 2, 3, wynagrodzenie=100.0)
+
+    assert not hasattr(record, "__dict__")
+    assert record.to_params() == (7, "Jan", "Kowalski", 1, 2, None, 3, 100.0, None)
+    assert [field.name for field in fields(Zespol)] == ["idzespol", "nazwa", "dzial"]
+
+
 def test_get_table_headers():
     headers = DbInterface.get_table_headers(Tables.PRACOWNICY)
     assert isinstance(headers, list)
@@ -82,3 +260,58 @@ def test_get_table_fields_details():
     details = DbInterface.get_table_fields_details(Tables.PRACOWNICY)
     assert isinstance(details, list)
     assert all(isinstance(detail, FieldDetails) for detail in details)
+
+
+def test_get_table_version_bumped_by_writes(db_interface):
+    tag, modified = db_interface.get_table_version([Tables.ZESPOLY, Tables.PRACOWNICY])
+
+    db_interface.remove_table_row(Tables.ZESPOLY, 1)
+
+    new_tag, new_modified = db_interface.get_table_version([Tables.PRACOWNICY, Tables.ZESPOLY])
+    assert new_tag != tag
+    assert new_modified >= modified
+    assert db_interface.get_table_version([Tables.STANOWISKA])[0].endswith("-0")
+
+
+def test_update_table_row_version_conflict(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(1, "A", "B")]
+    version = db_interface.get_record_version((1, "A", "B"))
+
+    mock_cursor.rowcount = 1
+    db_interface.update_table_row(Tables.ZESPOLY, 1, Zespol(1, "C", "B"), version)
+    query, params = mock_cursor.execute.call_args.args
+    assert query.endswith("AND nazwa <=> %s AND dzial <=> %s")
+    assert params == ("C", "B", 1, "A", "B")
+
+    # changed between the read and the conditional update
+    mock_cursor.rowcount = 0
+    with pytest.raises(RecordConflictError):
+        db_interface.update_table_row(Tables.ZESPOLY, 1, Zespol(1, "C", "B"), version)
+
+    mock_cursor.fetchall.return_value = [(1, "A", "D")]
+    with pytest.raises(RecordConflictError):
+        db_interface.update_table_row(Tables.ZESPOLY, 1, Zespol(1, "C", "B"), version)
+
+
+def test_warm_up_reads_every_table(db_interface, mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = []
+
+    assert db_interface.warm_up(page_size=10) == len(DbInterface.get_tables())
+
+    statements = " ".join(call.args[0] for call in mock_cursor.execute.call_args_list)
+    assert all(f"FROM {table_name}" in statements for table_name in DbInterface.get_tables())
+
+
+def test_reference_options_bounded(mock_db):
+    _, mock_cursor = mock_db
+    db_interface = DbInterface("user", "pass", "host", "dbname", max_options=1)
+
+    mock_cursor.fetchall.return_value = [(1, "A")]
+    assert db_interface.get_reference_options(Tables.PRACOWNICY) == {"stanowisko": [(1, "A")], "zespol": [(1, "A")]}
+    mock_cursor.execute.assert_called_with(
+        "SELECT idzespol,nazwa FROM zespoly ORDER BY nazwa,idzespol LIMIT %s", (2,))
+
+    mock_cursor.fetchall.return_value = [(1, "A"), (2, "B")]
+    assert db_interface.get_reference_options(Tables.PRACOWNICY) == {}
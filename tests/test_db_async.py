@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import MagicMock
+from crud_app.db import DbInterface
+from crud_app.db_async import AsyncDbInterface
+from crud_app.db_structure import Tables
+
+
+@pytest.fixture
+def async_db_interface():
+    db_interface = MagicMock(spec=DbInterface)
+    async_db_interface = AsyncDbInterface(db_interface, max_workers=2)
+    yield async_db_interface
+    async_db_interface.close()
+
+
+def test_blocking_method_runs_in_executor(async_db_interface):
+    caller_thread = threading.get_ident()
+    worker_threads = []
+
+    def get_record_data(table_name, id):
+        worker_threads.append(threading.get_ident())
+        return (id, table_name)
+
+    async_db_interface.db_interface.get_record_data.side_effect = get_record_data
+
+    result = asyncio.run(async_db_interface.get_record_data(Tables.PRACOWNICY, 1))
+
+    assert result == (1, Tables.PRACOWNICY)
+    assert worker_threads and worker_threads[0] != caller_thread
+
+
+def test_non_blocking_method_passed_through(async_db_interface):
+    async_db_interface.db_interface.check_table_exists.return_value = True
+
+    assert async_db_interface.check_table_exists(Tables.PRACOWNICY) is True
+
+
+def test_exception_propagates(async_db_interface):
+    async_db_interface.db_interface.remove_table_row.side_effect = ValueError("Invalid table")
+
+    with pytest.raises(ValueError):
+        asyncio.run(async_db_interface.remove_table_row("unknown", 1))
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from mysql.connector.errors import InterfaceError, PoolError
+from crud_app.db_pool import ConnectionPool, PoolSettings
+
+
+@pytest.fixture
+def mock_connect():
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_connect.side_effect = lambda **kwargs: MagicMock()
+        yield mock_connect
+
+
+def test_pool_prefills_min_size(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=2, max_size=4))
+
+    assert mock_connect.call_count == 2
+    assert pool.stats().size == 2
+    assert pool.stats().idle == 2
+
+
+def test_pool_invalid_size():
+    with pytest.raises(ValueError):
+        ConnectionPool({}, PoolSettings(min_size=3, max_size=2))
+
+
+def test_pool_checkout_and_checkin(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=0, max_size=2))
+
+    with pool.connection() as first, pool.connection() as second:
+        assert first is not second
+        assert pool.stats().in_use == 2
+
+    stats = pool.stats()
+    assert stats.in_use == 0
+    assert stats.idle == 2
+    assert stats.checkouts == 2
+
+
+def test_pool_timeout_when_exhausted(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=1, max_size=1, timeout=0.01))
+
+    with pool.connection():
+        with pytest.raises(PoolError):
+            pool.checkout()
+
+    assert pool.stats().timeouts == 1
+
+
+def test_pool_replaces_broken_connection(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=1, max_size=1, ping_interval=0))
+    broken = pool.checkout()
+    broken.ping.side_effect = InterfaceError("gone away")
+    pool.checkin(broken)
+
+    with pool.connection() as connection:
+        assert connection is not broken
+
+    broken.close.assert_called()
+    assert pool.stats().reconnects == 1
+
+
+def test_pool_drops_connection_after_interface_error(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=1, max_size=1))
+
+    with pytest.raises(InterfaceError):
+        with pool.connection():
+            raise InterfaceError("lost connection")
+
+    assert pool.stats().size == 0
+    with pool.connection():
+        assert pool.stats().size == 1
+
+
+def test_pool_does_not_use_connections_of_parent_process(mock_connect):
+    pool = ConnectionPool({}, PoolSettings(min_size=1, max_size=1))
+    inherited = pool.checkout()
+    pool.checkin(inherited)
+
+    with patch("os.getpid", return_value=-1):
+        connection = pool.checkout()
+
+    assert connection is not inherited
+    inherited.close.assert_not_called()
+    assert pool.stats().size == 1
@@ -0,0 +1,24 @@
+import gzip
+import json
+from crud_app.export import csv_chunks, gzip_chunks, jsonl_chunks
+
+
+def test_csv_chunks_one_chunk_per_batch():
+    chunks = list(csv_chunks(["ID", "Nazwa"], [[(1, "a,b")], [(2, None)]]))
+
+    assert len(chunks) == 2
+    assert b"".join(chunks).decode() == 'ID,Nazwa\r\n1,"a,b"\r\n2,\r\n'
+
+
+def test_csv_chunks_empty_table():
+    assert b"".join(csv_chunks(["ID"], [])) == b"ID\r\n"
+
+
+def test_jsonl_chunks():
+    lines = b"".join(jsonl_chunks(["idzespol", "nazwa"], [[(1, "Łódź")]])).decode().splitlines()
+
+    assert [json.loads(line) for line in lines] == [{"idzespol": 1, "nazwa": "Łódź"}]
+
+
+def test_gzip_chunks():
+    assert gzip.decompress(b"".join(gzip_chunks([b"abc", b"def"]))) == b"abcdef"
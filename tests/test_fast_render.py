@@ -0,0 +1,27 @@
+from fasthtml.common import A, Table, Tbody, Td, Tr, to_xml
+from crud_app.fast_render import render_rows, sentinel_row, split_page, stream_page
+
+
+def table(rows, labels=None):
+    labels = labels or {}
+    return Table(Tbody(*[Tr(*[Td(labels[index].get(cell, str(cell)) if index in labels else str(cell))
+                              for index, cell in enumerate(row)],
+                            Td(A("Edytuj", href=f"/t/edit/{row[0]}"))) for row in rows]))
+
+
+def test_fast_render_matches_components():
+    rows = [(1, "<b>&\"{x}'", None), (2, "", 7), (3, "Zespół", 99)]
+    labels = {2: {7: "ZARZAD"}}
+
+    parts = split_page(to_xml(table([sentinel_row(3)], labels)))
+
+    assert b"".join(stream_page(parts, rows, labels, chunk_rows=2)).decode("utf-8") == to_xml(table(rows, labels))
+
+
+def test_render_rows_escapes_values():
+    parts = split_page(to_xml(table([sentinel_row(2)])))
+
+    [row] = render_rows(parts.row, [(5, "a<b")])
+
+    assert "<td>a&lt;b</td>" in row
+    assert 'href="/t/edit/5"' in row
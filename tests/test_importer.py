@@ -0,0 +1,54 @@
+import pytest
+from unittest.mock import MagicMock
+from crud_app.db_structure import ChunkReport, Tables
+from crud_app.importer import create_validator, import_csv
+
+
+@pytest.fixture
+def db_interface():
+    db_interface = MagicMock()
+    db_interface.insert_table_rows.side_effect = lambda table_name, chunk, chunk_size: [ChunkReport(len(chunk), 0.1)]
+    return db_interface
+
+
+def test_validator():
+    validate = create_validator(Tables.STANOWISKA)
+
+    assert validate({"nazwa": "PREZES", "placa_min": "1000.00", "placa_max": ""}) == []
+    assert validate({"nazwa": "", "placa_min": "abc"}) == ["nazwa: value required", "placa_min: not a number"]
+    for value in ("NaN", "Infinity", "-inf", "sNaN"):
+        assert validate({"nazwa": "PREZES", "placa_min": value}) == ["placa_min: not a number"]
+
+
+def test_validator_foreign_keys():
+    validate = create_validator(Tables.KONTRAKTORZY)
+    row = {"imie": "Jan", "nazwisko": "Nowak", "stawka_godzinowa": "120"}
+
+    assert validate({**row, "przelozony": "7"}) == []
+    for value in ("7.5", "1e3", "abc"):
+        assert validate({**row, "przelozony": value}) == ["przelozony: not an integer"]
+
+
+def test_import_csv_chunks_and_rejects(db_interface):
+    lines = ["nazwa,placa_min,placa_max\n",
+             "PREZES,25000,\n",
+             "DYREKTOR,abc,\n",
+             "INZYNIER,12000,\n",
+             "SPECJALISTA,3000,6000\n"]
+    progress = MagicMock()
+
+    report = import_csv(db_interface, Tables.STANOWISKA, lines, chunk_size=2, progress=progress)
+
+    assert report.rows_read == 4
+    assert report.rows_inserted == 3
+    assert report.rows_rejected == 1
+    assert report.rejects[0].line == 3
+    assert db_interface.insert_table_rows.call_count == 2
+    assert progress.call_count == 2
+    inserted = db_interface.insert_table_rows.call_args_list[0].args[1]
+    assert [record.nazwa for record in inserted] == ["PREZES", "INZYNIER"]
+
+
+def test_import_csv_invalid_header(db_interface):
+    with pytest.raises(ValueError):
+        import_csv(db_interface, Tables.STANOWISKA, ["a,b\n", "1,2\n"])
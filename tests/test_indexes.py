@@ -0,0 +1,17 @@
+from crud_app.db_structure import Tables
+from crud_app.indexes import recommend_indexes
+
+
+def test_recommend_indexes_skips_existing_and_primary_keys():
+    recommendations = recommend_indexes()
+    columns = {(recommendation.table_name, recommendation.column) for recommendation in recommendations}
+
+    assert (Tables.PRACOWNICY, "nazwisko") in columns
+    assert (Tables.PRACOWNICY, "zespol") not in columns
+    assert (Tables.PRACOWNICY, "idprac") not in columns
+
+
+def test_recommendation_statement():
+    recommendation = next(item for item in recommend_indexes({}) if item.column == "dzial")
+
+    assert recommendation.statement == "CREATE INDEX IF NOT EXISTS ix_zespoly_dzial ON zespoly (dzial);"
@@ -0,0 +1,66 @@
+import pytest
+from crud_app.db import DbInterface
+from crud_app.db_structure import DATA_CLASSES, TABLE_DETAILS, FormFieldTypes
+from crud_app.introspection import build_table_details, dump_snapshot, load_snapshot, register_tables
+from crud_app.statements import STATEMENTS
+
+COLUMNS = [
+    ("dzialy", "iddzial", "int", "int(11)", "NO", "PRI", ""),
+    ("dzialy", "nazwa", "varchar", "varchar(45)", "NO", "", "Nazwa działu"),
+    ("osoby", "idosoba", "int", "int(11)", "NO", "PRI", ""),
+    ("osoby", "imie", "varchar", "varchar(45)", "NO", "", ""),
+    ("osoby", "dzial", "int", "int(11)", "YES", "MUL", ""),
+    ("osoby", "plec", "enum", "enum('K','M')", "YES", "", ""),
+    ("osoby", "data_urodzenia", "date", "date", "YES", "", ""),
+    ("osoby", "email", "varchar", "varchar(100)", "YES", "", ""),
+    ("log", "wpis", "text", "text", "YES", "", ""),
+    ("audit_log", "id", "bigint", "bigint(20)", "NO", "PRI", ""),
+    ("audit_log", "actor", "varchar", "varchar(255)", "YES", "", ""),
+]
+REFERENCES = [("osoby", "dzial", "dzialy")]
+
+
+@pytest.fixture
+def static_registry():
+    saved = [(registry, dict(registry)) for registry in (TABLE_DETAILS, DATA_CLASSES, STATEMENTS)]
+    yield
+    for registry, items in saved:
+        registry.clear()
+        registry.update(items)
+
+
+def test_build_table_details():
+    details = build_table_details(COLUMNS, REFERENCES)
+
+    assert set(details) == {"dzialy", "osoby"}
+    osoby = details["osoby"]
+    assert osoby.primary_key == "idosoba"
+    assert [(item.name, item.form_type, item.required) for item in osoby.fields_details] == [
+        ("idosoba", FormFieldTypes.HIDDEN, True),
+        ("imie", FormFieldTypes.TEXT, True),
+        ("dzial", FormFieldTypes.NUMBER, False),
+        ("plec", FormFieldTypes.RADIO, False),
+        ("data_urodzenia", FormFieldTypes.DATE, False),
+        ("email", FormFieldTypes.EMAIL, False),
+    ]
+    assert osoby.fields_details[2].references == ("dzialy", ("nazwa",))
+    assert osoby.fields_details[3].choices == ("K", "M")
+    assert details["dzialy"].fields_details[1].header == "Nazwa działu"
+
+
+def test_snapshot_round_trip(tmp_path):
+    details = build_table_details(COLUMNS, REFERENCES)
+    path = tmp_path / "schema.json"
+
+    dump_snapshot(details, str(path))
+
+    assert load_snapshot(str(path)) == details
+
+
+def test_register_tables(static_registry):
+    register_tables(build_table_details(COLUMNS, REFERENCES))
+
+    assert DbInterface.get_tables() == {"dzialy", "osoby"}
+    assert STATEMENTS["dzialy"].insert == "INSERT INTO dzialy (nazwa) VALUES (%s)"
+    record = DATA_CLASSES["osoby"](idosoba=0, imie="Anna")
+    assert record.to_params() == (0, "Anna", None, None, None, None)
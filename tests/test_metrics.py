@@ -0,0 +1,45 @@
+import logging
+from unittest.mock import patch
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables
+from crud_app.metrics import Histogram, MetricsRegistry, QueryMetrics, fingerprint
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{route="/a"} 2' in lines
+
+
+def test_fingerprint_ignores_literals_and_in_list_length():
+    first, normalized = fingerprint("SELECT a FROM t WHERE id IN (%s,%s) AND b = 'x'")
+    second, _ = fingerprint("SELECT a FROM t WHERE id IN (%s,%s,%s,%s) AND b = 'y'")
+
+    assert first == second
+    assert normalized == "SELECT a FROM t WHERE id IN (?+) AND b = ?"
+
+
+def test_db_interface_reports_queries(caplog):
+    registry = MetricsRegistry()
+    metrics = QueryMetrics(registry, slow_query_seconds=0.0)
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_cursor = mock_connect.return_value.cursor.return_value
+        mock_cursor.fetchall.return_value = [(1, "A", "B")]
+        db_interface = DbInterface("user", "pass", "host", "dbname", metrics=metrics)
+
+        with caplog.at_level(logging.WARNING, logger="crud_app.slow_query"):
+            db_interface.get_record_data(Tables.ZESPOLY, 1)
+
+    rendered = registry.render()
+    key, _ = fingerprint("SELECT idzespol,nazwa,dzial FROM zespoly WHERE idzespol = %s")
+    assert f'db_query_rows_count{{fingerprint="{key}"}} 1' in rendered
+    assert 'db_method_seconds_count{method="get_record_data"} 1' in rendered
+    assert f'db_slow_queries_total{{fingerprint="{key}"}} 1' in rendered
+    assert "slow query" in caplog.text
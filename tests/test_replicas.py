@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from mysql.connector.errors import OperationalError
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables, Zespol
+from crud_app.replicas import (PRIMARY_COOKIE, READ_CONSISTENCY, ReadConsistency, ReadYourWritesMiddleware,
+                               ReplicaSettings, mark_write, parse_host)
+from crud_app.transactions import TransactionSettings
+
+
+def mock_connection():
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.__enter__.return_value = cursor
+    return connection, cursor
+
+
+@pytest.fixture
+def hosts():
+    connections = {host: mock_connection() for host in ("primary", "replica")}
+    with patch("mysql.connector.connect", side_effect=lambda **kwargs: connections[kwargs["host"]][0]):
+        yield connections
+
+
+@pytest.fixture
+def db_interface(hosts):
+    return DbInterface("user", "pass", "primary", "dbname", replica_hosts=["replica:3307"],
+                       replica_settings=ReplicaSettings(max_lag=5.0, check_interval=0.0))
+
+
+def test_parse_host():
+    assert parse_host("replica") == {'host': "replica", 'port': 3306}
+    assert parse_host("replica:3307") == {'host': "replica", 'port': 3307}
+    with pytest.raises(ValueError):
+        parse_host(":3307")
+
+
+def test_read_routed_to_replica(db_interface, hosts):
+    _, primary_cursor = hosts["primary"]
+    _, replica_cursor = hosts["replica"]
+    replica_cursor.fetchall.side_effect = [[{"Seconds_Behind_Master": 0}], [(1, "A", "IT")]]
+
+    assert list(db_interface.get_table_data(Tables.ZESPOLY)) == [(1, "A", "IT")]
+    primary_cursor.execute.assert_not_called()
+
+
+def test_lagging_replica_not_used(db_interface, hosts):
+    _, primary_cursor = hosts["primary"]
+    _, replica_cursor = hosts["replica"]
+    replica_cursor.fetchall.side_effect = [[{"Seconds_Behind_Master": 30}]]
+    primary_cursor.fetchall.return_value = [(1, "A", "IT")]
+
+    assert db_interface.get_record_data(Tables.ZESPOLY, 1) == (1, "A", "IT")
+    assert replica_cursor.execute.call_count == 1
+
+
+def test_failed_replica_falls_back_to_primary(db_interface, hosts):
+    _, primary_cursor = hosts["primary"]
+    _, replica_cursor = hosts["replica"]
+    replica_cursor.fetchall.side_effect = [[{"Seconds_Behind_Master": 0}], OperationalError("gone away")]
+    primary_cursor.fetchall.return_value = [(1, "A", "IT")]
+
+    assert db_interface.get_record_data(Tables.ZESPOLY, 1) == (1, "A", "IT")
+    assert db_interface.replicas.replicas[0].lag is None
+
+
+def test_read_your_writes(db_interface, hosts):
+    _, primary_cursor = hosts["primary"]
+    primary_cursor.lastrowid = 2
+    primary_cursor.fetchall.return_value = [(2, "B", "IT")]
+    token = READ_CONSISTENCY.set(ReadConsistency())
+    try:
+        db_interface.insert_table_row(Tables.ZESPOLY, Zespol(idzespol=0, nazwa="B", dzial="IT"))
+        assert db_interface.get_record_data(Tables.ZESPOLY, 2) == (2, "B", "IT")
+    finally:
+        READ_CONSISTENCY.reset(token)
+    hosts["replica"][1].execute.assert_not_called()
+
+
+def test_read_your_writes_of_grouped_write(hosts):
+    hosts["primary"][1].lastrowid = 2
+    db_interface = DbInterface("user", "pass", "primary", "dbname", replica_hosts=["replica:3307"],
+                               transaction_settings=TransactionSettings(group_commit_size=8))
+
+    def submit_led_by_other_request(work):
+        # the leading write runs the batch in its own thread and context
+        results = []
+        leader = threading.Thread(target=lambda: results.append(db_interface.run_in_transaction(work)))
+        leader.start()
+        leader.join()
+        return results[0]
+
+    consistency = ReadConsistency()
+    token = READ_CONSISTENCY.set(consistency)
+    try:
+        with patch.object(db_interface.group_commit, "submit", side_effect=submit_led_by_other_request):
+            db_interface.insert_table_row(Tables.ZESPOLY, Zespol(idzespol=0, nazwa="B", dzial="IT"))
+    finally:
+        READ_CONSISTENCY.reset(token)
+
+    assert consistency.primary_until > time.time()
+
+
+def test_middleware_sets_primary_cookie():
+    messages = []
+
+    async def app(scope, receive, send):
+        mark_write(10.0)
+        await send({"type": "http.response.start", "status": 303, "headers": []})
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"cookie", f"{PRIMARY_COOKIE}=1.0".encode())]}
+    asyncio.run(ReadYourWritesMiddleware(app, window=10.0)(scope, None, send))
+
+    name, value = messages[0]["headers"][0]
+    assert name == b"set-cookie"
+    assert value.startswith(f"{PRIMARY_COOKIE}=".encode()) and b"Max-Age=11" in value
+    assert READ_CONSISTENCY.get() is None
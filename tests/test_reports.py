@@ -0,0 +1,60 @@
+from decimal import Decimal
+import pytest
+from unittest.mock import patch
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables
+from crud_app.reports import Reports, group_fields, group_statement, headcount_statement, measure_fields
+
+
+@pytest.fixture
+def mock_db():
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.__enter__.return_value = mock_cursor
+        yield mock_conn, mock_cursor
+
+
+def test_statements():
+    assert "zespol" in group_fields(Tables.PRACOWNICY)
+    assert "nazwisko" not in group_fields(Tables.PRACOWNICY)
+    assert measure_fields(Tables.PRACOWNICY) == ["wynagrodzenie"]
+    assert group_statement(Tables.PRACOWNICY, "zespol", None) == \
+        "SELECT zespol, COUNT(*) FROM pracownicy GROUP BY zespol ORDER BY zespol"
+    assert headcount_statement(Tables.PRACOWNICY, "data_zatrudn", "year") == \
+        ("SELECT YEAR(data_zatrudn) AS period, COUNT(*) FROM pracownicy WHERE data_zatrudn IS NOT NULL "
+         "GROUP BY period ORDER BY period")
+
+
+def test_reports_are_cached_until_the_table_is_written(mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(1, 2, Decimal("7000.00"), Decimal("3500.00"), Decimal("3000"), Decimal("4000"))]
+    db_interface = DbInterface("user", "pass", "host", "dbname")
+    reports = Reports(db_interface)
+
+    first = reports.groups(Tables.PRACOWNICY, "zespol", "wynagrodzenie")
+    second = reports.groups(Tables.PRACOWNICY, "zespol", "wynagrodzenie")
+    with db_interface.transaction() as transaction:
+        transaction.invalidate(Tables.PRACOWNICY)
+    third = reports.groups(Tables.PRACOWNICY, "zespol", "wynagrodzenie")
+
+    assert first.rows == [(1, 2, 7000.0, 3500.0, 3000.0, 4000.0)]
+    assert second is first
+    assert third.version != first.version
+    assert mock_cursor.execute.call_count == 2
+    assert reports.stats().hits == 1 and reports.stats().misses == 2
+
+
+def test_headcount_running_total(mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.fetchall.return_value = [(2020, 2), (2021, 3)]
+    reports = Reports(DbInterface("user", "pass", "host", "dbname"))
+
+    report = reports.headcount(Tables.PRACOWNICY, "data_zatrudn")
+
+    assert report.columns == ("okres", "liczba", "razem")
+    assert report.rows == [("2020", 2, 2), ("2021", 3, 5)]
+    with pytest.raises(ValueError):
+        reports.headcount(Tables.PRACOWNICY, "data_zatrudn", "week")
+    with pytest.raises(ValueError):
+        reports.groups(Tables.PRACOWNICY, "zespol", "nazwisko")
@@ -0,0 +1,24 @@
+from array import array
+from crud_app.rows import ColumnRows
+
+
+def test_column_rows_compact_columns():
+    rows = ColumnRows.from_rows([(1, "A", 1.5, None), (2, "B", 2.5, 3)])
+
+    assert isinstance(rows.column(0), array)
+    assert isinstance(rows.column(2), array)
+    assert rows.column(1) == ("A", "B")
+    assert rows.column(3) == (None, 3)
+    assert rows == [(1, "A", 1.5, None), (2, "B", 2.5, 3)]
+
+
+def test_column_rows_behave_as_list():
+    rows = ColumnRows.from_rows([(1, "A"), (2, "B"), (3, "C")])
+
+    assert len(rows) == 3
+    assert rows[-1] == (3, "C")
+    assert rows[::-1] == [(3, "C"), (2, "B"), (1, "A")]
+    assert rows[:2].column(0).tolist() == [1, 2]
+    assert list(rows[1:]) == [(2, "B"), (3, "C")]
+    assert not ColumnRows.from_rows([])
+    assert ColumnRows.from_rows([]).column(0) == ()
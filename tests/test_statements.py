@@ -0,0 +1,55 @@
+from crud_app.db_structure import Pracownik, Tables, Zespol
+from crud_app.statements import STATEMENTS, SelectShape, delete_many_statement, labels_statement, select_statement
+
+
+def test_statements_for_every_table():
+    assert set(STATEMENTS) == set(Tables)
+
+
+def test_zespoly_statements():
+    statements = STATEMENTS[Tables.ZESPOLY]
+
+    assert statements.insert == "INSERT INTO zespoly (nazwa, dzial) VALUES (%s, %s)"
+    assert statements.update == "UPDATE zespoly SET nazwa=%s, dzial=%s WHERE idzespol=%s"
+    assert statements.select_record == "SELECT idzespol,nazwa,dzial FROM zespoly WHERE idzespol = %s"
+    assert statements.update_if_unchanged == \
+        "UPDATE zespoly SET nazwa=%s, dzial=%s WHERE idzespol=%s AND nazwa <=> %s AND dzial <=> %s"
+    assert statements.unchanged_values((1, "A", None)) == ("A", None)
+    assert select_statement(Tables.ZESPOLY, SelectShape("idzespol", direction="after", limited=True)) == \
+        "SELECT idzespol,nazwa,dzial FROM zespoly WHERE idzespol > %s ORDER BY idzespol ASC LIMIT %s"
+
+
+def test_values_follow_statement_order():
+    record = Pracownik(idprac=7, imie="Jan", nazwisko="Kowalski", stanowisko=1, przelozony=2, zespol=3)
+    statements = STATEMENTS[Tables.PRACOWNICY]
+
+    assert statements.update_values(record)[-1] == 7
+    assert statements.insert_values(record)[:3] == ("Jan", "Kowalski", 1)
+    assert STATEMENTS[Tables.ZESPOLY].insert_values(Zespol(1, "A", "B")) == ("A", "B")
+
+
+def test_delete_many_statement():
+    assert delete_many_statement(Tables.ZESPOLY, 3) == "DELETE FROM zespoly WHERE idzespol IN (%s,%s,%s)"
+
+
+def test_select_statement_with_sort_filters_and_search():
+    shape = SelectShape("nazwa", descending=True, filters=(("dzial", "="),), search=True,
+                        direction="before", limited=True)
+
+    assert select_statement(Tables.ZESPOLY, shape) == \
+        "SELECT idzespol,nazwa,dzial FROM zespoly WHERE dzial = %s AND (nazwa LIKE %s OR dzial LIKE %s) " \
+        "AND (nazwa > %s OR (nazwa = %s AND idzespol > %s)) ORDER BY nazwa ASC, idzespol ASC LIMIT %s"
+    assert select_statement(Tables.ZESPOLY, shape) is select_statement(Tables.ZESPOLY, shape)
+
+
+def test_select_statement_null_cursor():
+    shape = SelectShape("nazwa", direction="after", null_cursor=True)
+
+    assert "((nazwa IS NULL AND idzespol > %s) OR nazwa IS NOT NULL)" in select_statement(Tables.ZESPOLY, shape)
+
+
+def test_labels_statement():
+    assert labels_statement(Tables.ZESPOLY, ("nazwa",), 2) == \
+        "SELECT idzespol,nazwa FROM zespoly WHERE idzespol IN (%s,%s)"
+    assert labels_statement(Tables.ZESPOLY, ("nazwa",)) == \
+        "SELECT idzespol,nazwa FROM zespoly ORDER BY nazwa,idzespol LIMIT %s"
@@ -0,0 +1,167 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from mysql.connector import errorcode
+from mysql.connector.errors import DatabaseError, IntegrityError
+from crud_app.audit import AUDIT_ACTOR
+from crud_app.cache import MemoryCacheBackend
+from crud_app.db import DbInterface
+from crud_app.db_structure import Tables, Zespol
+from crud_app.transactions import GroupCommit, IsolationLevel, TransactionSettings
+
+
+@pytest.fixture
+def mock_db():
+    with patch("mysql.connector.connect") as mock_connect:
+        mock_conn = mock_connect.return_value
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.__enter__.return_value = mock_cursor
+        yield mock_conn, mock_cursor
+
+
+def test_transaction_commits_once_and_invalidates(mock_db):
+    mock_conn, mock_cursor = mock_db
+    cache = MemoryCacheBackend()
+    db_interface = DbInterface("user", "pass", "host", "dbname", cache=cache)
+
+    with db_interface.transaction(IsolationLevel.READ_COMMITTED) as transaction:
+        transaction.execute("UPDATE zespoly SET nazwa=%s WHERE idzespol=%s", ("A", 1))
+        transaction.execute("UPDATE zespoly SET nazwa=%s WHERE idzespol=%s", ("B", 2))
+        transaction.invalidate(Tables.ZESPOLY, 1)
+        assert cache.generation(Tables.ZESPOLY) == 0
+
+    mock_conn.start_transaction.assert_called_once_with(isolation_level="READ COMMITTED")
+    mock_conn.commit.assert_called_once()
+    assert mock_cursor.execute.call_count == 2
+    assert cache.generation(Tables.ZESPOLY) == 1
+
+
+def test_transaction_rolled_back_on_error(mock_db):
+    mock_conn, _ = mock_db
+    db_interface = DbInterface("user", "pass", "host", "dbname")
+
+    with pytest.raises(RuntimeError):
+        with db_interface.transaction():
+            raise RuntimeError("failed")
+
+    mock_conn.start_transaction.assert_not_called()
+    mock_conn.commit.assert_not_called()
+    mock_conn.rollback.assert_called()
+
+
+def test_savepoint_rolled_back_on_error(mock_db):
+    _, mock_cursor = mock_db
+    db_interface = DbInterface("user", "pass", "host", "dbname")
+
+    with db_interface.transaction() as transaction:
+        transaction.invalidate(Tables.ZESPOLY, 1)
+        with pytest.raises(ValueError):
+            with transaction.savepoint():
+                transaction.invalidate(Tables.ZESPOLY, 2)
+                raise ValueError("failed")
+
+        assert transaction.invalidations == [(Tables.ZESPOLY, 1)]
+        assert [change.primary_key for change in transaction.changes] == [1]
+
+    statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+    assert statements == ["SAVEPOINT sp1", "ROLLBACK TO SAVEPOINT sp1"]
+
+
+def test_deadlock_retried(mock_db):
+    mock_conn, _ = mock_db
+    db_interface = DbInterface("user", "pass", "host", "dbname",
+                               transaction_settings=TransactionSettings(retries=2, backoff=0))
+    work = MagicMock(side_effect=[DatabaseError(errno=errorcode.ER_LOCK_DEADLOCK), "done"])
+
+    assert db_interface.run_in_transaction(work) == "done"
+    assert work.call_count == 2
+    mock_conn.commit.assert_called_once()
+
+    work = MagicMock(side_effect=DatabaseError(errno=errorcode.ER_LOCK_DEADLOCK))
+    with pytest.raises(DatabaseError):
+        db_interface.run_in_transaction(work)
+    assert work.call_count == 3
+
+
+def test_insert_table_row_returns_new_id(mock_db):
+    _, mock_cursor = mock_db
+    mock_cursor.lastrowid = 7
+    db_interface = DbInterface("user", "pass", "host", "dbname",
+                               transaction_settings=TransactionSettings(group_commit_size=8))
+
+    assert db_interface.insert_table_row(Tables.ZESPOLY, Zespol(idzespol=0, nazwa="Nowy", dzial="IT")) == 7
+
+
+def test_group_commit_batches_concurrent_writes():
+    batches = []
+    started, release = threading.Event(), threading.Event()
+
+    def run_batch(execute):
+        transaction = MagicMock()
+        execute(transaction)
+        batches.append(transaction)
+
+    def first(_):
+        started.set()
+        release.wait()
+        return 0
+
+    def failing(_):
+        raise IntegrityError("duplicate")
+
+    group_commit = GroupCommit(run_batch, max_size=8)
+    results, errors = {}, {}
+
+    def submit(key, work):
+        try:
+            results[key] = group_commit.submit(work)
+        except IntegrityError as error:
+            errors[key] = error
+
+    threads = [threading.Thread(target=submit, args=(0, first))]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=submit, args=(key, lambda _, key=key: key)) for key in range(1, 4)]
+    threads.append(threading.Thread(target=submit, args=(4, failing)))
+    for thread in threads[1:]:
+        thread.start()
+    while len(group_commit._pending) < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(batches) == 2
+    assert results == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert list(errors) == [4]
+    assert batches[1].savepoint.call_count == 4
+
+
+def test_group_commit_runs_writes_in_their_context():
+    started, release = threading.Event(), threading.Event()
+
+    def first(_):
+        started.set()
+        release.wait()
+        return AUDIT_ACTOR.get()
+
+    group_commit = GroupCommit(lambda execute: execute(MagicMock()), max_size=8)
+    results = {}
+
+    def submit(actor, work):
+        AUDIT_ACTOR.set(actor)
+        results[actor] = group_commit.submit(work)
+
+    threads = [threading.Thread(target=submit, args=("user0", first))]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=submit, args=(f"user{key}", lambda _: AUDIT_ACTOR.get())) for key in range(1, 4)]
+    for thread in threads[1:]:
+        thread.start()
+    while len(group_commit._pending) < 3:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == {f"user{key}": f"user{key}" for key in range(4)}